@@ -3,35 +3,206 @@ Módulo de Generación con IA Mejorado para STEL Shop
 Incluye procesamiento de PDFs y generación de HTML enriquecido
 """
 
+import asyncio
 import json
 import re
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional, List
-import google.generativeai as genai
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
-import PyPDF2
-import requests
 import base64
-from io import BytesIO
+import tempfile
+
+from generation_cache import GenerationCache
+from html_postprocess import HtmlPostprocessor
+from html_templates import insert_contact, render_catalog, render_fallback
+from json_repair import parse_json_tolerant
+from metrics import MetricsRecorder, estimate_cost
+from pdf_cache import PdfCache
+from pdf_extraction import PDF_LIMITS, PdfParserPool, stream_download
+from pdf_batch import PdfBatchPlanner, get_product_sku
+from prompt_builder import (
+    PromptBuilder,
+    estimate_tokens,
+    format_spec_lines,
+    select_excerpt,
+)
+from providers import AIProvider, PromptPrefix, build_provider
+from rate_limiter import AsyncRateLimiter, is_quota_error
+from resilience import ResilientCaller, is_provider_unavailable, is_retryable
+from seo_batch import generate_seo_catalog, seo_for_product
+from spec_extractor import SpecExtractor, to_legacy, specs_to_dict
+
+# Versión de la plantilla del prompt premium. Cambiarla invalida la caché.
+PROMPT_TEMPLATE_VERSION = "premium-v4"
+
+# Versión de la extracción de PDFs (texto, especificaciones, extracto).
+# Subirla al cambiar spec_extractor o select_excerpt: junto con el parser y
+# los límites de páginas forma la clave de las extracciones guardadas
+EXTRACTION_VERSION = "extraccion-v2"
+
+# Campos que debe devolver la IA en la generación premium
+CAMPOS_REQUERIDOS = [
+    "descripcion",
+    "descripcion_html",
+    "seo_titulo",
+    "seo_descripcion",
+]
+
+# Especificaciones del prompt premium: (etiqueta, claves alternativas, unidad)
+CAMPOS_PROMPT_PREMIUM = [
+    ("SKU", ("sku", "SKU"), ""),
+    ("Marca", ("marca",), ""),
+    ("Modelo", ("modelo",), ""),
+    ("Familia", ("familia",), ""),
+    ("Potencia", ("potencia_kva",), "kVA"),
+    ("Potencia activa", ("potencia_kw",), "kW"),
+    # Potencia del catálogo: ya trae su unidad (o no se conoce)
+    ("Potencia", ("potencia",), ""),
+    ("Motor", ("motor",), ""),
+    ("Consumo", ("consumo",), "L/h"),
+    ("Tanque", ("tanque",), "L"),
+    ("Voltaje", ("voltaje",), "V"),
+    ("Frecuencia", ("frecuencia",), "Hz"),
+    ("Dimensiones", ("dimensiones",), "mm"),
+    ("Peso", ("peso",), "kg"),
+]
+
+# Parámetros de generación del prompt premium
+GENERATION_CONFIG_PREMIUM = {
+    "temperature": 0.7,
+    "max_output_tokens": 8000,
+}
+
+# Marcador de la URL de la ficha técnica en los prompts agrupados
+URL_FICHA_PLACEHOLDER = "[URL_FICHA_TECNICA]"
+
+# Tareas para el router de proveedores (ver providers.ProviderRouter)
+TAREA_HTML = "html"
+TAREA_SEO = "seo"
+CAMPOS_SEO = ("seo_titulo", "seo_descripcion")
+
+
+def cargar_config_ia(config_path: Path) -> Dict[str, Any]:
+    """Lee la sección "ai" de config.json (vacía si no existe)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("ai", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudo leer {config_path}: {e}")
+        return {}
+
+
+def _reintentable_sin_cuota(error: Exception) -> bool:
+    return is_retryable(error) and not is_quota_error(error)
 
 
 class EnhancedAIHandler:
     """Maneja la generación mejorada de descripciones con IA y PDFs"""
 
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        cache: Optional[GenerationCache] = None,
+        pdf_cache: Optional[PdfCache] = None,
+        pdf_parser: Optional[PdfParserPool] = None,
+        provider: Optional[AIProvider] = None,
+        resilience: Optional[ResilientCaller] = None,
+        ai_config: Optional[Dict] = None,
+        metrics: Optional[MetricsRecorder] = None,
+    ):
         self.api_key = api_key
-        self.model = None
+        # Un proveedor explícito (por ejemplo LocalProvider) reemplaza al de
+        # config.json
+        self.provider = provider
+        self.model = provider
         self.module_path = Path(__file__).parent
 
-        if api_key:
+        # Sección "ai" de config.json: proveedor y modelos por tarea
+        if ai_config is None:
+            ai_config = cargar_config_ia(
+                self.module_path / "enhanced_shop" / "config.json"
+            )
+        self.ai_config = ai_config
+        cache_dir = self.module_path / "enhanced_shop" / "cache"
+
+        # Caché persistente de generaciones
+        if cache is None:
+            cache = GenerationCache(cache_dir / "ai_generations.sqlite")
+        self.cache = cache
+
+        # Caché de descargas y extracciones de PDFs
+        if pdf_cache is None:
+            pdf_cache = PdfCache(cache_dir / "pdfs")
+        self.pdf_cache = pdf_cache
+
+        self.spec_extractor = SpecExtractor()
+
+        # Prompts con presupuesto de tokens y estadísticas de tamaño
+        self.prompt_builder = PromptBuilder()
+        self._prompt_lock = threading.Lock()
+        self.prompt_stats_totals = {
+            "calls": 0,
+            "tokens": 0,
+            "max_tokens": 0,
+            "pdf_tokens": 0,
+            "pdf_tokens_available": 0,
+            "fields_dropped": 0,
+        }
+        self.last_prompt_stats = None
+
+        # Reparación de JSON de la IA: respuestas reparadas vs. reintentos
+        self._json_lock = threading.Lock()
+        self.json_stats = {
+            "clean": 0,
+            "repaired": 0,
+            "unparseable": 0,
+            "followups": 0,
+            "fields_rerequested": 0,
+            "full_retries": 0,
+            "failed": 0,
+        }
+
+        # Prefijos estáticos del prompt premium por datos de contacto
+        self._prefijos: Dict[tuple, PromptPrefix] = {}
+
+        # Límites de lectura de PDFs (tamaño de descarga y páginas a parsear)
+        self.pdf_limits = dict(PDF_LIMITS)
+
+        # Parseo de PDFs fuera del proceso (el pool se crea al primer uso)
+        self.pdf_parser = pdf_parser or PdfParserPool()
+
+        # Plazos, reintentos, hedging y circuit breaker de las llamadas a la IA.
+        # Si el proveedor falla, el modo premium usa la plantilla de respaldo
+        self.resilience = resilience or ResilientCaller()
+        self.usar_respaldo = True
+        self._respaldo_lock = threading.Lock()
+        self.respaldos = 0
+
+        # Compactado del HTML generado (espacios, estilos, comentarios, tamaño)
+        self.html_postprocessor = HtmlPostprocessor()
+
+        # Tiempos, tokens, costo y aciertos de caché (log JSONL en enhanced_shop/logs)
+        if metrics is None:
+            metrics = MetricsRecorder(self.module_path / "enhanced_shop" / "logs")
+        self.metrics = metrics
+
+        # El proveedor local no necesita API key
+        if provider is None and (api_key or self.ai_config.get("provider") == "local"):
             self.initialize_model(api_key)
 
-    def initialize_model(self, api_key: str):
-        """Inicializa el modelo de Google Gemini"""
+    def initialize_model(self, api_key: Optional[str]):
+        """Inicializa el proveedor de IA configurado en config.json"""
         try:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel("gemini-1.5-flash")
+            if api_key:
+                import google.generativeai as genai
+
+                genai.configure(api_key=api_key)
+            self.provider = build_provider(self.ai_config)
+            self.model = self.provider
             self.api_key = api_key
+            print(f"🤖 Proveedor de IA: {self.provider.label}")
             return True
         except Exception as e:
             print(f"❌ Error inicializando modelo: {e}")
@@ -39,124 +210,1067 @@ class EnhancedAIHandler:
 
     def extract_pdf_content(self, pdf_url: str) -> Dict[str, Any]:
         """Extrae contenido relevante del PDF"""
+        with self.metrics.measure("pdf", url=pdf_url, cache_hit=False) as evento:
+            contenido = self._extraer_pdf(pdf_url, evento)
+            evento.update(
+                ok=contenido["success"],
+                bytes=contenido.get("bytes_read", 0),
+                pages=contenido.get("pages_parsed", 0),
+                parser=contenido.get("parser", ""),
+            )
+        return contenido
+
+    def _extraer_pdf(self, pdf_url: str, evento: Dict) -> Dict[str, Any]:
+        """Descarga (o revalida) y parsea el PDF; completa las métricas"""
+        inicio = time.perf_counter()
         try:
             # Si es una URL relativa, construir la URL completa
             if not pdf_url.startswith("http"):
                 pdf_url = f"https://storage.googleapis.com/fichas_tecnicas/{pdf_url}"
 
-            # Descargar PDF
-            response = requests.get(pdf_url, timeout=30)
-            pdf_file = BytesIO(response.content)
+            limites = self.pdf_limits
 
-            # Extraer texto
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text_content = ""
+            # Descargar PDF por bloques (revalidando contra la caché local)
+            if self.pdf_cache is not None:
+                pdf_path, content_hash, bytes_read = self.pdf_cache.fetch_file(
+                    pdf_url, timeout=30, max_bytes=limites["max_bytes"]
+                )
+                evento["download_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
 
-            for page in pdf_reader.pages[:5]:  # Primeras 5 páginas
-                text_content += page.extract_text() + "\n"
+                # Cada contenido distinto se parsea una sola vez por versión
+                # de la extracción, parser y límites
+                params = self.pdf_cache.extraction_params(
+                    version=EXTRACTION_VERSION,
+                    parser=self.pdf_parser.parser,
+                    max_pages=limites["max_pages"],
+                    max_chars=limites["max_chars"],
+                )
+                cached = self.pdf_cache.get_extraction(content_hash, params)
+                if cached is not None:
+                    evento["cache_hit"] = True
+                    return {
+                        "success": True,
+                        **cached,
+                        "content_hash": content_hash,
+                        "bytes_read": bytes_read,
+                    }
 
-            # Buscar especificaciones técnicas
-            specs = self._extract_specifications(text_content)
+                lectura = self.pdf_parser.extract(
+                    pdf_path, limites["max_pages"], limites["max_chars"]
+                )
+            else:
+                # Sin caché: archivo temporal para que lo lea el pool
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    pdf_path = Path(tmp_dir) / "ficha.pdf"
+                    with open(pdf_path, "wb") as pdf_file:
+                        respuesta, bytes_read, content_hash = stream_download(
+                            pdf_url,
+                            pdf_file,
+                            max_bytes=limites["max_bytes"],
+                            timeout=30,
+                        )
+                    evento["ttfb_ms"] = round(
+                        respuesta.elapsed.total_seconds() * 1000, 1
+                    )
+                    evento["download_ms"] = round(
+                        (time.perf_counter() - inicio) * 1000, 1
+                    )
+                    lectura = self.pdf_parser.extract(
+                        pdf_path, limites["max_pages"], limites["max_chars"]
+                    )
+
+            text_content = lectura["text"]
+
+            # Buscar especificaciones técnicas (valores tipados y con unidad)
+            specs_detalle = self.spec_extractor.extract(text_content)
+
+            extraction = {
+                # Párrafos con más especificaciones (≈ 3000 caracteres)
+                "text": select_excerpt(text_content, 750)[0],
+                "specifications": to_legacy(specs_detalle),
+                "specifications_detail": specs_to_dict(specs_detalle),
+                "page_count": lectura["page_count"],
+                "pages_parsed": lectura["pages_parsed"],
+                "parser": lectura["parser"],
+            }
+            if self.pdf_cache is not None:
+                self.pdf_cache.set_extraction(content_hash, extraction, params)
 
             return {
                 "success": True,
-                "text": text_content[:3000],  # Limitar para el prompt
-                "specifications": specs,
-                "page_count": len(pdf_reader.pages),
+                **extraction,
+                "content_hash": content_hash,
+                "bytes_read": bytes_read,
             }
 
         except Exception as e:
             print(f"⚠️ Error extrayendo PDF: {e}")
+            evento["error"] = str(e)[:200]
             return {"success": False, "text": "", "specifications": {}}
 
     def _extract_specifications(self, text: str) -> Dict[str, str]:
         """Extrae especificaciones técnicas del texto"""
-        specs = {}
-
-        # Patrones comunes en fichas técnicas
-        patterns = {
-            "potencia": r"(?:potencia|power).*?(\d+\.?\d*)\s*(?:kva|kw)",
-            "voltaje": r"(?:voltaje|voltage|tensión).*?(\d+)\s*v",
-            "frecuencia": r"(?:frecuencia|frequency).*?(\d+)\s*hz",
-            "motor": r"(?:motor|engine).*?([A-Za-z0-9\s\-]+)",
-            "consumo": r"(?:consumo|consumption).*?(\d+\.?\d*)\s*(?:l/h|lph)",
-            "dimensiones": r"(?:dimensiones|dimensions).*?(\d+)\s*x\s*(\d+)\s*x\s*(\d+)",
-            "peso": r"(?:peso|weight).*?(\d+\.?\d*)\s*(?:kg|kilos)",
-        }
-
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                specs[key] = (
-                    match.group(1)
-                    if key != "dimensiones"
-                    else f"{match.group(1)}x{match.group(2)}x{match.group(3)}"
-                )
+        return to_legacy(self.spec_extractor.extract(text))
 
-        return specs
-
-    def generar_descripcion_detallada_html_premium_con_ia(
-        self, product_info: Dict, config: Dict
-    ) -> Dict:
-        """
-        Genera TODAS las descripciones usando IA obligatoriamente
-        Retorna un diccionario con todo el contenido necesario
-        """
+    def _preparar_producto_premium(
+        self, product_info: Dict, config: Dict, contenido_pdf: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """Extrae el PDF, combina los datos del producto y calcula su clave de caché"""
 
         # Paso 1: Extraer contenido del PDF
         pdf_url = product_info.get("pdf_url", "")
         texto_pdf = ""
         especificaciones_pdf = {}
+        pdf_hash = ""
 
         if pdf_url:
             if not pdf_url.startswith("http"):
                 pdf_url = f"https://storage.googleapis.com/fichas_tecnicas/{pdf_url}"
 
-            contenido_pdf = self.extract_pdf_content(pdf_url)
+            if contenido_pdf is None:
+                contenido_pdf = self.extract_pdf_content(pdf_url)
             texto_pdf = contenido_pdf.get("text", "")
             especificaciones_pdf = contenido_pdf.get("specifications", {})
+            pdf_hash = contenido_pdf.get("content_hash", "")
 
         # Paso 2: Combinar toda la información
         info_completa = {**product_info, **especificaciones_pdf}
 
         # Valores de contacto por defecto
-        whatsapp = config.get("whatsapp", "541139563099")
-        email = config.get("email", "info@generadores.ar")
-        telefono_display = config.get("telefono_display", "+54 11 3956-3099")
-        website = config.get("website", "www.generadores.ar")
+        contacto = {
+            "whatsapp": config.get("whatsapp", "541139563099"),
+            "email": config.get("email", "info@generadores.ar"),
+            "telefono_display": config.get("telefono_display", "+54 11 3956-3099"),
+            "website": config.get("website", "www.generadores.ar"),
+        }
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                product_info,
+                pdf_hash=pdf_hash,
+                prompt_version=PROMPT_TEMPLATE_VERSION,
+                extra={**contacto, "pdf_url": pdf_url},
+            )
+
+        return {
+            "product_info": product_info,
+            "sku": get_product_sku(product_info),
+            "info_completa": info_completa,
+            "texto_pdf": texto_pdf,
+            "pdf_url": pdf_url,
+            "contacto": contacto,
+            "config": config,
+            "cache_key": cache_key,
+        }
+
+    def _buscar_en_cache(self, datos: Dict) -> Optional[Dict]:
+        """Devuelve la generación guardada para un producto preparado"""
+        if datos["cache_key"] is None:
+            return None
+        cached = self.cache.get(datos["cache_key"])
+        if cached is not None:
+            print(f"⚡ Descripción obtenida de caché: {datos['sku']}")
+            self.metrics.annotate(cache_hit=True)
+            # Las entradas guardadas antes del compactado también se compactan
+            if cached.get("descripcion_html"):
+                reporte = self._compactar_html(
+                    datos["sku"], cached["descripcion_html"], informar=False
+                )
+                cached["descripcion_html"] = reporte["html"]
+        return cached
+
+    def _guardar_en_cache(self, datos: Dict, resultado: Dict) -> None:
+        if datos["cache_key"] is not None:
+            self.cache.set(datos["cache_key"], resultado, sku=datos["sku"])
+
+    def _parsear_json_ia(self, texto_respuesta: str) -> Any:
+        """Parsea la respuesta JSON de la IA reparando defectos comunes"""
+        reparado = parse_json_tolerant(texto_respuesta)
+        self._contar_json("repaired" if reparado.repaired else "clean")
+        datos = reparado.data
+        # En un array truncado el último objeto quedó incompleto
+        if reparado.truncated_fields and isinstance(datos, list) and datos:
+            datos = datos[:-1]
+        return datos
+
+    def _contar_json(self, nombre: str, cantidad: int = 1) -> None:
+        with self._json_lock:
+            self.json_stats[nombre] += cantidad
+
+    def get_json_repair_stats(self) -> Dict[str, Any]:
+        """Respuestas limpias, reparadas, campos pedidos de nuevo y reintentos"""
+        with self._json_lock:
+            stats = dict(self.json_stats)
+        respuestas = stats["clean"] + stats["repaired"] + stats["unparseable"]
+        return {
+            **stats,
+            "responses": respuestas,
+            "repair_rate": (
+                round(stats["repaired"] / respuestas, 3) if respuestas else 0
+            ),
+            "full_retry_rate": (
+                round(stats["full_retries"] / respuestas, 3) if respuestas else 0
+            ),
+        }
+
+    def _validar_resultado_premium(self, resultado: Any) -> None:
+        """Valida que la respuesta de IA tenga todos los campos"""
+        if not isinstance(resultado, dict):
+            raise ValueError("La respuesta de IA no es un objeto JSON")
+        for campo in CAMPOS_REQUERIDOS:
+            if campo not in resultado:
+                raise ValueError(f"Falta el campo {campo} en la respuesta de IA")
+
+    def _prefijo_premium(self, contacto: Dict) -> PromptPrefix:
+        """
+        Parte estática del prompt premium (instrucciones, diseño HTML y
+        contacto). Es igual para todos los productos de una sesión, por lo
+        que los proveedores con caché de contexto la suben una sola vez.
+        """
+        clave = tuple(sorted(contacto.items()))
+        prefijo = self._prefijos.get(clave)
+        if prefijo is not None:
+            return prefijo
+
+        instrucciones = self._instrucciones_premium(
+            pdf_url=URL_FICHA_PLACEHOLDER, **contacto
+        )
+        texto = f"""
+        Eres un experto en marketing de equipos industriales y desarrollo web.
+        
+        DATOS DE CONTACTO A USAR:
+        - WhatsApp: {contacto['whatsapp']}
+        - Email: {contacto['email']}
+        - Teléfono: {contacto['telefono_display']}
+        - Website: {contacto['website']}
+        
+        GENERA UN JSON con estos 4 elementos para el PRODUCTO indicado al final:
+        
+        {instrucciones}
+        
+        Responde SOLO con el JSON, sin explicaciones adicionales.
+        """
+        prefijo = PromptPrefix(PROMPT_TEMPLATE_VERSION, texto)
+        self._prefijos[clave] = prefijo
+        return prefijo
+
+    def _construir_prompt_premium(self, datos: Dict) -> Tuple[PromptPrefix, str]:
+        """Arma el prompt premium: prefijo estático y sufijo del producto"""
+        prefijo = self._prefijo_premium(datos["contacto"])
+        bloque_producto, stats = self._contexto_producto_premium(
+            datos["info_completa"], datos["texto_pdf"]
+        )
+
+        # Paso 3: Datos del producto (lo único que cambia entre llamadas)
+        sufijo = f"""
+        {bloque_producto}
+        
+        FICHA TÉCNICA (reemplaza {URL_FICHA_PLACEHOLDER} con esta URL): {datos['pdf_url']}
+        """
+
+        datos["prompt_stats"] = self._registrar_prompt(
+            datos["sku"], prefijo.text + sufijo, stats, prefijo=prefijo
+        )
+        datos["prompt_prefijo"] = prefijo
+        datos["prompt_sufijo"] = sufijo
+        return prefijo, sufijo
+
+    def _registrar_prompt(
+        self,
+        sku: str,
+        prompt: str,
+        stats: Dict[str, Any],
+        prefijo: Optional[PromptPrefix] = None,
+    ) -> Dict[str, Any]:
+        """Registra el tamaño de un prompt y lo acumula en las estadísticas"""
+        stats = {**stats, "sku": sku, "tokens": estimate_tokens(prompt)}
+        if prefijo is not None:
+            stats["prefix_id"] = prefijo.id
+            stats["prefix_tokens"] = prefijo.tokens
+            stats["suffix_tokens"] = stats["tokens"] - prefijo.tokens
+        with self._prompt_lock:
+            totales = self.prompt_stats_totals
+            totales["calls"] += 1
+            totales["tokens"] += stats["tokens"]
+            totales["pdf_tokens"] += stats["pdf_tokens"]
+            totales["pdf_tokens_available"] += stats["pdf_tokens_available"]
+            totales["fields_dropped"] += stats["fields_dropped"]
+            totales["max_tokens"] = max(totales["max_tokens"], stats["tokens"])
+            self.last_prompt_stats = stats
+
+        print(
+            f"📏 Prompt {sku}: ~{stats['tokens']} tokens "
+            f"(PDF {stats['pdf_paragraphs_used']}/{stats['pdf_paragraphs']} párrafos, "
+            f"{stats['fields_dropped']} campos vacíos omitidos)"
+        )
+        return stats
+
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Tamaño de los prompts enviados: totales, promedio y último"""
+        with self._prompt_lock:
+            totales = dict(self.prompt_stats_totals)
+            ultimo = self.last_prompt_stats
+        llamadas = totales["calls"]
+        return {
+            **totales,
+            "avg_tokens": round(totales["tokens"] / llamadas) if llamadas else 0,
+            "budget": self.prompt_builder.token_budget,
+            "last": ultimo,
+        }
+
+    def _procesar_respuesta_premium(
+        self, datos: Dict, texto_respuesta: str, reintentos_completos: int = 1
+    ) -> Dict:
+        """
+        Parsea la respuesta premium reparando defectos comunes. Los campos
+        faltantes o truncados se piden aparte con un prompt mínimo; solo si
+        la respuesta no se puede recuperar se vuelve a generar completa.
+        Luego valida y guarda en caché.
+        """
+        try:
+            reparado = parse_json_tolerant(texto_respuesta, CAMPOS_REQUERIDOS)
+        except ValueError:
+            reparado = None
+
+        if reparado is None or not isinstance(reparado.data, dict):
+            self._contar_json("unparseable")
+            return self._regenerar_completo(datos, reintentos_completos)
+
+        self._contar_json("repaired" if reparado.repaired else "clean")
+        resultado = {
+            campo: valor
+            for campo, valor in reparado.data.items()
+            if campo not in reparado.truncated_fields
+        }
+        # Un HTML que excede el presupuesto de bytes se pide de nuevo
+        self._postprocesar_html(datos, resultado)
+
+        faltantes = [
+            campo
+            for campo in CAMPOS_REQUERIDOS
+            if not isinstance(resultado.get(campo), str) or not resultado[campo]
+        ]
+        if faltantes:
+            nuevos = self._pedir_campos_faltantes(datos, faltantes)
+            self._postprocesar_html(datos, nuevos)
+            resultado.update(nuevos)
+            if any(not resultado.get(campo) for campo in faltantes):
+                return self._regenerar_completo(datos, reintentos_completos)
+
+        # Validar que tenga todos los campos
+        self._validar_resultado_premium(resultado)
+
+        self._guardar_en_cache(datos, resultado)
+
+        return resultado
+
+    def _compactar_html(self, sku: str, html: str, informar: bool = True) -> Dict:
+        """Compacta el HTML e informa la reducción de tamaño del producto"""
+        reporte = self.html_postprocessor.process(html)
+        self.metrics.annotate(
+            html_bytes_in=reporte["bytes_in"], html_bytes_out=reporte["bytes_out"]
+        )
+        if informar:
+            print(
+                f"🗜️ HTML {sku}: {reporte['bytes_in'] / 1024:.1f} KB → "
+                f"{reporte['bytes_out'] / 1024:.1f} KB (-{reporte['saved_pct']}%)"
+            )
+        if reporte["problems"]:
+            print(f"⚠️ HTML de {sku} desbalanceado: {', '.join(reporte['problems'])}")
+        if reporte["over_budget"]:
+            print(
+                f"⚠️ HTML de {sku} excede el máximo "
+                f"({reporte['bytes_out']} > {self.html_postprocessor.max_bytes} bytes)"
+            )
+        return reporte
+
+    def _postprocesar_html(self, datos: Dict, resultado: Dict) -> None:
+        """
+        Completa la URL de la ficha y compacta descripcion_html. Si excede el
+        presupuesto de bytes se quita del resultado, como un campo faltante.
+        """
+        html = resultado.get("descripcion_html")
+        if not isinstance(html, str) or not html:
+            return
+        # La URL de la ficha va en el sufijo; completarla si quedó el marcador
+        html = html.replace(URL_FICHA_PLACEHOLDER, datos["pdf_url"])
+        reporte = self._compactar_html(datos["sku"], html)
+        if reporte["over_budget"]:
+            del resultado["descripcion_html"]
+        else:
+            resultado["descripcion_html"] = reporte["html"]
+
+    def get_html_stats(self) -> Dict[str, Any]:
+        """Bytes antes y después del compactado, HTML desbalanceado o excedido"""
+        return self.html_postprocessor.stats()
+
+    def _pedir_campos_faltantes(self, datos: Dict, faltantes: List[str]) -> Dict:
+        """Pide solo los campos que faltan, reutilizando el prefijo del prompt"""
+        print(f"🩹 Pidiendo campos faltantes de {datos['sku']}: {', '.join(faltantes)}")
+        self._contar_json("followups")
+        self._contar_json("fields_rerequested", len(faltantes))
+
+        sufijo = datos["prompt_sufijo"] + f"""
+        Genera SOLO estos campos del JSON: {", ".join(faltantes)}.
+        Responde SOLO con un JSON que tenga esas claves.
+        """
+        max_bytes = self.html_postprocessor.max_bytes
+        if "descripcion_html" in faltantes and max_bytes:
+            sufijo += f"""El HTML debe ocupar menos de {max_bytes // 1024} KB.
+        """
+        # Si solo faltan campos SEO alcanza con el modelo liviano
+        tarea = TAREA_SEO if set(faltantes) <= set(CAMPOS_SEO) else TAREA_HTML
+        try:
+            response = self._llamar_modelo(
+                sufijo, GENERATION_CONFIG_PREMIUM, datos["prompt_prefijo"], tarea
+            )
+            reparado = parse_json_tolerant(response.text, faltantes)
+        except Exception as e:
+            print(f"⚠️ No se pudieron completar los campos: {e}")
+            return {}
+
+        if not isinstance(reparado.data, dict):
+            return {}
+        return {
+            campo: reparado.data[campo]
+            for campo in faltantes
+            if isinstance(reparado.data.get(campo), str)
+            and campo not in reparado.truncated_fields
+        }
+
+    def _regenerar_completo(self, datos: Dict, reintentos_completos: int) -> Dict:
+        """Vuelve a generar el producto completo (último recurso)"""
+        if reintentos_completos <= 0:
+            self._contar_json("failed")
+            raise ValueError("La respuesta de IA no tiene un JSON recuperable")
+
+        print(f"🔁 Regenerando {datos['sku']} completo")
+        self._contar_json("full_retries")
+        response = self._llamar_modelo(
+            datos["prompt_sufijo"], GENERATION_CONFIG_PREMIUM, datos["prompt_prefijo"]
+        )
+        return self._procesar_respuesta_premium(
+            datos, response.text, reintentos_completos - 1
+        )
+
+    def generar_descripcion_detallada_html_premium_con_ia(
+        self, product_info: Dict, config: Dict, contenido_pdf: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Genera TODAS las descripciones usando IA obligatoriamente
+        Retorna un diccionario con todo el contenido necesario
+        Si se pasa contenido_pdf (ya extraído en un lote) no se vuelve a descargar
+        """
+        with self.metrics.generation(get_product_sku(product_info), "premium"):
+            return self._generar_premium(product_info, config, contenido_pdf)
+
+    def _generar_premium(
+        self, product_info: Dict, config: Dict, contenido_pdf: Optional[Dict]
+    ) -> Dict:
+        datos = self._preparar_producto_premium(product_info, config, contenido_pdf)
+
+        # Consultar la caché antes de llamar a la IA
+        cached = self._buscar_en_cache(datos)
+        if cached is not None:
+            return cached
 
         # Paso 3: Crear prompt detallado para la IA
+        prefijo, sufijo = self._construir_prompt_premium(datos)
+
+        try:
+            # Llamar a la IA (el prefijo se sube una vez si el proveedor lo cachea)
+            response = self._llamar_modelo(sufijo, GENERATION_CONFIG_PREMIUM, prefijo)
+        except Exception as e:
+            return self._respaldo_premium(datos, e)
+
+        try:
+            return self._procesar_respuesta_premium(datos, response.text)
+        except Exception as e:
+            print(f"❌ Error generando con IA: {e}")
+            raise Exception(f"Error crítico en generación IA: {e}")
+
+    def _proveedor(self) -> AIProvider:
+        if self.provider is None:
+            raise RuntimeError("Modelo de IA no inicializado (falta la API key)")
+        return self.provider
+
+    def _llamar_modelo(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefijo: Optional[PromptPrefix] = None,
+        tarea: str = TAREA_HTML,
+    ) -> Any:
+        """Llamada sincrónica al proveedor con plazo, reintentos y hedging"""
+        proveedor = self._proveedor()
+        intentos = []
+
+        def generar():
+            intentos.append(1)
+            return proveedor.generate(
+                prompt, generation_config, prefix=prefijo, task=tarea
+            )
+
+        inicio = time.perf_counter()
+        try:
+            response = self.resilience.call(generar)
+        except Exception as e:
+            self._registrar_llamada(tarea, inicio, len(intentos), prompt, error=e)
+            raise
+        self._registrar_llamada(tarea, inicio, len(intentos), prompt, response)
+        return response
+
+    def _registrar_llamada(
+        self,
+        tarea: str,
+        inicio: float,
+        intentos: int,
+        prompt: str,
+        response: Any = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """Métricas de una llamada al modelo (los reintentos incluyen hedges)"""
+        uso = getattr(response, "usage", None) or {}
+        modelo = getattr(response, "model", "") or getattr(self.provider, "label", "")
+        tokens_in = uso.get("tokens_in") or estimate_tokens(prompt)
+        tokens_out = uso.get("tokens_out") or (
+            estimate_tokens(response.text) if response is not None else 0
+        )
+        cached_tokens = uso.get("cached_tokens", 0)
+        self.metrics.model_call(
+            task=tarea,
+            model=modelo,
+            wall_ms=round((time.perf_counter() - inicio) * 1000, 1),
+            attempts=intentos,
+            retries=max(0, intentos - 1),
+            tokens_in=tokens_in if response is not None else 0,
+            tokens_out=tokens_out,
+            cached_tokens=cached_tokens,
+            prefix_inline_tokens=uso.get("prefix_inline_tokens", 0),
+            cost_usd=(
+                round(estimate_cost(modelo, tokens_in, tokens_out, cached_tokens), 6)
+                if response is not None
+                else 0.0
+            ),
+            ok=error is None,
+            error=str(error)[:200] if error is not None else None,
+        )
+
+    def _respaldo_premium(self, datos: Dict, error: Exception) -> Dict:
+        """
+        Contenido premium desde la plantilla compilada cuando la IA no
+        responde. Se marca como respaldo y no se guarda en caché, así la
+        próxima corrida lo vuelve a generar con IA. Los errores que no son
+        transitorios (API key inválida, modelo inexistente) se propagan.
+        """
+        # Sin proveedor configurado es un error de configuración, no de la IA
+        if (
+            not self.usar_respaldo
+            or self.provider is None
+            or not is_provider_unavailable(error)
+        ):
+            print(f"❌ Error generando con IA: {error}")
+            raise Exception(f"Error crítico en generación IA: {error}")
+
+        print(f"🧩 IA no disponible para {datos['sku']} ({error}), usando plantilla")
+        with self._respaldo_lock:
+            self.respaldos += 1
+        self.metrics.annotate(fallback=True)
+
+        info = datos["info_completa"]
+        seo = self.generate_seo_metadata(info)
+        html = render_fallback(info, datos["config"])
+        return {
+            "descripcion": self._descripcion_texto_respaldo(info),
+            "descripcion_html": self._compactar_html(datos["sku"], html)["html"],
+            "seo_titulo": seo["title"],
+            "seo_descripcion": seo["description"],
+            "respaldo": True,
+        }
+
+    def _descripcion_texto_respaldo(self, info: Dict) -> str:
+        """Descripción en texto plano con las especificaciones disponibles"""
+        lineas = [info.get("nombre", "Producto")]
+        especificaciones, _ = format_spec_lines(info, CAMPOS_PROMPT_PREMIUM[1:])
+        if especificaciones:
+            lineas.append(especificaciones)
+        return "\n".join(lineas)
+
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Reintentos, hedging, circuit breaker y productos con plantilla"""
+        with self._respaldo_lock:
+            respaldos = self.respaldos
+        return {**self.resilience.stats(), "fallbacks": respaldos}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Histogramas de latencia (wall y TTFB), tokens, costo, reintentos y
+        aciertos de caché de la sesión y de los últimos lotes
+        """
+        return self.metrics.snapshot()
+
+    def get_provider_stats(self) -> Dict[str, Any]:
+        """Llamadas, tokens y, con router, latencia y errores por modelo"""
+        if self.provider is None:
+            return {}
+        return self.provider.stats()
+
+    async def _agenerate_content(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        prefijo: Optional[PromptPrefix] = None,
+    ) -> Any:
+        """Llamada asíncrona al proveedor"""
+        return await self._proveedor().agenerate(
+            prompt, generation_config, prefix=prefijo, task=TAREA_HTML
+        )
+
+    async def agenerar_descripcion(
+        self,
+        product_info: Dict,
+        config: Dict,
+        limiter: Optional[AsyncRateLimiter] = None,
+        contenido_pdf: Optional[Dict] = None,
+        max_retries: int = 4,
+        tokens_salida_estimados: int = 3000,
+    ) -> Dict:
+        """
+        Versión asíncrona de generar_descripcion_detallada_html_premium_con_ia
+        Respeta el limitador de tasa y reintenta con backoff ante errores 429
+        """
+        with self.metrics.generation(get_product_sku(product_info), "async"):
+            return await self._agenerar_premium(
+                product_info,
+                config,
+                limiter,
+                contenido_pdf,
+                max_retries,
+                tokens_salida_estimados,
+            )
+
+    async def _agenerar_premium(
+        self,
+        product_info: Dict,
+        config: Dict,
+        limiter: Optional[AsyncRateLimiter],
+        contenido_pdf: Optional[Dict],
+        max_retries: int,
+        tokens_salida_estimados: int,
+    ) -> Dict:
+        datos = await asyncio.to_thread(
+            self._preparar_producto_premium, product_info, config, contenido_pdf
+        )
+
+        cached = self._buscar_en_cache(datos)
+        if cached is not None:
+            return cached
+
+        prefijo, sufijo = self._construir_prompt_premium(datos)
+        tokens_estimados = datos["prompt_stats"]["tokens"] + tokens_salida_estimados
+
+        intentos = []
+
+        def crear_llamada():
+            intentos.append(1)
+            return self._agenerate_content(sufijo, GENERATION_CONFIG_PREMIUM, prefijo)
+
+        for intento in range(max_retries + 1):
+            if limiter is not None:
+                await limiter.acquire(tokens_estimados)
+
+            intentos.clear()
+            inicio = time.perf_counter()
+            try:
+                # El 429 lo maneja este bucle con el limitador; la capa de
+                # resiliencia reintenta el resto de los errores transitorios
+                response = await self.resilience.acall(
+                    crear_llamada, retry_on=_reintentable_sin_cuota
+                )
+                self._registrar_llamada(
+                    TAREA_HTML, inicio, len(intentos), sufijo, response
+                )
+            except Exception as e:
+                self._registrar_llamada(
+                    TAREA_HTML, inicio, len(intentos), sufijo, error=e
+                )
+                if is_quota_error(e) and intento < max_retries:
+                    if limiter is not None:
+                        espera = limiter.on_throttle(intento)
+                    else:
+                        espera = 2.0 * (2**intento)
+                        await asyncio.sleep(espera)
+                    print(
+                        f"⏳ Cuota excedida ({datos['sku']}), reintento en {espera:.1f}s"
+                    )
+                    continue
+                return self._respaldo_premium(datos, e)
+
+            if limiter is not None:
+                limiter.on_success()
+
+            try:
+                # Los pedidos de campos faltantes son sincrónicos
+                return await asyncio.to_thread(
+                    self._procesar_respuesta_premium, datos, response.text
+                )
+            except Exception as e:
+                print(f"❌ Error generando con IA: {e}")
+                raise Exception(f"Error crítico en generación IA: {e}")
+
+    async def agenerate_many(
+        self,
+        products: List[Dict],
+        config: Dict,
+        concurrency: int = 4,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 1_000_000,
+        limiter: Optional[AsyncRateLimiter] = None,
+        contenidos_pdf: Optional[Dict[str, Dict]] = None,
+    ) -> Dict:
+        """
+        Genera muchos productos en paralelo con un tope de concurrencia y un
+        limitador de RPM/TPM. Uso: asyncio.run(handler.agenerate_many(...))
+        """
+        if limiter is None:
+            limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+        contenidos_pdf = contenidos_pdf or {}
+        semaforo = asyncio.Semaphore(max(1, concurrency))
+        resultados = {}
+        errores = {}
+
+        async def generar(product):
+            sku = get_product_sku(product)
+            async with semaforo:
+                try:
+                    resultados[sku] = await self.agenerar_descripcion(
+                        product,
+                        config,
+                        limiter=limiter,
+                        contenido_pdf=contenidos_pdf.get(sku),
+                    )
+                except Exception as e:
+                    errores[sku] = str(e)
+
+        inicio = time.monotonic()
+        with self.metrics.batch(
+            "async", products=len(products), concurrency=concurrency
+        ) as lote:
+            await asyncio.gather(*(generar(product) for product in products))
+            lote["errors"] = len(errores)
+
+        return {
+            "resultados": resultados,
+            "errores": errores,
+            "stats": {
+                **limiter.stats(),
+                "products": len(products),
+                "seconds": round(time.monotonic() - inicio, 2),
+                "concurrency": concurrency,
+            },
+        }
+
+    def _estimar_tokens(self, texto: str) -> int:
+        """Estimación aproximada de tokens (≈ 4 caracteres por token)"""
+        return estimate_tokens(texto)
+
+    def _agrupar_por_presupuesto(
+        self,
+        pendientes: List[Dict],
+        token_budget: int,
+        tokens_salida_por_producto: int,
+        max_output_tokens: int,
+    ) -> List[List[Dict]]:
+        """Arma grupos de productos que entran en el presupuesto de tokens"""
+        instrucciones = self._instrucciones_premium(
+            pdf_url=URL_FICHA_PLACEHOLDER, **pendientes[0]["contacto"]
+        )
+        tokens_fijos = self._estimar_tokens(instrucciones)
+        max_por_salida = max(1, max_output_tokens // tokens_salida_por_producto)
+
+        grupos = []
+        actual = []
+        usados = tokens_fijos
+        for datos in pendientes:
+            tokens = self._estimar_tokens(
+                self._bloque_producto_premium(
+                    datos["info_completa"], datos["texto_pdf"]
+                )
+            )
+            if actual and (
+                usados + tokens > token_budget or len(actual) >= max_por_salida
+            ):
+                grupos.append(actual)
+                actual = []
+                usados = tokens_fijos
+            actual.append(datos)
+            usados += tokens
+
+        if actual:
+            grupos.append(actual)
+        return grupos
+
+    def _generar_prompt_agrupado(
+        self, grupo: List[Dict], max_output_tokens: int
+    ) -> Dict[str, Any]:
+        """Genera varios productos en una sola llamada. Retorna items por SKU"""
+        contacto = grupo[0]["contacto"]
+        whatsapp = contacto["whatsapp"]
+        email = contacto["email"]
+        telefono_display = contacto["telefono_display"]
+        website = contacto["website"]
+
+        bloques = "\n        \n        ".join(
+            f"=== PRODUCTO SKU {datos['sku']} ===\n        "
+            + self._bloque_producto_premium(datos["info_completa"], datos["texto_pdf"])
+            for datos in grupo
+        )
+        fichas = "\n        ".join(
+            f"- SKU {datos['sku']}: {datos['pdf_url']}" for datos in grupo
+        )
+        instrucciones = self._instrucciones_premium(
+            pdf_url=URL_FICHA_PLACEHOLDER, **contacto
+        )
+
         prompt = f"""
         Eres un experto en marketing de equipos industriales y desarrollo web.
         
-        PRODUCTO: {info_completa.get('nombre', 'Producto')}
-        
-        ESPECIFICACIONES TÉCNICAS:
-        - SKU: {info_completa.get('sku', '')}
-        - Marca: {info_completa.get('marca', '')}
-        - Modelo: {info_completa.get('modelo', '')}
-        - Familia: {info_completa.get('familia', '')}
-        - Potencia: {info_completa.get('potencia_kva', '')} KVA
-        - Motor: {info_completa.get('motor', '')}
-        - Consumo: {info_completa.get('consumo', '')} L/h
-        - Tanque: {info_completa.get('tanque', '')} L
-        - Voltaje: {info_completa.get('voltaje', '')} V
-        - Frecuencia: {info_completa.get('frecuencia', '')} Hz
-        - Dimensiones: {info_completa.get('largo', '')}x{info_completa.get('ancho', '')}x{info_completa.get('alto', '')} mm
-        - Peso: {info_completa.get('peso', '')} kg
+        Vas a generar el contenido de {len(grupo)} productos distintos.
         
-        INFORMACIÓN ADICIONAL DEL PDF:
-        {texto_pdf[:1500]}
+        {bloques}
         
-        DATOS DE CONTACTO A USAR:
+        DATOS DE CONTACTO A USAR (iguales para todos los productos):
         - WhatsApp: {whatsapp}
         - Email: {email}
         - Teléfono: {telefono_display}
         - Website: {website}
         
-        GENERA UN JSON con estos 4 elementos:
+        FICHA TÉCNICA DE CADA PRODUCTO (reemplaza {URL_FICHA_PLACEHOLDER} con la del producto):
+        {fichas}
+        
+        PARA CADA PRODUCTO GENERA UN OBJETO JSON con el campo "sku" y estos 4 elementos:
+        
+        {instrucciones}
+        
+        Responde SOLO con un array JSON con un objeto por producto, en el mismo orden, sin explicaciones adicionales.
+        """
+
+        response = self._llamar_modelo(
+            prompt, {"temperature": 0.7, "max_output_tokens": max_output_tokens}
+        )
+
+        items = self._parsear_json_ia(response.text)
+        if isinstance(items, dict):
+            items = items.get("productos", [items])
+
+        por_sku = {}
+        for item in items:
+            if isinstance(item, dict):
+                por_sku[str(item.get("sku", ""))] = item
+        return por_sku
+
+    def generar_descripciones_agrupadas(
+        self,
+        products: List[Dict],
+        config: Dict,
+        contenidos_pdf: Optional[Dict[str, Dict]] = None,
+        token_budget: int = 12000,
+        tokens_salida_por_producto: int = 3000,
+        max_output_tokens: int = 8192,
+    ) -> Dict:
+        """
+        Genera varios productos por llamada a la IA, agrupados según un
+        presupuesto de tokens. Cada item se valida por separado y los que
+        fallan se reintentan individualmente.
+        """
+        with self.metrics.batch("agrupado", products=len(products)) as lote:
+            salida = self._generar_agrupadas(
+                products,
+                config,
+                contenidos_pdf,
+                token_budget,
+                tokens_salida_por_producto,
+                max_output_tokens,
+            )
+            lote.update(salida["stats"], errors=len(salida["errores"]))
+        return salida
+
+    def _generar_agrupadas(
+        self,
+        products: List[Dict],
+        config: Dict,
+        contenidos_pdf: Optional[Dict[str, Dict]],
+        token_budget: int,
+        tokens_salida_por_producto: int,
+        max_output_tokens: int,
+    ) -> Dict:
+        contenidos_pdf = contenidos_pdf or {}
+        resultados = {}
+        errores = {}
+        stats = {
+            "cache_hits": 0,
+            "round_trips": 0,
+            "batched_products": 0,
+            "retried_individually": 0,
+            "instruction_tokens_saved": 0,
+        }
+
+        # Preparar todos los productos y resolver los que ya están en caché
+        pendientes = []
+        for product in products:
+            datos = self._preparar_producto_premium(
+                product, config, contenidos_pdf.get(get_product_sku(product))
+            )
+            cached = self._buscar_en_cache(datos)
+            if cached is not None:
+                resultados[datos["sku"]] = cached
+                stats["cache_hits"] += 1
+            else:
+                pendientes.append(datos)
+
+        individuales = []
+        reintentar = []
+        if pendientes:
+            grupos = self._agrupar_por_presupuesto(
+                pendientes, token_budget, tokens_salida_por_producto, max_output_tokens
+            )
+            tokens_instrucciones = self._estimar_tokens(
+                self._instrucciones_premium(
+                    pdf_url=URL_FICHA_PLACEHOLDER, **pendientes[0]["contacto"]
+                )
+            )
+
+            for grupo in grupos:
+                if len(grupo) == 1:
+                    individuales.extend(grupo)
+                    continue
+
+                stats["round_trips"] += 1
+                try:
+                    por_sku = self._generar_prompt_agrupado(grupo, max_output_tokens)
+                except Exception as e:
+                    print(f"⚠️ Error en generación agrupada: {e}")
+                    reintentar.extend(grupo)
+                    continue
+
+                stats["instruction_tokens_saved"] += tokens_instrucciones * (
+                    len(grupo) - 1
+                )
+                for datos in grupo:
+                    item = por_sku.get(datos["sku"])
+                    try:
+                        self._validar_resultado_premium(item)
+                    except ValueError:
+                        reintentar.append(datos)
+                        continue
+
+                    item = {campo: item[campo] for campo in CAMPOS_REQUERIDOS}
+                    # La URL de la ficha se completa localmente
+                    self._postprocesar_html(datos, item)
+                    if "descripcion_html" not in item:
+                        reintentar.append(datos)
+                        continue
+                    self._guardar_en_cache(datos, item)
+                    resultados[datos["sku"]] = item
+                    stats["batched_products"] += 1
+
+        # Los items inválidos o sin grupo se generan de a uno
+        stats["retried_individually"] = len(reintentar)
+        for datos in individuales + reintentar:
+            stats["round_trips"] += 1
+            try:
+                resultados[datos["sku"]] = (
+                    self.generar_descripcion_detallada_html_premium_con_ia(
+                        datos["product_info"],
+                        config,
+                        contenido_pdf=contenidos_pdf.get(datos["sku"]),
+                    )
+                )
+            except Exception as e:
+                errores[datos["sku"]] = str(e)
+
+        return {"resultados": resultados, "errores": errores, "stats": stats}
+
+    def generar_descripciones_lote(
+        self, products: List[Dict], config: Dict, token_budget: Optional[int] = None
+    ) -> Dict:
+        """
+        Genera las descripciones de un lote extrayendo cada PDF único una vez
+        Con token_budget agrupa varios productos por llamada a la IA
+        Retorna los resultados por SKU, los errores y el reporte de PDFs
+        """
+        with self.metrics.batch("lote", products=len(products)) as lote:
+            salida = self._generar_lote(products, config, token_budget)
+            lote["errors"] = len(salida["errores"])
+        return salida
+
+    def _generar_lote(
+        self, products: List[Dict], config: Dict, token_budget: Optional[int]
+    ) -> Dict:
+        plan = PdfBatchPlanner(self).prepare(products)
+
+        if token_budget:
+            contenidos_pdf = {
+                get_product_sku(product): plan.content_for(product)
+                for product in products
+            }
+            salida = self.generar_descripciones_agrupadas(
+                products, config, contenidos_pdf, token_budget=token_budget
+            )
+            return {**salida, "pdf_report": plan.report()}
+
+        resultados = {}
+        errores = {}
+        for product in products:
+            sku = get_product_sku(product)
+            try:
+                resultados[sku] = (
+                    self.generar_descripcion_detallada_html_premium_con_ia(
+                        product, config, contenido_pdf=plan.content_for(product)
+                    )
+                )
+            except Exception as e:
+                errores[sku] = str(e)
+
+        return {
+            "resultados": resultados,
+            "errores": errores,
+            "pdf_report": plan.report(),
+        }
+
+    def _contexto_producto_premium(
+        self, info_completa: Dict, texto_pdf: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Bloque del prompt premium con los datos de un producto y su tamaño"""
+        especificaciones, extracto, stats = self.prompt_builder.product_context(
+            info_completa, texto_pdf, campos=CAMPOS_PROMPT_PREMIUM, indent="        "
+        )
+        bloque = f"""PRODUCTO: {info_completa.get('nombre', 'Producto')}
+        
+        ESPECIFICACIONES TÉCNICAS:
+{especificaciones}"""
+        if extracto:
+            bloque += f"""
         
-        1. "descripcion": Descripción técnica en texto plano (8-10 líneas) siguiendo este formato EXACTO:
+        INFORMACIÓN ADICIONAL DEL PDF:
+        {extracto}"""
+        return bloque, stats
+
+    def _bloque_producto_premium(self, info_completa: Dict, texto_pdf: str) -> str:
+        """Bloque del prompt premium con los datos de un producto"""
+        return self._contexto_producto_premium(info_completa, texto_pdf)[0]
+
+    def _instrucciones_premium(
+        self,
+        whatsapp: str,
+        email: str,
+        telefono_display: str,
+        website: str,
+        pdf_url: str,
+    ) -> str:
+        """Instrucciones y diseño HTML del prompt premium (iguales para todos)"""
+        return f"""1. "descripcion": Descripción técnica en texto plano (8-10 líneas) siguiendo este formato EXACTO:
            ========================================
            [MARCA] [MODELO]
            ========================================
@@ -380,51 +1494,32 @@ class EnhancedAIHandler:
         - Reemplaza TODOS los placeholders [CAMPO] con los datos reales
         - El HTML debe estar completo y listo para usar
         - NO uses emojis
-        - Mantén EXACTAMENTE la estructura mostrada
-        
-        Responde SOLO con el JSON, sin explicaciones adicionales.
-        """
-
-        try:
-            # Llamar a la IA
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 8000,
-                },
-            )
-
-            # Parsear respuesta
-            texto_respuesta = response.text.strip()
-            # Limpiar posibles marcadores de código
-            texto_respuesta = re.sub(r"^```json\s*", "", texto_respuesta)
-            texto_respuesta = re.sub(r"\s*```$", "", texto_respuesta)
+        - Mantén EXACTAMENTE la estructura mostrada"""
 
-            resultado = json.loads(texto_respuesta)
+    def invalidate_cache(self, sku: str) -> int:
+        """Invalida las generaciones guardadas de un SKU"""
+        if self.cache is None:
+            return 0
+        return self.cache.invalidate_sku(sku)
 
-            # Validar que tenga todos los campos
-            campos_requeridos = [
-                "descripcion",
-                "descripcion_html",
-                "seo_titulo",
-                "seo_descripcion",
-            ]
-            for campo in campos_requeridos:
-                if campo not in resultado:
-                    raise ValueError(f"Falta el campo {campo} en la respuesta de IA")
-
-            return resultado
-
-        except Exception as e:
-            print(f"❌ Error generando con IA: {e}")
-            raise Exception(f"Error crítico en generación IA: {e}")
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de generaciones"""
+        if self.cache is None:
+            return {}
+        return self.cache.stats()
 
     def _generate_with_ai(
         self, product_info: Dict, pdf_content: Dict, config: Dict
     ) -> str:
         """Genera descripción usando IA con contexto del PDF"""
 
+        especificaciones, extracto, stats = self.prompt_builder.product_context(
+            product_info,
+            pdf_content.get("text", ""),
+            exclude=("nombre", "marca", "modelo", "familia", "pdf_url"),
+            indent="        ",
+        )
+
         prompt = f"""
         Eres un experto en marketing de productos industriales. Genera una descripción HTML COMPLETA y ATRACTIVA para el siguiente producto.
         
@@ -435,10 +1530,10 @@ class EnhancedAIHandler:
         - Familia: {product_info.get('familia', '')}
         
         ESPECIFICACIONES TÉCNICAS:
-        {json.dumps(product_info, indent=2, ensure_ascii=False)}
+{especificaciones}
         
         INFORMACIÓN ADICIONAL DEL PDF:
-        {pdf_content.get('text', '')[:1500]}
+        {extracto}
         
         INSTRUCCIONES:
         1. Crea una descripción HTML completa con estas secciones:
@@ -463,8 +1558,10 @@ class EnhancedAIHandler:
         IMPORTANTE: Devuelve SOLO el código HTML, sin explicaciones.
         """
 
+        self._registrar_prompt(get_product_sku(product_info), prompt, stats)
+
         try:
-            response = self.model.generate_content(prompt)
+            response = self._llamar_modelo(prompt)
             html = response.text.strip()
 
             # Limpiar respuesta
@@ -474,7 +1571,10 @@ class EnhancedAIHandler:
             # Agregar información de contacto
             html = self._add_contact_section(html, config)
 
-            return html
+            reporte = self._compactar_html(get_product_sku(product_info), html)
+            if reporte["over_budget"]:
+                return self._generate_fallback_enhanced(product_info, config)
+            return reporte["html"]
 
         except Exception as e:
             print(f"⚠️ Error generando con IA: {e}")
@@ -482,236 +1582,22 @@ class EnhancedAIHandler:
 
     def _generate_fallback_enhanced(self, product_info: Dict, config: Dict) -> str:
         """Genera una descripción HTML atractiva sin IA"""
-
-        nombre = product_info.get("nombre", "Producto")
-        marca = product_info.get("marca", "")
-        modelo = product_info.get("modelo", "")
-        precio = product_info.get("precio", 0)
-
-        # Especificaciones disponibles
-        specs_html = ""
-        spec_fields = {
-            "potencia": "Potencia",
-            "voltaje": "Voltaje",
-            "frecuencia": "Frecuencia",
-            "motor": "Motor",
-            "consumo": "Consumo",
-            "peso": "Peso",
-            "dimensiones": "Dimensiones",
-        }
-
-        for field, label in spec_fields.items():
-            if product_info.get(field):
-                specs_html += f"""
-                <tr>
-                    <td style="font-weight: bold; padding: 10px; border-bottom: 1px solid #eee;">{label}</td>
-                    <td style="padding: 10px; border-bottom: 1px solid #eee;">{product_info[field]}</td>
-                </tr>
-                """
-
-        html = f"""
-        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 900px; margin: 0 auto; background: #fff;">
-            
-            <!-- Header del Producto -->
-            <div style="background: linear-gradient(135deg, #ff6600 0%, #ff8533 100%); color: white; padding: 30px; border-radius: 15px 15px 0 0; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                <h1 style="margin: 0; font-size: 2.5em; font-weight: 700; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);">
-                    {nombre.upper()}
-                </h1>
-                {f'<p style="margin: 10px 0 0 0; font-size: 1.2em; opacity: 0.95;">{marca} - {modelo}</p>' if marca or modelo else ''}
-            </div>
-            
-            <!-- Descripción Principal -->
-            <div style="padding: 30px; background: #f8f9fa; border-radius: 0 0 15px 15px;">
-                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
-                    <h2 style="color: #ff6600; margin-bottom: 15px; font-size: 1.8em;">
-                        <span style="margin-right: 10px;">🎯</span>Descripción General
-                    </h2>
-                    <p style="line-height: 1.8; color: #555; font-size: 1.1em; margin-bottom: 15px;">
-                        El <strong>{nombre}</strong> es un equipo de alta calidad diseñado para satisfacer las necesidades más exigentes del mercado. 
-                        Con tecnología de vanguardia y construcción robusta, este producto garantiza un rendimiento excepcional y durabilidad superior.
-                    </p>
-                    <p style="line-height: 1.8; color: #555; font-size: 1.1em;">
-                        Fabricado por <strong>{marca}</strong>, líder reconocido en el sector, este modelo combina innovación, 
-                        eficiencia y confiabilidad para brindar una solución integral a sus requerimientos.
-                    </p>
-                </div>
-                
-                <!-- Características Destacadas -->
-                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
-                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
-                        <span style="margin-right: 10px;">⭐</span>Características Destacadas
-                    </h2>
-                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 15px;">
-                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
-                            <strong style="color: #ff6600;">✓ Alta Eficiencia</strong>
-                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Optimización máxima de recursos</p>
-                        </div>
-                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
-                            <strong style="color: #ff6600;">✓ Durabilidad Garantizada</strong>
-                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Construcción robusta y confiable</p>
-                        </div>
-                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
-                            <strong style="color: #ff6600;">✓ Fácil Mantenimiento</strong>
-                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Diseño accesible y práctico</p>
-                        </div>
-                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
-                            <strong style="color: #ff6600;">✓ Soporte Técnico</strong>
-                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Asistencia profesional garantizada</p>
-                        </div>
-                    </div>
-                </div>
-                
-                <!-- Especificaciones Técnicas -->
-                {f'''
-                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
-                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
-                        <span style="margin-right: 10px;">📊</span>Especificaciones Técnicas
-                    </h2>
-                    <table style="width: 100%; border-collapse: collapse;">
-                        {specs_html}
-                    </table>
-                </div>
-                ''' if specs_html else ''}
-                
-                <!-- Aplicaciones -->
-                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
-                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
-                        <span style="margin-right: 10px;">🏭</span>Aplicaciones Principales
-                    </h2>
-                    <ul style="list-style: none; padding: 0;">
-                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
-                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
-                            <strong>Industria:</strong> Ideal para procesos productivos continuos
-                        </li>
-                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
-                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
-                            <strong>Comercio:</strong> Perfecto para aplicaciones comerciales exigentes
-                        </li>
-                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
-                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
-                            <strong>Servicios:</strong> Solución confiable para el sector servicios
-                        </li>
-                        <li style="padding: 10px 0;">
-                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
-                            <strong>Proyectos Especiales:</strong> Adaptable a requerimientos específicos
-                        </li>
-                    </ul>
-                </div>
-                
-                <!-- Beneficios -->
-                <div style="background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%); padding: 25px; border-radius: 10px; margin-bottom: 20px;">
-                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em; text-align: center;">
-                        ¿Por qué elegir este producto?
-                    </h2>
-                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; text-align: center;">
-                        <div>
-                            <div style="font-size: 3em; margin-bottom: 10px;">💪</div>
-                            <strong style="color: #ff6600;">Máximo Rendimiento</strong>
-                        </div>
-                        <div>
-                            <div style="font-size: 3em; margin-bottom: 10px;">🛡️</div>
-                            <strong style="color: #ff6600;">Garantía Extendida</strong>
-                        </div>
-                        <div>
-                            <div style="font-size: 3em; margin-bottom: 10px;">💰</div>
-                            <strong style="color: #ff6600;">Mejor Precio-Calidad</strong>
-                        </div>
-                        <div>
-                            <div style="font-size: 3em; margin-bottom: 10px;">🚀</div>
-                            <strong style="color: #ff6600;">Entrega Inmediata</strong>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>
-        """
-
-        # Agregar sección de contacto
-        html = self._add_contact_section(html, config)
-
-        return html
+        return render_fallback(product_info, config)
 
     def _add_contact_section(self, html: str, config: Dict) -> str:
         """Agrega sección de contacto al HTML"""
+        return insert_contact(html, config)
 
-        if not config:
-            config = {
-                "whatsapp": "541139563099",
-                "email": "info@generadores.ar",
-                "telefono_display": "+54 11 3956-3099",
-                "website": "www.generadores.ar",
-            }
-
-        contact_section = f"""
-        <!-- Sección de Contacto -->
-        <div style="background: #333; color: white; padding: 30px; text-align: center; margin-top: 30px; border-radius: 15px;">
-            <h2 style="margin-bottom: 20px; font-size: 2em;">¡Contáctanos Ahora!</h2>
-            <p style="font-size: 1.2em; margin-bottom: 25px; opacity: 0.9;">
-                Nuestro equipo de expertos está listo para asesorarte
-            </p>
-            <div style="display: flex; justify-content: center; gap: 20px; flex-wrap: wrap;">
-                <a href="https://wa.me/{config['whatsapp']}" 
-                   style="background: #25D366; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
-                    <span style="font-size: 1.5em;">📱</span> WhatsApp
-                </a>
-                <a href="mailto:{config['email']}" 
-                   style="background: #ff6600; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
-                    <span style="font-size: 1.5em;">✉️</span> Email
-                </a>
-                <a href="tel:{config['whatsapp']}" 
-                   style="background: #0066cc; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
-                    <span style="font-size: 1.5em;">📞</span> {config['telefono_display']}
-                </a>
-            </div>
-        </div>
-        """
-
-        # Insertar antes del cierre del div principal
-        html = html.replace("</div>", contact_section + "</div>", 1)
-
-        return html
+    def generar_catalogo_fallback(
+        self, products: List[Dict], config: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """Descripciones de respaldo para todo el catálogo, sin llamadas a la IA"""
+        return render_catalog(products, config)
 
     def generate_seo_metadata(self, product_info: Dict) -> Dict[str, str]:
-        """Genera metadata SEO optimizada"""
-
-        nombre = product_info.get("nombre", "Producto")
-        marca = product_info.get("marca", "")
-        modelo = product_info.get("modelo", "")
-        familia = product_info.get("familia", "")
-
-        # Título SEO
-        title_parts = [nombre]
-        if marca:
-            title_parts.append(marca)
-        if modelo:
-            title_parts.append(modelo)
-        title_parts.append("Mejor Precio")
-
-        seo_title = " - ".join(title_parts)[:60]  # Límite de 60 caracteres
-
-        # Descripción SEO
-        seo_description = f"Compra {nombre} al mejor precio. "
-        if marca:
-            seo_description += f"Producto original {marca}. "
-        seo_description += (
-            "Envío inmediato, garantía oficial y soporte técnico especializado. "
-        )
-        seo_description += "¡Consulta ofertas especiales!"
-        seo_description = seo_description[:160]  # Límite de 160 caracteres
-
-        # Keywords
-        keywords = []
-        keywords.append(nombre.lower())
-        if marca:
-            keywords.append(marca.lower())
-        if modelo:
-            keywords.append(modelo.lower())
-        if familia:
-            keywords.append(familia.lower())
-        keywords.extend(["comprar", "precio", "oferta", "venta"])
+        """Genera metadata SEO optimizada (cortada en límites de palabra)"""
+        return seo_for_product(product_info)
 
-        return {
-            "title": seo_title,
-            "description": seo_description,
-            "keywords": ", ".join(keywords),
-        }
+    def generar_seo_catalogo(self, productos: List[Dict]) -> Dict[str, Dict[str, str]]:
+        """Metadata SEO de todo el catálogo, por SKU"""
+        return generate_seo_catalog(productos)["seo"]
@@ -0,0 +1,1409 @@
+"""
+Benchmarks de rendimiento para STEL Shop
+Uso: python benchmark.py <escenario> [opciones]
+Ejecutar python benchmark.py --help para ver los escenarios disponibles
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import (
+    BaseHTTPRequestHandler,
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from typing import Callable, Dict, List
+
+_BRANDS = ["Cummins", "Perkins", "Deutz", "Honda", "Kohler", "Yanmar", "FPT"]
+
+_BOILERPLATE = (
+    "La información contenida en este documento es de carácter orientativo y "
+    "puede ser modificada sin previo aviso. Las imágenes son ilustrativas. "
+    "El fabricante se reserva el derecho de introducir cambios en el diseño, "
+    "potencia nominal declarada según normas ISO 8528 y condiciones de "
+    "referencia. Todos los derechos reservados. Prohibida su reproducción total "
+    "o parcial sin autorización escrita. Garantía sujeta a condiciones de uso y "
+    "mantenimiento indicadas en el manual del operador. "
+)
+
+
+def datasheet_corpus(pages: int = 300, seed: int = 7) -> List[str]:
+    """Genera páginas de texto con la forma de fichas técnicas reales"""
+    rnd = random.Random(seed)
+    corpus = []
+
+    for index in range(pages):
+        kind = index % 3
+        marca = rnd.choice(_BRANDS)
+        kva = rnd.choice([5.5, 7.5, 10, 15, 20, 30, 45, 60, 100, 150, 250, 500])
+        kw = round(kva * 0.8, 1)
+
+        if kind == 0:
+            # Portada con texto legal y la palabra potencia lejos de la unidad
+            page = (
+                f"FICHA TÉCNICA\nGRUPO ELECTRÓGENO {marca.upper()} "
+                f"{int(kva)} KVA\nSoluciones de potencia para la industria\n"
+                + _BOILERPLATE * rnd.randint(4, 8)
+            )
+        elif kind == 1:
+            # Tabla de especificaciones
+            separator = rnd.choice([": ", " ", " .......... "])
+            page = "\n".join(
+                [
+                    "ESPECIFICACIONES TÉCNICAS / TECHNICAL DATA",
+                    f"Potencia Prime{separator}{kva} kVA / {kw} kW",
+                    f"Potencia Stand-by{separator}{round(kva * 1.1, 1)} kVA",
+                    f"Tensión{separator}{rnd.choice(['380/220', '220', '400/230'])} V",
+                    f"Frecuencia{separator}{rnd.choice([50, 60])} Hz",
+                    f"Motor{separator}{marca} {rnd.randint(2, 6)}"
+                    f"{rnd.choice(['BTA', 'TG', 'TAG'])}{rnd.randint(1, 9)}.{rnd.randint(1, 9)}",
+                    f"Consumo al 75%{separator}{round(kw * 0.27, 1)} l/h",
+                    f"Dimensiones (L x A x H){separator}"
+                    f"{rnd.randint(900, 4000)} x {rnd.randint(500, 1500)} x "
+                    f"{rnd.randint(700, 2000)} mm",
+                    f"Peso en seco{separator}{rnd.randint(80, 4000)} kg",
+                ]
+                + [_BOILERPLATE[:200]] * rnd.randint(1, 3)
+            )
+        else:
+            # Prosa larga: palabras clave sin unidad cerca (peor caso para .*?)
+            page = (
+                "El motor diesel de cuatro tiempos ofrece potencia confiable. "
+                "El consumo optimizado y la tensión estable garantizan frecuencia "
+                "constante, peso reducido y dimensiones compactas. "
+            ) + _BOILERPLATE * rnd.randint(8, 14)
+
+        corpus.append(page)
+
+    return corpus
+
+
+_FAMILIES = ["Grupos Electrógenos", "Motobombas", "Compresores", "Hidrolavadoras"]
+
+
+def catalog_products(count: int = 1000, seed: int = 7) -> List[Dict]:
+    """Productos sintéticos con el formato de format_product"""
+    rnd = random.Random(seed)
+    products = []
+
+    for index in range(count):
+        marca = rnd.choice(_BRANDS)
+        familia = rnd.choice(_FAMILIES)
+        kva = rnd.choice([5.5, 7.5, 10, 15, 20, 30, 45, 60, 100, 150, 250, 500])
+        modelo = f"{marca[:3].upper()}{int(kva)}-{rnd.randint(1, 99)}"
+        products.append(
+            {
+                "sku": f"STL{index:06d}",
+                "nombre": f"{familia[:-1]} {marca} {kva} KVA {modelo}",
+                "marca": marca,
+                "modelo": modelo,
+                "familia": familia,
+                "precio": round(rnd.uniform(300, 90000), 2),
+                "stock": rnd.randint(0, 40),
+                "pdf_url": f"{marca.lower()}/{modelo.lower()}.pdf",
+                "potencia": f"{kva} KVA" if rnd.random() < 0.8 else "",
+                "voltaje": rnd.choice(["220 V", "380/220 V", ""]),
+                "motor": (
+                    f"{marca} {rnd.randint(2, 6)}TAG" if rnd.random() < 0.6 else ""
+                ),
+                "frecuencia": rnd.choice(["50 Hz", "60 Hz", ""]),
+                "consumo": f"{round(kva * 0.22, 1)} L/h" if rnd.random() < 0.5 else "",
+            }
+        )
+
+    return products
+
+
+def legacy_extract_specifications(text: str) -> Dict[str, str]:
+    """Implementación anterior de _extract_specifications (referencia)"""
+    specs = {}
+    patterns = {
+        "potencia": r"(?:potencia|power).*?(\d+\.?\d*)\s*(?:kva|kw)",
+        "voltaje": r"(?:voltaje|voltage|tensión).*?(\d+)\s*v",
+        "frecuencia": r"(?:frecuencia|frequency).*?(\d+)\s*hz",
+        "motor": r"(?:motor|engine).*?([A-Za-z0-9\s\-]+)",
+        "consumo": r"(?:consumo|consumption).*?(\d+\.?\d*)\s*(?:l/h|lph)",
+        "dimensiones": r"(?:dimensiones|dimensions).*?(\d+)\s*x\s*(\d+)\s*x\s*(\d+)",
+        "peso": r"(?:peso|weight).*?(\d+\.?\d*)\s*(?:kg|kilos)",
+    }
+    for key, pattern in patterns.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            specs[key] = (
+                match.group(1)
+                if key != "dimensiones"
+                else f"{match.group(1)}x{match.group(2)}x{match.group(3)}"
+            )
+    return specs
+
+
+def _time_per_item(function: Callable, items: List, repeat: int) -> List[float]:
+    """Tiempo medio por item (segundos) de cada repetición"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        samples.append((time.perf_counter() - started) / len(items))
+    return samples
+
+
+def _report(name: str, samples: List[float], unit: str = "ms", scale: float = 1e3):
+    print(
+        f"   {name:<28} mediana {statistics.median(samples) * scale:8.3f} {unit}"
+        f"   mín {min(samples) * scale:8.3f} {unit}"
+    )
+
+
+def bench_specs(args) -> None:
+    """Extracción de especificaciones: patrón único vs. regex por campo"""
+    from spec_extractor import SpecExtractor
+
+    corpus = datasheet_corpus(args.pages)
+    extractor = SpecExtractor()
+    chars = sum(len(page) for page in corpus) / len(corpus)
+
+    print(f"📄 {len(corpus)} páginas sintéticas ({chars:.0f} caracteres promedio)")
+    print("⏱️  Tiempo por página:")
+    legacy = _time_per_item(legacy_extract_specifications, corpus, args.repeat)
+    single = _time_per_item(extractor.extract, corpus, args.repeat)
+    _report("regex por campo (anterior)", legacy)
+    _report("pasada única", single)
+    print(f"   Mejora: x{statistics.median(legacy) / statistics.median(single):.1f}")
+
+    # Cobertura sobre las páginas de especificaciones
+    spec_pages = corpus[1::3]
+    found_legacy = sum(len(legacy_extract_specifications(p)) for p in spec_pages)
+    found_single = sum(len(extractor.extract_legacy(p)) for p in spec_pages)
+    with_units = sum(
+        "potencia_kw" in extractor.extract(p) and "potencia_kva" in extractor.extract(p)
+        for p in spec_pages
+    )
+    print("🔎 Campos encontrados en páginas de especificaciones:")
+    print(f"   regex por campo: {found_legacy}   pasada única: {found_single}")
+    print(f"   páginas con kVA y kW separados: {with_units}/{len(spec_pages)}")
+
+
+def _pdf_text(value: str) -> str:
+    value = value.encode("latin-1", "replace").decode("latin-1")
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_fixture_pdf(path: Path, pages: int, image_bytes: int, seed: int = 7) -> int:
+    """
+    Escribe un PDF válido con páginas de texto de ficha técnica y una imagen
+    incompresible por página (como un escaneo). Retorna el tamaño en bytes.
+    """
+    rnd = random.Random(seed)
+    corpus = datasheet_corpus(pages, seed)
+    font_id = 3
+    total_objects = 3 + 3 * len(corpus)
+    offsets = {}
+
+    with open(path, "wb") as output:
+
+        def write_object(object_id: int, body: bytes, stream: bytes = None):
+            offsets[object_id] = output.tell()
+            output.write(f"{object_id} 0 obj\n".encode() + body)
+            if stream is not None:
+                output.write(b"\nstream\n" + stream + b"\nendstream")
+            output.write(b"\nendobj\n")
+
+        output.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{4 + 3 * i} 0 R" for i in range(len(corpus)))
+        write_object(
+            2, f"<< /Type /Pages /Kids [{kids}] /Count {len(corpus)} >>".encode()
+        )
+        write_object(
+            font_id,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+            b"/Encoding /WinAnsiEncoding >>",
+        )
+
+        for index, text in enumerate(corpus):
+            page_id = 4 + 3 * index
+            content_id, image_id = page_id + 1, page_id + 2
+
+            lines = [text[i : i + 90] for i in range(0, len(text), 90)][:60]
+            content = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(
+                f"({_pdf_text(line)}) '" for line in lines
+            )
+            content += " ET q 200 0 0 150 350 40 cm /Im1 Do Q"
+            content_bytes = content.encode("latin-1")
+
+            write_object(
+                page_id,
+                (
+                    "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> "
+                    f"/XObject << /Im1 {image_id} 0 R >> >> "
+                    f"/Contents {content_id} 0 R >>"
+                ).encode(),
+            )
+            write_object(
+                content_id,
+                f"<< /Length {len(content_bytes)} >>".encode(),
+                content_bytes,
+            )
+            write_object(
+                image_id,
+                (
+                    "<< /Type /XObject /Subtype /Image /Width 800 /Height 600 "
+                    "/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode "
+                    f"/Length {image_bytes} >>"
+                ).encode(),
+                rnd.randbytes(image_bytes),
+            )
+
+        xref_at = output.tell()
+        output.write(f"xref\n0 {total_objects + 1}\n0000000000 65535 f \n".encode())
+        for object_id in range(1, total_objects + 1):
+            output.write(f"{offsets[object_id]:010d} 00000 n \n".encode())
+        output.write(
+            f"trailer\n<< /Size {total_objects + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref_at}\n%%EOF\n".encode()
+        )
+        return output.tell()
+
+
+def _legacy_pdf_read(url: str) -> Dict:
+    """Lectura anterior de extract_pdf_content: todo en memoria"""
+    from io import BytesIO
+
+    import PyPDF2
+    import requests
+
+    response = requests.get(url, timeout=30)
+    pdf_reader = PyPDF2.PdfReader(BytesIO(response.content))
+    text_content = ""
+    for page in pdf_reader.pages[:5]:
+        text_content += page.extract_text() + "\n"
+    return {
+        "chars": len(text_content),
+        "bytes_read": len(response.content),
+        "pages_parsed": min(5, len(pdf_reader.pages)),
+    }
+
+
+def _streaming_pdf_read(url: str) -> Dict:
+    """Lectura por bloques a disco con tope de tamaño y corte por páginas/texto"""
+    from pdf_extraction import PDF_LIMITS, extract_pdf_text, stream_download
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = Path(tmp_dir) / "ficha.pdf"
+        with open(pdf_path, "wb") as pdf_file:
+            _, bytes_read, _ = stream_download(
+                url, pdf_file, max_bytes=PDF_LIMITS["max_bytes"]
+            )
+        lectura = extract_pdf_text(
+            pdf_path, PDF_LIMITS["max_pages"], PDF_LIMITS["max_chars"]
+        )
+    return {
+        "chars": len(lectura["text"]),
+        "bytes_read": bytes_read,
+        "pages_parsed": lectura["pages_parsed"],
+    }
+
+
+def _peak_rss_worker(mode: str, url: str, results) -> None:
+    """Corre en un proceso aparte para medir su pico de memoria"""
+    import PyPDF2  # noqa: F401  (no contar las importaciones en el pico)
+    import requests  # noqa: F401
+
+    import pdf_extraction  # noqa: F401
+
+    before = _peak_rss_mb()
+    started = time.perf_counter()
+    reader = _legacy_pdf_read if mode == "legacy" else _streaming_pdf_read
+    result = reader(url)
+    result["seconds"] = time.perf_counter() - started
+    result["peak_mb"] = _peak_rss_mb()
+    result["delta_mb"] = result["peak_mb"] - before
+    results.put(result)
+
+
+def _peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso actual (MB)"""
+    # VmHWM es propio del proceso; ru_maxrss hereda el pico del padre en Linux
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _serve_directory(directory: Path) -> ThreadingHTTPServer:
+    handler = partial(_QuietHandler, directory=str(directory))
+    server = _QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Conexiones cortadas a propósito por el tope de descarga
+        pass
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    """Reemplazo local de la Cloud Function: el catálogo con una demora fija"""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.delay)
+        if self.server.fail:
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_catalog(products: List[Dict], delay: float) -> ThreadingHTTPServer:
+    server = _QuietServer(("127.0.0.1", 0), _CatalogHandler)
+    server.body = json.dumps({"products": products}).encode("utf-8")
+    server.delay = delay
+    server.fail = False
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_pdf(args) -> None:
+    """Pico de memoria al leer fichas técnicas grandes"""
+    import multiprocessing
+
+    from pdf_extraction import PDF_LIMITS, PdfTooLargeError, stream_download
+
+    context = multiprocessing.get_context("spawn")
+    pages = min(args.pages, 40)
+    image_bytes = int(args.size_mb * 1024 * 1024 / pages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = Path(tmp) / "ficha.pdf"
+        size = write_fixture_pdf(fixture, pages, image_bytes)
+        server = _serve_directory(Path(tmp))
+        url = f"http://127.0.0.1:{server.server_address[1]}/ficha.pdf"
+        print(f"📄 PDF de prueba: {pages} páginas, {size / 1024 / 1024:.1f} MB")
+
+        try:
+            for mode, name in (
+                ("legacy", "todo en memoria (anterior)"),
+                ("stream", "streaming con tope"),
+            ):
+                samples = []
+                for _ in range(args.repeat):
+                    results = context.Queue()
+                    process = context.Process(
+                        target=_peak_rss_worker, args=(mode, url, results)
+                    )
+                    process.start()
+                    samples.append(results.get())
+                    process.join()
+
+                best = min(samples, key=lambda r: r["delta_mb"])
+                print(
+                    f"   {name:<28} pico +{best['delta_mb']:7.1f} MB"
+                    f"   {statistics.median(r['seconds'] for r in samples):6.2f} s"
+                    f"   leídos {best['bytes_read'] / 1024 / 1024:5.1f} MB"
+                    f"   páginas {best['pages_parsed']}"
+                    f"   texto {best['chars']} caracteres"
+                )
+
+            # El tope de descarga corta antes de leer todo el archivo
+            limit = min(PDF_LIMITS["max_bytes"], size // 2)
+            with open(os.devnull, "wb") as sink:
+                try:
+                    stream_download(url, sink, max_bytes=limit)
+                    print("⚠️ El tope de descarga no se aplicó")
+                except PdfTooLargeError as e:
+                    print(f"🛑 Tope de {limit / 1024 / 1024:.1f} MB: {e}")
+        finally:
+            server.shutdown()
+
+
+def _word_recall(reference: str, extracted: str) -> float:
+    """Fracción de palabras de la página original presentes en el texto"""
+    expected = set(re.findall(r"\w+", reference.lower()))
+    found = set(re.findall(r"\w+", extracted.lower()))
+    return len(expected & found) / len(expected) if expected else 1.0
+
+
+def bench_pdf_parsers(args) -> None:
+    """Páginas por segundo y calidad de cada parser, en serie y en el pool"""
+    from pdf_extraction import PdfParserPool, available_parsers, extract_pdf_text
+    from spec_extractor import SpecExtractor
+
+    pages_per_pdf = 10
+    documents = max(1, args.pages // pages_per_pdf)
+    extractor = SpecExtractor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = []
+        for index in range(documents):
+            path = Path(tmp) / f"ficha_{index}.pdf"
+            write_fixture_pdf(path, pages_per_pdf, 50_000, seed=index)
+            fixtures.append((path, datasheet_corpus(pages_per_pdf, index)))
+
+        total_pages = documents * pages_per_pdf
+        print(f"📄 {documents} PDFs de prueba, {total_pages} páginas")
+        print(f"⚙️  Procesos del pool: {args.workers}")
+
+        for parser in available_parsers():
+            # Calidad: palabras recuperadas y especificaciones iguales a las
+            # que se obtienen del texto original
+            recall, specs_ok, specs_total = [], 0, 0
+            for path, corpus in fixtures:
+                result = extract_pdf_text(path, total_pages, 10**9, parser)
+                recall.append(_word_recall("\n".join(corpus), result["text"]))
+                expected = extractor.extract_legacy("\n".join(corpus))
+                found = extractor.extract_legacy(result["text"])
+                specs_total += len(expected)
+                specs_ok += sum(found.get(k) == v for k, v in expected.items())
+
+            serial = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                for path, _ in fixtures:
+                    extract_pdf_text(path, total_pages, 10**9, parser)
+                serial.append(total_pages / (time.perf_counter() - started))
+
+            pool = PdfParserPool(parser, max_workers=args.workers)
+            pool.extract(fixtures[0][0])  # arrancar los procesos
+            pooled = []
+            try:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+                        list(
+                            ex.map(
+                                lambda f: pool.extract(f[0], total_pages, 10**9),
+                                fixtures,
+                            )
+                        )
+                    pooled.append(total_pages / (time.perf_counter() - started))
+            finally:
+                pool.shutdown()
+
+            print(
+                f"   {parser:<10} serie {statistics.median(serial):8.1f} pág/s"
+                f"   pool {statistics.median(pooled):8.1f} pág/s"
+                f"   palabras {statistics.mean(recall) * 100:5.1f}%"
+                f"   specs {specs_ok}/{specs_total}"
+            )
+
+
+def bench_templates(args) -> None:
+    """Descripciones de respaldo del catálogo completo sin IA"""
+    from html_templates import render_catalog
+
+    products = catalog_products(args.products)
+    print(f"🛒 {len(products)} productos sintéticos")
+
+    samples = []
+    for _ in range(args.repeat):
+        catalogo = render_catalog(products)
+        samples.append(catalogo["stats"]["seconds"])
+
+    total_bytes = sum(len(html) for html in catalogo["resultados"].values())
+    seconds = statistics.median(samples)
+    print(f"   catálogo completo         {seconds:8.3f} s")
+    print(f"   productos por segundo     {len(products) / seconds:8.0f}")
+    print(f"   HTML generado             {total_bytes / 1024 / 1024:8.1f} MB")
+    print(f"   errores                   {len(catalogo['errores']):8d}")
+
+
+def bench_html(args) -> None:
+    """Compactado del HTML de las descripciones: bytes ahorrados y tiempo"""
+    from html_postprocess import HtmlPostprocessor
+    from html_templates import render_catalog
+
+    products = catalog_products(args.products)
+    paginas = list(render_catalog(products)["resultados"].values())
+    print(f"🛒 {len(paginas)} descripciones HTML (plantilla premium)")
+
+    samples = []
+    for _ in range(args.repeat):
+        postprocessor = HtmlPostprocessor()
+        started = time.perf_counter()
+        reportes = [postprocessor.process(html) for html in paginas]
+        samples.append((time.perf_counter() - started) / len(paginas))
+
+    stats = postprocessor.stats()
+    ahorro = sorted(reporte["saved_pct"] for reporte in reportes)
+    _report("compactado por producto", samples)
+    print(f"   bytes antes               {stats['bytes_in'] / 1024 / 1024:8.2f} MB")
+    print(f"   bytes después             {stats['bytes_out'] / 1024 / 1024:8.2f} MB")
+    print(f"   reducción total           {stats['saved_pct']:8.1f} %")
+    print(f"   reducción mín/máx         {ahorro[0]:5.1f} % / {ahorro[-1]:.1f} %")
+    print(f"   desbalanceados            {stats['unbalanced']:8d}")
+    excedidos = f"exceden {stats['max_bytes'] // 1024} KB"
+    print(f"   {excedidos:<26}{stats['over_budget']:8d}")
+
+
+class _LegacyProductCache:
+    """get_products_from_cloud_function anterior: lista global con TTL"""
+
+    def __init__(self, url: str, ttl: float = 300):
+        self.url = url
+        self.ttl = ttl
+        self.products = []
+        self.timestamp = 0
+
+    def get(self) -> List[Dict]:
+        import requests
+
+        if self.products and (time.time() - self.timestamp) < self.ttl:
+            return self.products
+        try:
+            response = requests.get(self.url, timeout=30)
+            if response.status_code == 200:
+                self.products = response.json().get("products", [])
+                self.timestamp = time.time()
+                return self.products
+            return []
+        except Exception:
+            return []
+
+    def get_by_sku(self, sku: str):
+        for p in self.get():
+            if p.get("SKU") == sku or p.get("sku") == sku:
+                return p
+        return None
+
+
+def _concurrent_gets(get: Callable, clients: int) -> Dict:
+    """clients pedidos simultáneos: latencias y respuestas vacías"""
+    barrera = threading.Barrier(clients)
+
+    def pedir(_):
+        barrera.wait()
+        started = time.perf_counter()
+        products = get()
+        return time.perf_counter() - started, not products
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        resultados = list(executor.map(pedir, range(clients)))
+    latencias = sorted(latencia for latencia, _ in resultados)
+    return {
+        "p50": _percentile(latencias, 0.5),
+        "max": latencias[-1],
+        "empty": sum(vacio for _, vacio in resultados),
+    }
+
+
+def bench_catalog(args) -> None:
+    """Catálogo vencido con pedidos concurrentes: TTL anterior vs. CatalogStore"""
+    from catalog_store import CatalogStore
+    from quick_integration import fetch_products_from_cloud_function
+    import quick_integration
+
+    products = catalog_products(args.products)
+    server = _serve_catalog(products, args.catalog_latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    quick_integration.CLOUD_FUNCTION_URL = url
+    print(
+        f"🛒 Cloud Function local: {len(products)} productos, "
+        f"{args.catalog_latency:g} s de demora, {args.clients} pedidos simultáneos"
+    )
+
+    legacy = _LegacyProductCache(url)
+    store = CatalogStore(fetch_products_from_cloud_function, error_backoff=0)
+    casos = [("anterior", legacy, legacy.get), ("CatalogStore", store, store.products)]
+
+    try:
+        for fase, falla in (("vencido", False), ("vencido y caído", True)):
+            print(f"   {fase}:")
+            for nombre, cache, get in casos:
+                get()  # copia inicial
+                # Vencer la copia sin esperar el TTL
+                if cache is legacy:
+                    legacy.timestamp = 0
+                else:
+                    store.ttl = 0
+                server.fail = falla
+                server.requests = 0
+                r = _concurrent_gets(get, args.clients)
+                store.ttl = 300
+                # Dejar terminar la actualización en segundo plano
+                time.sleep(args.catalog_latency + 0.2)
+                server.fail = False
+                print(
+                    f"      {nombre:<13} p50 {r['p50'] * 1000:8.1f} ms   "
+                    f"máx {r['max'] * 1000:8.1f} ms   descargas {server.requests:3d}"
+                    f"   vacías {r['empty']:3d}"
+                )
+
+        skus = [p["sku"] for p in random.Random(3).sample(products, 1000)]
+        for nombre, cache, _ in casos:
+            samples = _time_per_item(cache.get_by_sku, skus, args.repeat)
+            _report(f"búsqueda por SKU, {nombre}", samples, "µs", 1e6)
+    finally:
+        server.shutdown()
+
+
+def _load_test(url: str, headers: Dict[str, str], clients: int, seconds: float):
+    """Pedidos por segundo y bytes por respuesta con clients hilos en paralelo"""
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    limite = time.perf_counter() + seconds
+
+    def cliente(_):
+        pedidos = 0
+        recibidos = 0
+        while time.perf_counter() < limite:
+            conexion = http.client.HTTPConnection(parts.hostname, parts.port)
+            conexion.request("GET", parts.path, headers=headers)
+            response = conexion.getresponse()
+            recibidos += len(response.read())
+            conexion.close()
+            pedidos += 1
+        return pedidos, recibidos
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        resultados = list(executor.map(cliente, range(clients)))
+    elapsed = time.perf_counter() - started
+    pedidos = sum(p for p, _ in resultados)
+    recibidos = sum(r for _, r in resultados)
+    return pedidos / elapsed, recibidos / max(pedidos, 1)
+
+
+def bench_products_api(args) -> None:
+    """/api/products: jsonify por pedido vs. JSON preparado, comprimido y con ETag"""
+    from flask import jsonify
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class SinLog(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    import quick_integration
+
+    products = catalog_products(args.products)
+    catalog_server = _serve_catalog(products, 0)
+    quick_integration.CLOUD_FUNCTION_URL = (
+        f"http://127.0.0.1:{catalog_server.server_address[1]}/"
+    )
+
+    def legacy_products():
+        # /api/products anterior: formatear y serializar en cada pedido
+        formatted = [
+            quick_integration.format_product(p)
+            for p in quick_integration.get_products_from_cloud_function()
+        ]
+        return jsonify(
+            {"success": True, "count": len(formatted), "products": formatted}
+        )
+
+    app = quick_integration.app
+    app.add_url_rule("/bench/legacy-products", "bench_legacy_products", legacy_products)
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=SinLog)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    payload = quick_integration.products_payload(quick_integration.catalog.snapshot())
+    _, _, etag_gzip = payload.variant(["gzip"])
+    print(
+        f"🛒 {len(products)} productos, {args.clients} clientes, "
+        f"{args.seconds:g} s por caso"
+    )
+    casos = [
+        ("anterior (jsonify)", "/bench/legacy-products", {}),
+        ("preparado", "/api/products", {}),
+        ("preparado gzip", "/api/products", {"Accept-Encoding": "gzip"}),
+        ("preparado br", "/api/products", {"Accept-Encoding": "br, gzip"}),
+        (
+            "304 If-None-Match",
+            "/api/products",
+            {"Accept-Encoding": "gzip", "If-None-Match": f'"{etag_gzip}"'},
+        ),
+    ]
+    try:
+        for nombre, path, headers in casos:
+            if nombre == "preparado br" and "br" not in payload.encoded:
+                print(f"   {nombre:<20} (brotli no instalado)")
+                continue
+            rps, bytes_por_respuesta = _load_test(
+                base + path, headers, args.clients, args.seconds
+            )
+            print(
+                f"   {nombre:<20} {rps:8.1f} pedidos/s"
+                f"   {bytes_por_respuesta / 1024:9.1f} KB de cuerpo por respuesta"
+            )
+    finally:
+        server.shutdown()
+        catalog_server.shutdown()
+
+
+def _browser_filter(products: List[Dict], params: Dict[str, str]) -> List[Dict]:
+    """applyFilters anterior del showcase (products.filter sobre todo el catálogo)"""
+    search = params.get("q", "").lower()
+    familia = params.get("familia", "")
+    marca = params.get("marca", "")
+    precio_max = float(params.get("precio_max", "inf"))
+    stock_min = float(params.get("stock_min", "-inf"))
+    filtrados = [
+        p
+        for p in products
+        if (
+            not search
+            or all(
+                # Mismos campos que busca el índice
+                term
+                in f"{p['nombre']} {p['marca']} {p['modelo']} {p['sku']} {p['familia']}".lower()
+                for term in search.split()
+            )
+        )
+        and (not familia or p["familia"] == familia)
+        and (not marca or p["marca"] == marca)
+        and p["precio"] <= precio_max
+        and p["stock"] >= stock_min
+    ]
+    sort = params.get("sort", "")
+    if sort:
+        filtrados.sort(key=lambda p: p[sort.lstrip("-")], reverse=sort.startswith("-"))
+    return filtrados
+
+
+def bench_catalog_query(args) -> None:
+    """Filtros del showcase: catálogo completo filtrado en el navegador vs. índices"""
+    from urllib.parse import urlencode
+
+    import quick_integration
+
+    products = catalog_products(args.products)
+    catalog_server = _serve_catalog(products, 0)
+    quick_integration.CLOUD_FUNCTION_URL = (
+        f"http://127.0.0.1:{catalog_server.server_address[1]}/"
+    )
+    client = quick_integration.app.test_client()
+    try:
+        started = time.perf_counter()
+        snapshot = quick_integration.catalog.snapshot()
+        index_seconds = time.perf_counter() - started
+    finally:
+        catalog_server.shutdown()
+
+    payload = quick_integration.products_payload(snapshot)
+    completo = payload.sizes()
+    print(
+        f"🛒 {len(products)} productos; descarga + índices {index_seconds:.2f} s; "
+        f"catálogo completo {completo['identity'] / 1024:.0f} KB "
+        f"({completo['gzip'] / 1024:.0f} KB gzip)"
+    )
+
+    casos = [
+        ("familia", {"familia": _FAMILIES[1]}),
+        (
+            "familia+marca+precio",
+            {"familia": _FAMILIES[0], "marca": _BRANDS[0], "precio_max": "20000"},
+        ),
+        ("stock, -precio", {"stock_min": "1", "sort": "-precio"}),
+    ]
+    for nombre, params in casos:
+        anterior = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            esperado = _browser_filter(products, params)
+            anterior.append(time.perf_counter() - started)
+
+        latencias = []
+        for _ in range(args.repeat * 20):
+            started = time.perf_counter()
+            response = client.get("/api/products?" + urlencode(params))
+            latencias.append(time.perf_counter() - started)
+        latencias.sort()
+        data = response.get_json()
+        coincide = data["total"] == len(esperado) and [
+            p["sku"] for p in data["products"]
+        ] == [p["sku"] for p in esperado[: data["per_page"]]]
+        print(
+            f"   {nombre:<22} navegador {statistics.median(anterior) * 1e3:7.1f} ms"
+            f" sobre {completo['gzip'] / 1024:.0f} KB"
+            f"   índices p50 {_percentile(latencias, 0.5) * 1e3:6.2f} ms"
+            f" p99 {_percentile(latencias, 0.99) * 1e3:6.2f} ms"
+            f"   {len(response.data) / 1024:6.1f} KB"
+            f"   {data['total']} resultados {'✅' if coincide else '❌'}"
+        )
+
+    latencias = []
+    for _ in range(args.repeat * 20):
+        started = time.perf_counter()
+        client.get("/api/products/facets?" + urlencode({"marca": _BRANDS[0]}))
+        latencias.append(time.perf_counter() - started)
+    latencias.sort()
+    print(
+        f"   {'facetas (marca)':<22} índices p50 {_percentile(latencias, 0.5) * 1e3:6.2f} ms"
+        f" p99 {_percentile(latencias, 0.99) * 1e3:6.2f} ms"
+    )
+
+
+def bench_search(args) -> None:
+    """Búsqueda de texto: recorrido por subcadenas vs. índice invertido"""
+    from catalog_search import SearchIndex
+
+    products = catalog_products(args.products)
+    started = time.perf_counter()
+    index = SearchIndex(products)
+    print(
+        f"🛒 {len(products)} productos; índice armado en "
+        f"{time.perf_counter() - started:.2f} s ({len(index.vocabulary)} términos)"
+    )
+
+    marca = _BRANDS[0].lower()
+    sku = products[len(products) // 2]["sku"]
+    casos = [
+        ("exacta", marca),
+        ("varias palabras", f"{_BRANDS[3]} 100 kva"),
+        ("sin acentos", "electrogeno"),
+        ("error de tipeo", "hidrolavdora"),
+        ("SKU", sku),
+        ("prefijo de SKU", sku[:-2]),
+    ] + [(f"autocompletar {n}", marca[:n]) for n in (2, 3, 4)]
+
+    for nombre, q in casos:
+        latencias = []
+        for _ in range(args.repeat * 20):
+            started = time.perf_counter()
+            total, _ = index.search(q)
+            latencias.append(time.perf_counter() - started)
+        latencias.sort()
+
+        anterior = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            encontrados = _browser_filter(products, {"q": q})
+            anterior.append(time.perf_counter() - started)
+        print(
+            f"   {nombre:<17} {q!r:<18}"
+            f" índice p50 {_percentile(latencias, 0.5) * 1e3:6.2f} ms"
+            f" p99 {_percentile(latencias, 0.99) * 1e3:6.2f} ms"
+            f"   subcadenas {statistics.median(anterior) * 1e3:7.1f} ms"
+            f"   {total:6} resultados (subcadenas: {len(encontrados)})"
+        )
+
+
+# Servidor de quick_integration en un proceso aparte. "anterior" reproduce el
+# inicio previo: importaciones pesadas al cargar e inicio en serie antes de
+# atender; "paralelo" es el inicio en segundo plano de start_all.py
+_STARTUP_SCRIPT = """
+import sys, time
+mode, port, catalog_url, snapshot_path = sys.argv[1:5]
+port = int(port)
+started = time.perf_counter()
+if mode == "anterior":
+    import pandas, PyPDF2, google.generativeai, selenium.webdriver
+import quick_integration
+quick_integration.CLOUD_FUNCTION_URL = catalog_url
+quick_integration.CATALOG_SNAPSHOT_PATH = snapshot_path
+if mode == "anterior":
+    for init in quick_integration.STARTUP_SUBSYSTEMS.values():
+        init()
+else:
+    quick_integration.initialize_app(background=True, started=started)
+quick_integration.app.run(port=port, host="127.0.0.1")
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_url(url: str, limite: float, timeout: float = 1) -> bool:
+    while time.perf_counter() < limite:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                response.read()
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+def _measure_startup(
+    mode: str, catalog_url: str, timeout: float, snapshot_path: str
+) -> Dict:
+    """
+    Segundos desde el lanzamiento hasta la primera página, hasta la primera
+    respuesta de /api/products y hasta listo
+    """
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            _STARTUP_SCRIPT,
+            mode,
+            str(port),
+            catalog_url,
+            snapshot_path,
+        ],
+        cwd=Path(__file__).parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        limite = started + timeout
+        if not _wait_for_url(f"{base}/showcase", limite):
+            return {"first_page": None, "catalog": None, "ready": None}
+        first_page = time.perf_counter() - started
+        if mode == "anterior":
+            # El servidor atiende recién con todo inicializado
+            return {
+                "first_page": first_page,
+                "catalog": first_page,
+                "ready": first_page,
+            }
+        # /api/products espera al catálogo: un solo pedido con plazo largo
+        catalog = _wait_for_url(
+            f"{base}/api/products?per_page=1", limite, timeout=timeout
+        )
+        catalog_seconds = time.perf_counter() - started if catalog else None
+        ready = _wait_for_url(f"{base}/api/ready", limite)
+        return {
+            "first_page": first_page,
+            "catalog": catalog_seconds,
+            "ready": time.perf_counter() - started if ready else None,
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _write_catalog_snapshot(products: List[Dict], path: str) -> None:
+    """Copia en disco como la que deja una descarga anterior del servidor"""
+    import quick_integration
+    from catalog_snapshot import CatalogSnapshotFile
+    from catalog_store import CatalogSnapshot
+
+    snapshot = CatalogSnapshot(products, time.time() - 3600, 1)
+    quick_integration.prepare_snapshot(snapshot)
+    snapshot_file = CatalogSnapshotFile(path)
+    snapshot_file.save(
+        snapshot.products,
+        snapshot.fetched_at,
+        snapshot.version,
+        quick_integration.products_payload(snapshot),
+        quick_integration.catalog_index(snapshot),
+    )
+    snapshot_file.close()
+
+
+def bench_startup(args) -> None:
+    """
+    Tiempo de inicio hasta la primera página y hasta servir el catálogo:
+    en serie, en paralelo, y en paralelo con la copia del catálogo en disco
+    (con la Cloud Function andando y caída)
+    """
+    products = catalog_products(args.products)
+    server = _serve_catalog(products, args.catalog_latency)
+    catalog_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    caida_url = f"http://127.0.0.1:{_free_port()}/"
+    print(
+        f"🛒 Cloud Function local: {len(products)} productos, "
+        f"{args.catalog_latency:g} s de demora"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copia = os.path.join(tmp, "copia.sqlite")
+        _write_catalog_snapshot(products, copia)
+        casos = [
+            ("anterior", "anterior", catalog_url, None),
+            ("paralelo", "paralelo", catalog_url, None),
+            ("copia en disco", "paralelo", catalog_url, copia),
+            ("copia, CF caída", "paralelo", caida_url, copia),
+        ]
+        try:
+            for nombre, mode, url, snapshot_path in casos:
+                runs = []
+                for run in range(args.repeat):
+                    # Sin copia: un archivo nuevo en cada inicio
+                    path = snapshot_path or os.path.join(tmp, f"{mode}{run}.sqlite")
+                    runs.append(_measure_startup(mode, url, args.timeout, path))
+                for key, label in (
+                    ("first_page", "primera página"),
+                    ("catalog", "catálogo"),
+                    ("ready", "listo"),
+                ):
+                    samples = [run[key] for run in runs if run[key] is not None]
+                    if not samples:
+                        print(f"   {nombre:<16} {label:<15}   sin respuesta")
+                        continue
+                    print(
+                        f"   {nombre:<16} {label:<15} mediana "
+                        f"{statistics.median(samples):6.2f} s   mín {min(samples):6.2f} s"
+                    )
+        finally:
+            server.shutdown()
+
+
+def _run_premium(handler, products: List[Dict], concurrency: int) -> Dict:
+    """Genera el lote en paralelo y mide la latencia de cada producto"""
+    latencias = []
+    errores = 0
+
+    def generar(product):
+        started = time.perf_counter()
+        try:
+            handler.generar_descripcion_detallada_html_premium_con_ia(product, {})
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latencia, ok in executor.map(generar, products):
+            latencias.append(latencia)
+            errores += int(not ok)
+    return {
+        "seconds": time.perf_counter() - started,
+        "latencias": sorted(latencias),
+        "errores": errores,
+    }
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_resilience(args) -> None:
+    """Latencia de cola de un lote premium con un proveedor lento o caído"""
+    from ai_handler_enhanced import EnhancedAIHandler
+    from generation_cache import GenerationCache
+    from metrics import MetricsRecorder
+    from pdf_cache import PdfCache
+    from pdf_extraction import PdfParserPool
+    from providers import LocalProvider
+    from resilience import CircuitBreaker, ResilientCaller
+
+    products = [
+        {**product, "pdf_url": ""} for product in catalog_products(args.products)
+    ]
+    print(
+        f"🛒 {len(products)} productos, {args.concurrency} en paralelo, "
+        f"{args.slow_rate:.0%} lentas ({args.slow_latency:.1f}s), "
+        f"{args.error_rate:.0%} con error"
+    )
+
+    def sin_resiliencia():
+        # Comportamiento anterior: sin plazo, sin reintentos y sin respaldo
+        return ResilientCaller(
+            deadline=3600,
+            max_retries=0,
+            hedge=False,
+            breaker=CircuitBreaker(failure_threshold=10**9),
+        )
+
+    def con_resiliencia():
+        return ResilientCaller(
+            deadline=args.deadline,
+            max_retries=2,
+            base_delay=0.02,
+            max_delay=0.2,
+            # Pausa del circuito a escala de las latencias simuladas
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=0.5),
+            max_workers=args.concurrency * 8,
+        )
+
+    casos = [
+        ("sin resiliencia", sin_resiliencia, args.error_rate, False),
+        ("con resiliencia", con_resiliencia, args.error_rate, True),
+        ("proveedor caído", con_resiliencia, 1.0, True),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, crear_caller, error_rate, respaldo in casos:
+            provider = LocalProvider(
+                latency=args.latency,
+                slow_rate=args.slow_rate,
+                slow_latency=args.slow_latency,
+                error_rate=error_rate,
+            )
+            handler = EnhancedAIHandler(
+                cache=GenerationCache(Path(tmp) / f"{nombre}.sqlite"),
+                pdf_cache=PdfCache(Path(tmp) / "pdfs"),
+                pdf_parser=PdfParserPool(max_workers=0),
+                provider=provider,
+                resilience=crear_caller(),
+                metrics=MetricsRecorder(),
+            )
+            handler.usar_respaldo = respaldo
+
+            resultado = _run_premium(handler, products, args.concurrency)
+            latencias = resultado["latencias"]
+            stats = handler.get_resilience_stats()
+            print(
+                f"   {nombre:<16} total {resultado['seconds']:6.2f} s"
+                f"   p50 {_percentile(latencias, 0.5) * 1e3:7.1f} ms"
+                f"   p95 {_percentile(latencias, 0.95) * 1e3:7.1f} ms"
+                f"   p99 {_percentile(latencias, 0.99) * 1e3:7.1f} ms"
+                f"   máx {latencias[-1] * 1e3:7.1f} ms"
+            )
+            print(
+                f"   {'':<16} errores {resultado['errores']}"
+                f"   plantilla {stats['fallbacks']}"
+                f"   reintentos {stats['retries']}"
+                f"   hedges {stats['hedges']} ({stats['hedge_wins']} ganados)"
+                f"   vencidas {stats['timeouts']}"
+                f"   cortadas {stats['short_circuited']}"
+                f"   aperturas {stats['breaker']['times_opened']}"
+            )
+            handler.resilience.shutdown()
+
+
+def bench_router(args) -> None:
+    """Reparto del tráfico del router cuando el modelo preferido se degrada"""
+    from providers import LocalProvider, ProviderRouter
+
+    grande = LocalProvider(latency=args.latency * 2, model_name="grande", seed=1)
+    flash = LocalProvider(latency=args.latency, model_name="flash", seed=2)
+    router = ProviderRouter(
+        {"html": [grande, flash], "seo": [flash]}, window_seconds=args.window
+    )
+
+    fases = [
+        ("sano", {}),
+        ("con errores", {"error_rate": 0.5}),
+        ("lento", {"latency": args.latency * 10}),
+        ("recuperado", {}),
+    ]
+    for nombre, ajustes in fases:
+        grande.error_rate = ajustes.get("error_rate", 0.0)
+        grande.latency = ajustes.get("latency", args.latency * 2)
+        antes = {
+            label: datos["routed"]
+            for label, datos in router.stats()["providers"].items()
+        }
+
+        latencias = []
+        errores = 0
+        for index in range(args.requests):
+            tarea = "seo" if index % 4 == 0 else "html"
+            started = time.perf_counter()
+            try:
+                router.generate("prompt", task=tarea)
+            except ConnectionError:
+                errores += 1
+            latencias.append(time.perf_counter() - started)
+        latencias.sort()
+
+        stats = router.stats()["providers"]
+        reparto = "   ".join(
+            f"{label} {stats[label]['routed'] - antes[label]:4d}" for label in antes
+        )
+        print(
+            f"   {nombre:<12} {reparto}   errores {errores:3d}"
+            f"   p95 {_percentile(latencias, 0.95) * 1e3:6.1f} ms"
+        )
+        # Dejar vencer las muestras entre fases
+        time.sleep(args.window)
+
+
+def _legacy_seo_metadata(product_info: Dict) -> Dict[str, str]:
+    """generate_seo_metadata anterior: corte fijo en 60/160 caracteres"""
+    nombre = product_info.get("nombre", "Producto")
+    marca = product_info.get("marca", "")
+    modelo = product_info.get("modelo", "")
+    familia = product_info.get("familia", "")
+
+    title_parts = [nombre]
+    if marca:
+        title_parts.append(marca)
+    if modelo:
+        title_parts.append(modelo)
+    title_parts.append("Mejor Precio")
+    seo_title = " - ".join(title_parts)[:60]
+
+    seo_description = f"Compra {nombre} al mejor precio. "
+    if marca:
+        seo_description += f"Producto original {marca}. "
+    seo_description += (
+        "Envío inmediato, garantía oficial y soporte técnico especializado. "
+    )
+    seo_description += "¡Consulta ofertas especiales!"
+    seo_description = seo_description[:160]
+
+    keywords = [nombre.lower()]
+    if marca:
+        keywords.append(marca.lower())
+    if modelo:
+        keywords.append(modelo.lower())
+    if familia:
+        keywords.append(familia.lower())
+    keywords.extend(["comprar", "precio", "oferta", "venta"])
+
+    return {
+        "title": seo_title,
+        "description": seo_description,
+        "keywords": ", ".join(keywords),
+    }
+
+
+def bench_seo(args) -> None:
+    """SEO del catálogo: corte fijo anterior vs. corte en palabras"""
+    from seo_batch import generate_seo_catalog
+
+    products = catalog_products(args.products)
+    print(f"🛒 {len(products)} productos sintéticos")
+
+    casos = [
+        ("por fila (anterior)", lambda: [_legacy_seo_metadata(p) for p in products]),
+        ("catálogo (palabras)", lambda: generate_seo_catalog(products)),
+    ]
+    for nombre, funcion in casos:
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            funcion()
+            samples.append(time.perf_counter() - started)
+        seconds = statistics.median(samples)
+        print(
+            f"   {nombre:<22} {seconds:8.3f} s   {len(products) / seconds:10.0f} productos/s"
+        )
+
+    seo = generate_seo_catalog(products)["seo"]
+    cortadas = sum(
+        _legacy_seo_metadata(p)["description"] != seo[p["sku"]]["description"]
+        for p in products
+    )
+    print(f"   descripciones que ya no cortan palabras  {cortadas}")
+
+
+SCENARIOS = {
+    "specs": (bench_specs, "Extracción de especificaciones de fichas técnicas"),
+    "pdf": (bench_pdf, "Pico de memoria al leer PDFs grandes"),
+    "pdf-parsers": (bench_pdf_parsers, "Parsers de PDF: páginas/s y calidad"),
+    "templates": (bench_templates, "Descripciones de respaldo: productos/s"),
+    "html": (bench_html, "Compactado del HTML: bytes ahorrados por producto"),
+    "startup": (bench_startup, "Inicio del servidor hasta la primera página"),
+    "catalog": (bench_catalog, "Catálogo vencido: stale-while-revalidate"),
+    "products-api": (bench_products_api, "/api/products: pedidos/s y bytes"),
+    "catalog-query": (bench_catalog_query, "Filtros, orden y facetas en el servidor"),
+    "search": (bench_search, "Búsqueda de texto: latencia p50/p99"),
+    "resilience": (bench_resilience, "Latencia de cola con un proveedor inestable"),
+    "router": (bench_router, "Router de proveedores: reparto según salud"),
+    "seo": (bench_seo, "SEO del catálogo: productos/s"),
+}
+
+_PRODUCTS_ARG = (
+    ("--products",),
+    {"type": int, "default": 5000, "help": "Cantidad de productos sintéticos"},
+)
+
+# Opciones propias de cada escenario
+SCENARIO_ARGS = {
+    "templates": [_PRODUCTS_ARG],
+    "html": [_PRODUCTS_ARG],
+    "catalog": [
+        (("--products",), {"type": int, "default": 20000, "help": "Productos"}),
+        (
+            ("--catalog-latency",),
+            {"type": float, "default": 1.0, "help": "Demora de la Cloud Function (s)"},
+        ),
+        (("--clients",), {"type": int, "default": 16, "help": "Pedidos simultáneos"}),
+    ],
+    "products-api": [
+        (("--products",), {"type": int, "default": 5000, "help": "Productos"}),
+        (("--clients",), {"type": int, "default": 8, "help": "Clientes"}),
+        (("--seconds",), {"type": float, "default": 5, "help": "Duración por caso"}),
+    ],
+    "catalog-query": [
+        (("--products",), {"type": int, "default": 50000, "help": "Productos"}),
+    ],
+    "search": [
+        (("--products",), {"type": int, "default": 100000, "help": "Productos"}),
+    ],
+    "startup": [
+        (("--products",), {"type": int, "default": 2000, "help": "Productos"}),
+        (
+            ("--catalog-latency",),
+            {"type": float, "default": 2.0, "help": "Demora de la Cloud Function (s)"},
+        ),
+        (("--timeout",), {"type": float, "default": 60, "help": "Plazo (s)"}),
+    ],
+    "seo": [
+        (("--products",), {"type": int, "default": 50000, "help": "Productos"}),
+    ],
+    "resilience": [
+        (("--products",), {"type": int, "default": 500, "help": "Productos"}),
+        (("--concurrency",), {"type": int, "default": 8, "help": "Hilos"}),
+        (("--latency",), {"type": float, "default": 0.02, "help": "Latencia (s)"}),
+        (("--slow-rate",), {"type": float, "default": 0.05, "help": "Lentas"}),
+        (("--slow-latency",), {"type": float, "default": 2.0, "help": "Lenta (s)"}),
+        (("--error-rate",), {"type": float, "default": 0.03, "help": "Errores"}),
+        (("--deadline",), {"type": float, "default": 0.5, "help": "Plazo (s)"}),
+    ],
+    "router": [
+        (("--requests",), {"type": int, "default": 200, "help": "Por fase"}),
+        (("--latency",), {"type": float, "default": 0.005, "help": "Latencia (s)"}),
+        (("--window",), {"type": float, "default": 0.5, "help": "Ventana (s)"}),
+    ],
+    "pdf": [
+        (("--size-mb",), {"type": float, "default": 40, "help": "Tamaño del PDF"}),
+    ],
+    "pdf-parsers": [
+        (
+            ("--workers",),
+            {"type": int, "default": os.cpu_count() or 1, "help": "Procesos"},
+        ),
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de STEL Shop")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    for name, (_, help_text) in SCENARIOS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("--repeat", type=int, default=5)
+        subparser.add_argument("--pages", type=int, default=300)
+        for flags, options in SCENARIO_ARGS.get(name, []):
+            subparser.add_argument(*flags, **options)
+
+    args = parser.parse_args()
+    print(f"🚀 Benchmark: {args.scenario}")
+    SCENARIOS[args.scenario][0](args)
+
+
+if __name__ == "__main__":
+    main()
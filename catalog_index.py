@@ -0,0 +1,356 @@
+"""
+Índices del catálogo para STEL Shop
+Se arman una vez por copia del catálogo y resuelven en el servidor los
+filtros del showcase (familia, marca, rangos de precio y stock, texto), el
+orden, la paginación y los conteos por familia y marca
+"""
+
+import base64
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import islice
+from typing import AbstractSet, Dict, Any, FrozenSet, Iterable, List, Optional, Tuple
+
+from catalog_search import SearchIndex
+from spec_extractor import parse_number
+
+DEFAULT_PER_PAGE = 48
+MAX_PER_PAGE = 200
+
+# Campos por los que se puede ordenar (con "-" adelante, descendente)
+SORT_KEYS = ("nombre", "marca", "familia", "modelo", "sku", "precio", "stock")
+NUMERIC_KEYS = ("precio", "stock")
+
+# Parámetros que activan la consulta paginada en /api/products
+QUERY_PARAMS = (
+    "familia",
+    "marca",
+    "q",
+    "precio_min",
+    "precio_max",
+    "stock_min",
+    "stock_max",
+    "sort",
+    "page",
+    "per_page",
+    "cursor",
+)
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Precio o stock como número ("USD 15.500" -> 15500.0); None si no hay"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = value.replace("USD", "").replace("$", "").replace(" ", "")
+        return parse_number(cleaned) if cleaned else None
+    return None
+
+
+def encode_cursor(version: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """(versión del catálogo, posición); ValueError si el cursor no es válido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, offset = base64.urlsafe_b64decode(padded).decode().split(":")
+        version, offset = int(version), int(offset)
+    except Exception:
+        raise ValueError("cursor inválido")
+    if offset < 0:
+        raise ValueError("cursor inválido")
+    return version, offset
+
+
+def _number_arg(args, name: str) -> Optional[float]:
+    raw = args.get(name, "").strip()
+    if not raw:
+        return None
+    value = to_number(raw)
+    if value is None:
+        raise ValueError(f"{name} debe ser un número")
+    return value
+
+
+def _int_arg(args, name: str, default: int, minimum: int) -> int:
+    raw = args.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} debe ser un entero")
+    if value < minimum:
+        raise ValueError(f"{name} debe ser al menos {minimum}")
+    return value
+
+
+def _values_arg(args, name: str) -> Tuple[str, ...]:
+    """Valores de un filtro: repetido (?marca=A&marca=B) o separado por comas"""
+    values = []
+    for raw in args.getlist(name):
+        values.extend(part.strip() for part in raw.split(","))
+    return tuple(value for value in values if value)
+
+
+class ProductQuery:
+    """Filtros, orden y página pedidos a /api/products"""
+
+    __slots__ = (
+        "familias",
+        "marcas",
+        "q",
+        "precio_min",
+        "precio_max",
+        "stock_min",
+        "stock_max",
+        "sort",
+        "descending",
+        "per_page",
+        "offset",
+        "cursor_version",
+    )
+
+    def __init__(self):
+        self.familias: Tuple[str, ...] = ()
+        self.marcas: Tuple[str, ...] = ()
+        self.q = ""
+        self.precio_min: Optional[float] = None
+        self.precio_max: Optional[float] = None
+        self.stock_min: Optional[float] = None
+        self.stock_max: Optional[float] = None
+        self.sort: Optional[str] = None
+        self.descending = False
+        self.per_page = DEFAULT_PER_PAGE
+        self.offset = 0
+        self.cursor_version: Optional[int] = None
+
+    @classmethod
+    def from_args(cls, args) -> "ProductQuery":
+        """Lee los parámetros del pedido (lanza ValueError si alguno es inválido)"""
+        query = cls()
+        query.familias = _values_arg(args, "familia")
+        query.marcas = _values_arg(args, "marca")
+        query.q = " ".join(args.get("q", "").lower().split())
+        query.precio_min = _number_arg(args, "precio_min")
+        query.precio_max = _number_arg(args, "precio_max")
+        query.stock_min = _number_arg(args, "stock_min")
+        query.stock_max = _number_arg(args, "stock_max")
+
+        sort = args.get("sort", "").strip()
+        if sort:
+            query.descending = sort.startswith("-")
+            query.sort = sort.lstrip("-+")
+            if query.sort not in SORT_KEYS:
+                raise ValueError(
+                    f"sort debe ser uno de: {', '.join(SORT_KEYS)} (con - para descendente)"
+                )
+
+        query.per_page = min(
+            _int_arg(args, "per_page", DEFAULT_PER_PAGE, 1), MAX_PER_PAGE
+        )
+        cursor = args.get("cursor", "").strip()
+        if cursor:
+            query.cursor_version, query.offset = decode_cursor(cursor)
+        else:
+            query.offset = (_int_arg(args, "page", 1, 1) - 1) * query.per_page
+        return query
+
+    @property
+    def page(self) -> int:
+        return self.offset // self.per_page + 1
+
+
+class CatalogIndex:
+    """
+    Índices de una copia del catálogo (productos ya formateados):
+
+    - familia y marca: conjunto de posiciones de los productos con cada valor
+    - precio y stock: valores ordenados para resolver rangos con bisect
+    - un orden precalculado (y el rango de cada producto) por campo de SORT_KEYS
+    - q: el índice de texto de catalog_search (se arma si no se pasa uno)
+
+    Los productos sin precio o stock quedan fuera de los rangos y al final
+    de cualquier orden por ese campo. Con q y sin sort se ordena por
+    relevancia.
+    """
+
+    def __init__(self, products: List[Dict], search: Optional[SearchIndex] = None):
+        self.products = products
+        self.search = search if search is not None else SearchIndex(products)
+        self.familia_of = [str(p.get("familia") or "").strip() for p in products]
+        self.marca_of = [str(p.get("marca") or "").strip() for p in products]
+        self.by_familia = self._group(self.familia_of)
+        self.by_marca = self._group(self.marca_of)
+
+        self.numbers = {
+            key: [to_number(p.get(key)) for p in products] for key in NUMERIC_KEYS
+        }
+        # Rangos: valores ordenados y la posición del producto de cada uno
+        self.ranges: Dict[str, Tuple[List[float], List[int]]] = {}
+        for key, values in self.numbers.items():
+            present = sorted(
+                (value, i) for i, value in enumerate(values) if value is not None
+            )
+            self.ranges[key] = ([v for v, _ in present], [i for _, i in present])
+
+        self.orders: Dict[Tuple[str, bool], List[int]] = {}
+        self.ranks: Dict[Tuple[str, bool], List[int]] = {}
+        for key in SORT_KEYS:
+            values = self.numbers.get(key) or [
+                str(p.get(key) or "").casefold() for p in products
+            ]
+            present = [i for i, value in enumerate(values) if value not in (None, "")]
+            missing = [i for i, value in enumerate(values) if value in (None, "")]
+            for descending in (False, True):
+                # sorted es estable: a igual valor se respeta el orden del catálogo
+                order = (
+                    sorted(present, key=values.__getitem__, reverse=descending)
+                    + missing
+                )
+                rank = [0] * len(products)
+                for position, i in enumerate(order):
+                    rank[i] = position
+                self.orders[(key, descending)] = order
+                self.ranks[(key, descending)] = rank
+
+    @staticmethod
+    def _group(values: List[str]) -> Dict[str, FrozenSet[int]]:
+        groups: Dict[str, List[int]] = {}
+        for i, value in enumerate(values):
+            if value:
+                groups.setdefault(value, []).append(i)
+        return {value: frozenset(positions) for value, positions in groups.items()}
+
+    # Filtros
+
+    def _range_slice(self, key: str, low, high) -> Tuple[int, int]:
+        values, _ = self.ranges[key]
+        start = bisect_left(values, low) if low is not None else 0
+        end = bisect_right(values, high) if high is not None else len(values)
+        return start, max(start, end)
+
+    def match(
+        self,
+        query: ProductQuery,
+        skip: Iterable[str] = (),
+        text_scores: Optional[Dict[int, float]] = None,
+    ) -> Optional[AbstractSet[int]]:
+        """
+        Posiciones de los productos que cumplen la consulta (None = todos).
+        skip omite filtros ("familia", "marca") para contar los valores
+        alternativos de ese filtro; text_scores reusa la búsqueda de q ya
+        hecha.
+        """
+        filters = []
+        for name, wanted, index in (
+            ("familia", query.familias, self.by_familia),
+            ("marca", query.marcas, self.by_marca),
+        ):
+            if wanted and name not in skip:
+                members = frozenset().union(*(index.get(v, ()) for v in wanted))
+                filters.append((len(members), members))
+        for key in NUMERIC_KEYS:
+            low = getattr(query, f"{key}_min")
+            high = getattr(query, f"{key}_max")
+            if low is not None or high is not None:
+                start, end = self._range_slice(key, low, high)
+                filters.append((end - start, (key, start, end)))
+        if not filters and not query.q:
+            return None
+
+        # Se intersecta de la más selectiva a la menos; un rango mucho más
+        # grande que lo que queda se verifica producto por producto
+        result: Optional[AbstractSet[int]] = None
+        for size, condition in sorted(filters, key=lambda f: f[0]):
+            if isinstance(condition, frozenset):
+                result = condition if result is None else result & condition
+            else:
+                key, start, end = condition
+                if result is None or size <= 4 * len(result):
+                    members = set(self.ranges[key][1][start:end])
+                    result = members if result is None else result & members
+                else:
+                    values = self.ranges[key][0]
+                    low, high = values[start], values[end - 1]
+                    numbers = self.numbers[key]
+                    result = {
+                        i
+                        for i in result
+                        if numbers[i] is not None and low <= numbers[i] <= high
+                    }
+            if not result:
+                return frozenset()
+
+        if query.q:
+            if text_scores is None:
+                text_scores = self.search.scores(query.q)
+            found = text_scores.keys()
+            result = found if result is None else found & result
+        return result
+
+    # Resultados
+
+    def page(self, query: ProductQuery) -> Tuple[int, List[Dict]]:
+        """(total de coincidencias, productos de la página pedida)"""
+        text_scores = self.search.scores(query.q) if query.q else None
+        matched = self.match(query, text_scores=text_scores)
+        start, end = query.offset, query.offset + query.per_page
+        order = self.orders[(query.sort, query.descending)] if query.sort else None
+
+        if matched is None:
+            total = len(self.products)
+            if order is None:
+                return total, self.products[start:end]
+            return total, [self.products[i] for i in order[start:end]]
+
+        total = len(matched)
+        if text_scores is not None and order is None:
+            # Búsqueda sin orden pedido: primero los más relevantes
+            selected = heapq.nlargest(end, matched, key=text_scores.__getitem__)[start:]
+        elif end * len(self.products) <= 2 * total * total:
+            # Muchas coincidencias: recorrer el orden precalculado hasta
+            # completar la página cuesta menos que ordenarlas
+            walk = order if order is not None else range(len(self.products))
+            selected = list(islice((i for i in walk if i in matched), start, end))
+        else:
+            key = (
+                self.ranks[(query.sort, query.descending)].__getitem__
+                if order
+                else None
+            )
+            if end * 8 < total:
+                selected = heapq.nsmallest(end, matched, key=key)[start:]
+            else:
+                selected = sorted(matched, key=key)[start:end]
+        return total, [self.products[i] for i in selected]
+
+    def facets(self, query: Optional[ProductQuery] = None) -> Dict[str, List[Dict]]:
+        """
+        Cantidad de productos por familia y por marca. Cada faceta respeta
+        los demás filtros de la consulta pero no el propio, para mostrar
+        cuántos hay en las otras opciones.
+        """
+        query = query or ProductQuery()
+        result = {}
+        for name, index, value_of in (
+            ("familia", self.by_familia, self.familia_of),
+            ("marca", self.by_marca, self.marca_of),
+        ):
+            matched = self.match(query, skip=(name,))
+            if matched is None:
+                counts = {value: len(members) for value, members in index.items()}
+            else:
+                counts = Counter(value_of[i] for i in matched if value_of[i])
+            result[name] = [
+                {"value": value, "count": count}
+                for value, count in sorted(
+                    counts.items(), key=lambda item: (-item[1], item[0].casefold())
+                )
+            ]
+        return result
@@ -0,0 +1,256 @@
+"""
+Búsqueda de texto en el catálogo para STEL Shop
+Índice invertido que se arma una vez por copia del catálogo sobre nombre,
+marca, modelo, familia y SKU, sin acentos ("tensión" = "tension"), con
+prefijos para autocompletar, tolerancia a un error de tipeo y resultados
+ordenados por relevancia
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Peso de cada campo en la relevancia (el mayor si el término está en varios)
+FIELD_WEIGHTS = {"sku": 10, "modelo": 6, "marca": 4, "familia": 3, "nombre": 2}
+
+# Calidad de cada tipo de coincidencia
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+
+# Términos más cortos no se corrigen (demasiadas palabras a un error)
+FUZZY_MIN_LENGTH = 4
+MIN_PREFIX_LENGTH = 2
+# Un prefijo corto se expande a sus términos más frecuentes
+MAX_PREFIX_EXPANSIONS = 200
+_PREFIX_SCAN = 2000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos ni diéresis: "Tensión" -> "tension" """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+def _deletes(term: str) -> Iterable[str]:
+    return {term[:i] + term[i + 1 :] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Distancia de edición <= 1 (inserción, borrado, cambio o transposición)"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1 :] == b[i + 1 :]:
+            return True
+        return (
+            i + 1 < la
+            and a[i] == b[i + 1]
+            and a[i + 1] == b[i]
+            and a[i + 2 :] == b[i + 2 :]
+        )
+    if la > lb:
+        return a[i + 1 :] == b[i:]
+    return a[i:] == b[i + 1 :]
+
+
+class SearchIndex:
+    """
+    Índice invertido de una copia del catálogo (productos ya formateados).
+    Cada término guarda las posiciones de los productos que lo contienen,
+    agrupadas por el peso del mejor campo en que aparece.
+
+    search() exige que cada término de la consulta coincida (exacto, como
+    prefijo si es el último o con un error de tipeo si no existe tal cual)
+    y ordena por relevancia: peso del campo, tipo de coincidencia y rareza
+    del término.
+    """
+
+    def __init__(self, products: List[Dict]):
+        self.size = len(products)
+        postings: Dict[str, Dict[int, int]] = {}
+        folded: Dict[str, List[str]] = {}
+
+        for position, product in enumerate(products):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = str(product.get(field) or "")
+                if not value:
+                    continue
+                tokens = folded.get(value)
+                if tokens is None:
+                    tokens = tokenize(value)
+                    if field == "sku":
+                        # "GE-001" también se encuentra como "ge001"
+                        compact = "".join(tokens)
+                        if compact and compact not in tokens:
+                            tokens.append(compact)
+                    # marca y familia se repiten mucho entre productos
+                    if field in ("marca", "familia"):
+                        folded[value] = tokens
+                for token in tokens:
+                    docs = postings.setdefault(token, {})
+                    if docs.get(position, 0) < weight:
+                        docs[position] = weight
+
+        # Listas compactas por peso: (peso, posiciones ordenadas), del mayor
+        # peso al menor; así se puntúa un grupo entero de una vez
+        self.postings: Dict[str, Tuple[Tuple[int, array], ...]] = {}
+        self.df: Dict[str, int] = {}
+        for token, docs in postings.items():
+            by_weight: Dict[int, List[int]] = {}
+            for doc, weight in docs.items():
+                by_weight.setdefault(weight, []).append(doc)
+            self.postings[token] = tuple(
+                (weight, array("I", sorted(by_weight[weight])))
+                for weight in sorted(by_weight, reverse=True)
+            )
+            self.df[token] = len(docs)
+        self.vocabulary = sorted(self.postings)
+
+        # Corrección de tipeo (symmetric delete): cada variante con una letra
+        # menos apunta a los términos de los que sale. Los términos que solo
+        # aparecen en SKUs no se corrigen
+        sku_only = ((FIELD_WEIGHTS["sku"],),)
+        self._deletes: Dict[str, List[str]] = {}
+        for token, groups in self.postings.items():
+            if len(token) < FUZZY_MIN_LENGTH:
+                continue
+            if tuple((weight,) for weight, _ in groups) == sku_only:
+                continue
+            for variant in _deletes(token):
+                self._deletes.setdefault(variant, []).append(token)
+
+    # Variantes de cada término
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        found = []
+        for token in self.vocabulary[start : start + _PREFIX_SCAN]:
+            if not token.startswith(prefix):
+                break
+            found.append(token)
+        if len(found) > MAX_PREFIX_EXPANSIONS:
+            found = heapq.nlargest(
+                MAX_PREFIX_EXPANSIONS, found, key=self.df.__getitem__
+            )
+        return found
+
+    def _fuzzy(self, term: str) -> List[str]:
+        candidates: Set[str] = set(self._deletes.get(term, ()))
+        if term in self.postings:
+            candidates.add(term)
+        for variant in _deletes(term):
+            if variant in self.postings:
+                candidates.add(variant)
+            candidates.update(self._deletes.get(variant, ()))
+        return [
+            token
+            for token in candidates
+            if token != term and _within_one_edit(term, token)
+        ]
+
+    def expand(self, term: str, last: bool = False) -> Dict[str, float]:
+        """Términos del índice que cuentan como term, con su calidad"""
+        variants: Dict[str, float] = {}
+        if term in self.postings:
+            variants[term] = EXACT_MATCH
+        if last and len(term) >= MIN_PREFIX_LENGTH:
+            for token in self._prefixed(term):
+                variants.setdefault(token, PREFIX_MATCH)
+        if not variants and len(term) >= FUZZY_MIN_LENGTH:
+            for token in self._fuzzy(term):
+                variants[token] = FUZZY_MATCH
+        return variants
+
+    # Consultas
+
+    def _term_scores(
+        self, variants: Dict[str, float], within: Optional[Dict[int, float]]
+    ) -> Dict[int, float]:
+        # Cada producto suma por la primera variante que lo contiene, de la
+        # que más pesa (calidad por rareza) a la que menos, y dentro de ella
+        # por el campo de mayor peso
+        ordered = sorted(
+            (
+                quality * math.log(1 + self.size / self.df[token]),
+                token,
+            )
+            for token, quality in variants.items()
+        )
+        scores: Dict[int, float] = {}
+        for factor, token in reversed(ordered):
+            for weight, docs in self.postings[token]:
+                score = weight * factor
+                if within is None:
+                    found = docs
+                elif len(within) * 8 < len(docs):
+                    # Pocos candidatos: se buscan en la lista ordenada
+                    found = []
+                    for doc in within:
+                        j = bisect_left(docs, doc)
+                        if j < len(docs) and docs[j] == doc:
+                            found.append(doc)
+                else:
+                    found = sorted(within.keys() & docs)
+                if not scores:
+                    scores = dict.fromkeys(found, score)
+                    continue
+                # Se completa en el lugar: copiar lo acumulado por cada
+                # variante es cuadrático con muchas expansiones de prefijo
+                for doc in found:
+                    if doc not in scores:
+                        scores[doc] = score
+        return scores
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """Relevancia de cada producto que cumple todos los términos"""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        expanded = [
+            self.expand(term, last=i == len(terms) - 1) for i, term in enumerate(terms)
+        ]
+        if not all(expanded):
+            return {}
+
+        # Del término más raro al más común: los siguientes solo suman a
+        # los productos que ya cumplen los anteriores
+        expanded.sort(key=lambda v: sum(self.df[token] for token in v))
+        total: Optional[Dict[int, float]] = None
+        for variants in expanded:
+            term_scores = self._term_scores(variants, total)
+            if total is None:
+                total = term_scores
+            else:
+                total = {doc: total[doc] + s for doc, s in term_scores.items()}
+            if not total:
+                return {}
+        return total
+
+    def matches(self, query: str) -> Set[int]:
+        return set(self.scores(query))
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[int, List[Tuple[int, float]]]:
+        """(total de coincidencias, [(posición, relevancia)] de la página)"""
+        scores = self.scores(query)
+        # nlargest es estable: a igual relevancia el orden no cambia entre pedidos
+        best = heapq.nlargest(offset + limit, scores, key=scores.__getitem__)
+        return len(scores), [(doc, scores[doc]) for doc in best[offset:]]
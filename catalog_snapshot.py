@@ -0,0 +1,266 @@
+"""
+Copia persistente del catálogo para STEL Shop
+Guarda en SQLite la última copia buena del catálogo (productos, respuesta
+de /api/products ya comprimida e índices) para que el servidor arranque
+sirviendo el catálogo sin esperar a la Cloud Function
+"""
+
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from json_payload import PreparedJson
+
+# Subir al cambiar CatalogIndex o SearchIndex: los índices guardados con
+# otro formato se descartan y se vuelven a armar desde los productos
+SNAPSHOT_FORMAT = 1
+
+# Compresión rápida: importa más leer en milisegundos que ahorrar bytes
+_ZLIB_LEVEL = 1
+
+
+class StoredCatalog:
+    """
+    Copia leída del disco: productos, respuesta preparada e índices. Si la
+    respuesta se guardó con otro formato, payload es None y hay que volver
+    a armarla desde los productos
+    """
+
+    __slots__ = ("products", "fetched_at", "version", "saved_at", "payload", "_indexes")
+
+    def __init__(
+        self,
+        products: List[Dict],
+        fetched_at: float,
+        version: int,
+        saved_at: float,
+        payload: Optional[PreparedJson],
+        indexes: Optional[bytes],
+    ):
+        self.products = products
+        self.fetched_at = fetched_at
+        self.version = version
+        self.saved_at = saved_at
+        self.payload = payload
+        self._indexes = indexes
+
+    def load_indexes(self) -> Any:
+        """Índices guardados, o None si no hay o no se pueden leer"""
+        if self._indexes is None:
+            return None
+        try:
+            return pickle.loads(zlib.decompress(self._indexes))
+        except Exception as e:
+            print(f"⚠️ Índices del catálogo en disco ilegibles: {e}")
+            return None
+
+
+class CatalogSnapshotFile:
+    """
+    Última copia buena del catálogo en disco (una sola fila en SQLite, que
+    se reemplaza en una transacción). Es una caché local del propio
+    servidor: los productos y los índices se guardan con pickle.
+    payload_format identifica la forma de la respuesta (lo define quien la
+    arma); una copia guardada con otro se lee sin respuesta ni índices.
+    """
+
+    def __init__(self, db_path, payload_format: int = 1):
+        self.db_path = Path(db_path)
+        self.payload_format = payload_format
+        self._lock = threading.Lock()
+        self.counters = {
+            "saves": 0,
+            "touches": 0,
+            "loads": 0,
+            "stale_payloads": 0,
+            "bytes_written": 0,
+        }
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Se escribe desde el thread de actualización del catálogo
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(catalog_snapshot)")
+        }
+        if columns and "payload_format" not in columns:
+            # Copia de una versión sin formato de respuesta: se descarta
+            self._conn.execute("DROP TABLE catalog_snapshot")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                format INTEGER NOT NULL,
+                payload_format INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                saved_at REAL NOT NULL,
+                product_count INTEGER NOT NULL,
+                products_hash TEXT NOT NULL,
+                products BLOB NOT NULL,
+                payload_digest TEXT NOT NULL,
+                payload_identity BLOB NOT NULL,
+                payload_gzip BLOB,
+                payload_br BLOB,
+                indexes BLOB
+            )
+            """)
+        self._conn.commit()
+
+    def save(
+        self,
+        products: List[Dict],
+        fetched_at: float,
+        version: int,
+        payload: PreparedJson,
+        indexes: Any = None,
+    ) -> int:
+        """
+        Guarda la copia y retorna los bytes escritos. Si los productos no
+        cambiaron desde la última vez solo se actualiza la fecha (0 bytes).
+        """
+        # pickle se lee al iniciar el doble de rápido que JSON
+        raw = pickle.dumps(products, protocol=pickle.HIGHEST_PROTOCOL)
+        products_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT format, payload_format, products_hash, payload_digest "
+                "FROM catalog_snapshot"
+            ).fetchone()
+        if row == (
+            SNAPSHOT_FORMAT,
+            self.payload_format,
+            products_hash,
+            payload.digest,
+        ):
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE catalog_snapshot SET fetched_at = ?, version = ?, "
+                    "saved_at = ?",
+                    (fetched_at, version, now),
+                )
+                self._conn.commit()
+                self.counters["touches"] += 1
+            return 0
+
+        # La compresión y el pickle corren fuera del lock
+        blobs = (
+            zlib.compress(raw, _ZLIB_LEVEL),
+            zlib.compress(payload.identity, _ZLIB_LEVEL),
+            payload.encoded.get("gzip"),
+            payload.encoded.get("br"),
+            (
+                zlib.compress(
+                    pickle.dumps(indexes, protocol=pickle.HIGHEST_PROTOCOL),
+                    _ZLIB_LEVEL,
+                )
+                if indexes is not None
+                else None
+            ),
+        )
+        size = sum(len(blob) for blob in blobs if blob)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO catalog_snapshot
+                    (id, format, payload_format, version, fetched_at, saved_at,
+                     product_count, products_hash, products, payload_digest,
+                     payload_identity, payload_gzip, payload_br, indexes)
+                VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    SNAPSHOT_FORMAT,
+                    self.payload_format,
+                    version,
+                    fetched_at,
+                    now,
+                    len(products),
+                    products_hash,
+                    blobs[0],
+                    payload.digest,
+                    *blobs[1:],
+                ),
+            )
+            self._conn.commit()
+            self.counters["saves"] += 1
+            self.counters["bytes_written"] += size
+        return size
+
+    def load(self) -> Optional[StoredCatalog]:
+        """Última copia guardada, o None si no hay ninguna"""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT format, payload_format, version, fetched_at, saved_at,
+                       products,
+                       payload_digest, payload_identity, payload_gzip,
+                       payload_br, indexes
+                FROM catalog_snapshot
+                """).fetchone()
+        if row is None:
+            return None
+
+        (
+            format_,
+            payload_format,
+            version,
+            fetched_at,
+            saved_at,
+            products,
+            digest,
+            identity,
+            gzip_body,
+            br_body,
+            indexes,
+        ) = row
+        payload = None
+        if payload_format == self.payload_format:
+            encoded = {}
+            if br_body is not None:
+                encoded["br"] = br_body
+            if gzip_body is not None:
+                encoded["gzip"] = gzip_body
+            payload = PreparedJson.from_parts(
+                zlib.decompress(identity), encoded, digest
+            )
+        else:
+            # Los índices guardan los productos ya formateados: tampoco sirven
+            indexes = None
+        with self._lock:
+            self.counters["loads"] += 1
+            if payload is None:
+                self.counters["stale_payloads"] += 1
+        return StoredCatalog(
+            pickle.loads(zlib.decompress(products)),
+            fetched_at,
+            version,
+            saved_at,
+            payload,
+            # Índices de otra versión del código: se vuelven a armar
+            indexes if format_ == SNAPSHOT_FORMAT else None,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de la copia en disco"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT product_count, fetched_at, saved_at FROM catalog_snapshot"
+            ).fetchone()
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "path": str(self.db_path),
+            "products": row[0] if row else 0,
+            "fetched_at": row[1] if row else None,
+            "saved_at": row[2] if row else None,
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,248 @@
+"""
+Catálogo de productos en memoria para STEL Shop
+Sirve la última copia buena mientras una sola actualización corre en
+segundo plano (stale-while-revalidate), agrupa las actualizaciones
+concurrentes en una sola descarga y mantiene un índice por SKU
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+
+class CatalogSnapshot:
+    """
+    Copia inmutable del catálogo con su índice por SKU y los valores
+    derivados de ella (lista formateada, JSON serializado, ...)
+    """
+
+    __slots__ = ("products", "by_sku", "fetched_at", "version", "_derived", "_lock")
+
+    def __init__(self, products: List[Dict], fetched_at: float, version: int):
+        self.products = products
+        self.fetched_at = fetched_at
+        self.version = version
+        self._derived: Dict[str, Any] = {}
+        # Reentrante: un valor derivado puede construirse a partir de otro
+        self._lock = threading.RLock()
+        # Mismo criterio que la búsqueda lineal anterior: campo SKU o sku,
+        # y ante SKUs repetidos gana el primero
+        by_sku: Dict[str, Dict] = {}
+        for product in products:
+            for key in ("SKU", "sku"):
+                sku = product.get(key)
+                if sku not in (None, ""):
+                    by_sku.setdefault(str(sku), product)
+        self.by_sku = by_sku
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def derived(self, name: str, build: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """
+        Valor calculado una sola vez por copia: build(snapshot) corre en el
+        primer pedido y los concurrentes esperan ese mismo resultado
+        """
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+
+class CatalogStore:
+    """
+    Catálogo compartido por las rutas del servidor. fetch descarga la lista
+    completa de productos y debe lanzar una excepción si falla.
+
+    - Sin datos: la primera consulta descarga y las concurrentes la esperan.
+    - Datos vencidos (más de ttl segundos): se devuelven enseguida y se
+      lanza una actualización en segundo plano si no hay una en curso.
+    - Si la descarga falla (o viene vacía) se conserva la última copia
+      buena y no se reintenta hasta pasados error_backoff segundos.
+
+    on_snapshot(snapshot) corre con cada copia nueva antes de publicarla,
+    para preparar sus valores derivados fuera de los pedidos; persist(snapshot)
+    corre en segundo plano después de publicarla (por ejemplo para guardarla
+    en disco).
+    restore() publica una copia guardada mientras no haya otra.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], List[Dict]],
+        ttl: float = 300,
+        error_backoff: float = 15,
+        wait_timeout: float = 35,
+        on_snapshot: Optional[Callable[[CatalogSnapshot], Any]] = None,
+        persist: Optional[Callable[[CatalogSnapshot], Any]] = None,
+    ):
+        self.fetch = fetch
+        self.on_snapshot = on_snapshot
+        self.persist = persist
+        self.ttl = ttl
+        self.error_backoff = error_backoff
+        self.wait_timeout = wait_timeout
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._flight: Optional[threading.Event] = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.last_error: Optional[str] = None
+        self.counters = {
+            "fetches": 0,
+            "errors": 0,
+            "stale_served": 0,
+            "waits": 0,
+            "joined_flights": 0,
+            "restored": 0,
+        }
+
+    # Consultas
+
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Copia actual, actualizándola si hace falta (ver la clase)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Tras un error se espera error_backoff antes de volver a intentar
+            if time.time() >= self._retry_at:
+                self.refresh(wait=True)
+            return self._snapshot
+
+        if snapshot.age() >= self.ttl and time.time() >= self._retry_at:
+            with self._lock:
+                self.counters["stale_served"] += 1
+            self.refresh(wait=False)
+        return snapshot
+
+    def products(self) -> List[Dict]:
+        snapshot = self.snapshot()
+        return snapshot.products if snapshot is not None else []
+
+    def get_by_sku(self, sku: str) -> Optional[Dict]:
+        snapshot = self.snapshot()
+        return snapshot.by_sku.get(str(sku)) if snapshot is not None else None
+
+    # Actualización
+
+    def restore(self, snapshot: CatalogSnapshot) -> bool:
+        """
+        Publica una copia guardada (por ejemplo la del disco al iniciar) si
+        todavía no hay ninguna; vencida o no, la próxima consulta la revalida
+        según ttl. Retorna False si ya había una copia.
+        """
+        with self._lock:
+            if self._snapshot is not None:
+                return False
+            self._snapshot = snapshot
+            self.counters["restored"] += 1
+        return True
+
+    def refresh(self, wait: bool = True) -> bool:
+        """
+        Descarga el catálogo salvo que ya haya una descarga en curso, en cuyo
+        caso se suma a esa. Con wait=False corre en segundo plano. Retorna
+        True si al terminar hay una copia disponible (nueva o anterior).
+        """
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = threading.Event()
+            else:
+                self.counters["joined_flights"] += 1
+
+        if leader:
+            if wait:
+                self._run_flight(flight)
+            else:
+                threading.Thread(
+                    target=self._run_flight,
+                    args=(flight,),
+                    name="catalog-refresh",
+                    daemon=True,
+                ).start()
+                return self._snapshot is not None
+        elif wait:
+            with self._lock:
+                self.counters["waits"] += 1
+            flight.wait(self.wait_timeout)
+        return self._snapshot is not None
+
+    def _run_flight(self, flight: threading.Event) -> None:
+        started = time.perf_counter()
+        published = None
+        try:
+            products = self.fetch()
+            if not products:
+                raise ValueError("la Cloud Function devolvió un catálogo vacío")
+        except Exception as e:
+            with self._lock:
+                self.counters["fetches"] += 1
+                self.counters["errors"] += 1
+                self.last_error = str(e)
+                self._retry_at = time.time() + self.error_backoff
+            if self._snapshot is not None:
+                print(
+                    f"⚠️ No se pudo actualizar el catálogo ({e}); "
+                    f"se mantiene la copia de hace {self._snapshot.age():.0f} s"
+                )
+            else:
+                print(f"❌ No se pudo obtener el catálogo: {e}")
+        else:
+            with self._lock:
+                version = self._snapshot.version + 1 if self._snapshot else 1
+            # El índice se arma fuera del lock; el cambio de copia es atómico
+            snapshot = CatalogSnapshot(products, time.time(), version)
+            if self.on_snapshot is not None:
+                try:
+                    self.on_snapshot(snapshot)
+                except Exception as e:
+                    print(f"⚠️ Error preparando la copia del catálogo: {e}")
+            with self._lock:
+                self._snapshot = published = snapshot
+                self.counters["fetches"] += 1
+                self.last_error = None
+                self._retry_at = 0.0
+            print(
+                f"✅ Catálogo actualizado: {len(products)} productos "
+                f"en {time.perf_counter() - started:.1f} s"
+            )
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
+
+        # En su propio thread: ni los que esperaban la copia ni quien lanzó
+        # la descarga esperan a que se guarde
+        if published is not None and self.persist is not None:
+            threading.Thread(
+                target=self._persist,
+                args=(published,),
+                name="catalog-persist",
+                daemon=True,
+            ).start()
+
+    def _persist(self, snapshot: CatalogSnapshot) -> None:
+        try:
+            self.persist(snapshot)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la copia del catálogo: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        with self._lock:
+            counters = dict(self.counters)
+            refreshing = self._flight is not None
+        return {
+            **counters,
+            "products": len(snapshot.products) if snapshot else 0,
+            "version": snapshot.version if snapshot else 0,
+            "age_seconds": round(snapshot.age(), 1) if snapshot else None,
+            "stale": bool(snapshot and snapshot.age() >= self.ttl),
+            "refreshing": refreshing,
+            "last_error": self.last_error,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,132 @@
+"""
+Fixtures compartidas de las pruebas de STEL Shop
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ai_handler_enhanced import EnhancedAIHandler
+from generation_cache import GenerationCache
+from metrics import MetricsRecorder
+from pdf_cache import PdfCache
+from pdf_extraction import PdfParserPool
+from providers import LocalProvider
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    """Handler con proveedor local y cachés en un directorio temporal"""
+    handlers = []
+
+    def build(provider=None, **kwargs):
+        kwargs.setdefault("cache", GenerationCache(tmp_path / "generations.sqlite"))
+        kwargs.setdefault("pdf_cache", PdfCache(tmp_path / "pdfs"))
+        kwargs.setdefault("pdf_parser", PdfParserPool(max_workers=0))
+        kwargs.setdefault("metrics", MetricsRecorder())
+        kwargs.setdefault("ai_config", {"provider": "local"})
+        handler = EnhancedAIHandler(
+            provider=provider if provider is not None else LocalProvider(), **kwargs
+        )
+        handlers.append(handler)
+        return handler
+
+    yield build
+    for handler in handlers:
+        handler.cache.close()
+        handler.pdf_cache.close()
+
+
+def make_pdf(pages):
+    """PDF mínimo válido con una página por texto (sin dependencias)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    font = 3 + 2 * len(pages)
+    kids = []
+    for index, text in enumerate(pages):
+        page, content = 3 + 2 * index, 4 + 2 * index
+        kids.append(f"{page} 0 R")
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream = f"BT /F1 12 Tf 72 720 Td ({escaped}) Tj ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {content} 0 R /Resources << /Font << /F1 {font} 0 R >> >> >>".encode()
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+    objects[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+    )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+class _RouteHandler(BaseHTTPRequestHandler):
+    routes = {}
+
+    def do_GET(self):
+        body, headers = self.routes.get(self.path, (None, {}))
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    Servidor HTTP local. routes: ruta -> (cuerpo, encabezados); sin
+    Content-Length la respuesta termina al cerrar la conexión
+    """
+    routes = {}
+    handler = type("Handler", (_RouteHandler,), {"routes": routes})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.routes = routes
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def catalog_client(monkeypatch):
+    """
+    Cliente de prueba del servidor con un catálogo en memoria: recibe los
+    productos tal como los devuelve la Cloud Function
+    """
+    import quick_integration
+    from catalog_store import CatalogStore
+
+    def build(products):
+        store = CatalogStore(
+            lambda: list(products), on_snapshot=quick_integration.prepare_snapshot
+        )
+        monkeypatch.setattr(quick_integration, "catalog", store)
+        monkeypatch.setattr(quick_integration, "catalog_file", None)
+        return quick_integration.app.test_client()
+
+    return build
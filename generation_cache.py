@@ -0,0 +1,182 @@
+"""
+Caché persistente de generaciones con IA para STEL Shop
+Guarda en SQLite los resultados de Gemini indexados por contenido
+(producto normalizado + hash del PDF + versión del prompt)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+class GenerationCache:
+    """Caché en disco (SQLite) con desalojo LRU por cantidad y tamaño"""
+
+    def __init__(
+        self,
+        db_path,
+        max_entries: int = 5000,
+        max_bytes: int = 200 * 1024 * 1024,
+    ):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # El handler se usa desde Flask y desde el thread de Selenium
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                sku TEXT,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generations_sku ON generations (sku)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generations_access "
+            "ON generations (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_product(product_info: Dict) -> Dict[str, Any]:
+        """Normaliza los campos del producto para que la clave sea estable"""
+        normalized = {}
+        for key, value in product_info.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = " ".join(value.split())
+                if not value:
+                    continue
+            normalized[str(key).strip().lower()] = value
+        return normalized
+
+    @classmethod
+    def make_key(
+        cls,
+        product_info: Dict,
+        pdf_hash: str = "",
+        prompt_version: str = "",
+        extra: Optional[Dict] = None,
+    ) -> str:
+        """Construye la clave de contenido para una generación"""
+        payload = {
+            "product": cls.normalize_product(product_info),
+            "pdf": pdf_hash or "",
+            "prompt": prompt_version or "",
+            "extra": extra or {},
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve el resultado guardado o None, actualizando el acceso LRU"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE generations SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict, sku: str = "") -> None:
+        """Guarda un resultado y aplica el desalojo si se superan los límites"""
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO generations
+                    (key, sku, value, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, str(sku or ""), raw, len(raw.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate_sku(self, sku: str) -> int:
+        """Elimina todas las entradas de un SKU. Retorna cuántas se borraron"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM generations WHERE sku = ?", (str(sku),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        """Vacía la caché completa"""
+        with self._lock:
+            self._conn.execute("DELETE FROM generations")
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Desaloja las entradas menos usadas recientemente (requiere el lock)"""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generations"
+        ).fetchone()
+
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM generations ORDER BY last_access ASC"
+        ).fetchall()
+
+        to_delete = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total -= size
+
+        self._conn.executemany("DELETE FROM generations WHERE key = ?", to_delete)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generations"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,311 @@
+"""
+Post-procesado del HTML generado para STEL Shop
+En una sola pasada sobre el HTML (sin armar un árbol): colapsa espacios,
+normaliza los estilos inline y quita declaraciones repetidas, elimina
+comentarios, verifica que las etiquetas estén balanceadas y controla el
+tamaño final contra un presupuesto de bytes
+"""
+
+import re
+import threading
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, Tuple
+
+# Tope del HTML que se inserta en CKEditor y guarda Stelorder
+HTML_MAX_BYTES = 48 * 1024
+
+# Elementos sin etiqueta de cierre
+VOID_ELEMENTS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+
+# Elementos cuyo cierre es opcional en HTML: se cierran sin informar problema
+OPTIONAL_CLOSE = frozenset(
+    "p li dt dd tr td th thead tbody tfoot colgroup option rp rt".split()
+)
+
+# Elementos que cierran al hermano abierto del mismo tipo (<li> tras <li>)
+IMPLIED_END = {
+    "li": ("li",),
+    "p": ("p",),
+    "dt": ("dt", "dd"),
+    "dd": ("dt", "dd"),
+    "td": ("td", "th"),
+    "th": ("td", "th"),
+    "tr": ("tr", "td", "th"),
+    "option": ("option",),
+}
+
+# Junto a estos elementos los espacios no se ven y se pueden quitar
+BLOCK_ELEMENTS = frozenset("""
+    address article aside blockquote body br caption col colgroup dd details
+    div dl dt fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 head
+    header hr html li link main meta nav ol option p section summary table
+    tbody td tfoot th thead title tr ul style script
+    """.split())
+
+# Contenido que se copia tal cual
+RAW_ELEMENTS = frozenset("pre textarea script style".split())
+
+_SPACES_RE = re.compile(r"[ \t\n\r\f]+")
+_COMMA_RE = re.compile(r"\s*,\s*")
+# Estilos que no se reescriben: strings, url(), escapes y comentarios CSS
+_UNSAFE_STYLE_RE = re.compile(r"[\"'\\]|url\(|/\*", re.IGNORECASE)
+# Los estilos distintos se normalizan una sola vez por proceso
+_STYLE_MEMO_MAX = 4096
+
+
+def normalize_style(style: str) -> str:
+    """
+    Normaliza un atributo style: propiedades en minúscula, sin espacios
+    sobrantes y sin declaraciones repetidas (queda la última, como en CSS).
+    Los estilos con strings, url(), comentarios o !important solo se
+    compactan.
+    """
+    style = _SPACES_RE.sub(" ", style).strip()
+    if _UNSAFE_STYLE_RE.search(style):
+        return style
+    if "!important" in style.lower():
+        return ";".join(part.strip() for part in style.split(";") if part.strip())
+
+    declarations: Dict[str, str] = {}
+    for part in style.split(";"):
+        name, separator, value = part.partition(":")
+        name = name.strip().lower()
+        value = _COMMA_RE.sub(",", value.strip())
+        if not separator or not name or not value:
+            continue
+        # Una propiedad repetida pasa al lugar de su última aparición
+        declarations.pop(name, None)
+        declarations[name] = value
+    return ";".join(f"{name}:{value}" for name, value in declarations.items())
+
+
+def _count_declarations(style: str) -> int:
+    return sum(1 for part in style.split(";") if part.strip())
+
+
+def _escape_attribute(value: str) -> str:
+    return value.replace("&", "&amp;").replace('"', "&quot;")
+
+
+class _Minifier(HTMLParser):
+    """Tokenizador que escribe el HTML compactado a medida que lo recorre"""
+
+    def __init__(self, style_memo: Dict[str, Tuple[str, int]]):
+        # Sin convertir entidades: el texto se copia como vino
+        super().__init__(convert_charrefs=False)
+        self.style_memo = style_memo
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.problems: List[str] = []
+        self.comments = 0
+        self.styles = 0
+        self.styles_deduped = 0
+        self._raw = 0
+        self._space = False
+        self._after_block = True
+
+    # Espacios entre etiquetas
+
+    def _boundary(self, tag: str) -> None:
+        if tag in BLOCK_ELEMENTS:
+            self._after_block = True
+        else:
+            if self._space and not self._after_block:
+                self.out.append(" ")
+            self._after_block = False
+        self._space = False
+
+    def _text(self, data: str) -> None:
+        if self._raw:
+            self.out.append(data)
+            return
+        text = _SPACES_RE.sub(" ", data)
+        if text.startswith(" "):
+            self._space = True
+        stripped = text.strip(" ")
+        if not stripped:
+            return
+        if self._space and not self._after_block:
+            self.out.append(" ")
+        self.out.append(stripped)
+        self._space = text.endswith(" ")
+        self._after_block = False
+
+    # Etiquetas
+
+    def _attributes(self, attrs) -> str:
+        parts = []
+        for name, value in attrs:
+            if value is None:
+                parts.append(f" {name}")
+                continue
+            if name == "style":
+                memo = self.style_memo.get(value)
+                if memo is None:
+                    normalized = normalize_style(value)
+                    # Declaraciones repetidas o vacías que se quitaron
+                    removed = _count_declarations(value) - _count_declarations(
+                        normalized
+                    )
+                    memo = (normalized, removed)
+                    if len(self.style_memo) < _STYLE_MEMO_MAX:
+                        self.style_memo[value] = memo
+                normalized, removed = memo
+                self.styles += 1
+                self.styles_deduped += int(removed > 0)
+                if not normalized:
+                    continue
+                value = normalized
+            elif name == "class":
+                value = " ".join(value.split())
+            parts.append(f' {name}="{_escape_attribute(value)}"')
+        return "".join(parts)
+
+    def handle_starttag(self, tag, attrs):
+        implied = IMPLIED_END.get(tag)
+        while implied and self.stack and self.stack[-1] in implied:
+            self._close(self.stack.pop())
+        self._boundary(tag)
+        self.out.append(f"<{tag}{self._attributes(attrs)}>")
+        if tag in VOID_ELEMENTS:
+            return
+        self.stack.append(tag)
+        if tag in RAW_ELEMENTS:
+            self._raw += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._boundary(tag)
+        if tag in VOID_ELEMENTS:
+            self.out.append(f"<{tag}{self._attributes(attrs)}>")
+        else:
+            self.out.append(f"<{tag}{self._attributes(attrs)}></{tag}>")
+
+    def _close(self, tag: str) -> None:
+        self._boundary(tag)
+        self.out.append(f"</{tag}>")
+        if tag in RAW_ELEMENTS:
+            self._raw -= 1
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            # </br> y similares no cierran nada
+            return
+        if tag not in self.stack:
+            self.problems.append(f"cierre sobrante </{tag}>")
+            return
+        while self.stack:
+            open_tag = self.stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_CLOSE:
+                self.problems.append(f"<{open_tag}> sin cerrar")
+            self._close(open_tag)
+        self._close(tag)
+
+    # Texto, entidades, comentarios y declaraciones
+
+    def handle_data(self, data):
+        self._text(data)
+
+    def handle_entityref(self, name):
+        self._text(f"&{name};")
+
+    def handle_charref(self, name):
+        self._text(f"&#{name};")
+
+    def handle_comment(self, data):
+        # Los comentarios condicionales de Outlook/IE cambian el render
+        if data.startswith("[if"):
+            self.out.append(f"<!--{data}-->")
+        else:
+            self.comments += 1
+
+    def handle_decl(self, decl):
+        self.out.append(f"<!{decl}>")
+
+    def unknown_decl(self, data):
+        self.out.append(f"<![{data}]>")
+
+    def handle_pi(self, data):
+        self.out.append(f"<?{data}>")
+
+    def finish(self) -> str:
+        self.close()
+        # Lo que quedó abierto (por ejemplo un HTML truncado) se cierra al final
+        while self.stack:
+            open_tag = self.stack.pop()
+            if open_tag not in OPTIONAL_CLOSE:
+                self.problems.append(f"<{open_tag}> sin cerrar")
+            self._close(open_tag)
+        return "".join(self.out)
+
+
+class HtmlPostprocessor:
+    """
+    Compacta el HTML de las descripciones antes de guardarlo y enviarlo al
+    navegador. process() retorna el HTML resultante con su reporte
+    (bytes antes y después, problemas de balanceo, si excede max_bytes);
+    stats() acumula los totales de la sesión.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = HTML_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._style_memo: Dict[str, Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self.totals = {
+            "products": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "comments_removed": 0,
+            "styles_deduped": 0,
+            "unbalanced": 0,
+            "over_budget": 0,
+        }
+
+    def process(self, html: str) -> Dict[str, Any]:
+        minifier = _Minifier(self._style_memo)
+        minifier.feed(html)
+        result = minifier.finish()
+
+        bytes_in = len(html.encode("utf-8"))
+        bytes_out = len(result.encode("utf-8"))
+        over_budget = self.max_bytes is not None and bytes_out > self.max_bytes
+        report = {
+            "html": result,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "saved_pct": (
+                round(100 * (bytes_in - bytes_out) / bytes_in, 1) if bytes_in else 0.0
+            ),
+            "comments_removed": minifier.comments,
+            "styles": minifier.styles,
+            "styles_deduped": minifier.styles_deduped,
+            "balanced": not minifier.problems,
+            "problems": minifier.problems,
+            "over_budget": over_budget,
+        }
+
+        with self._lock:
+            self.totals["products"] += 1
+            self.totals["bytes_in"] += bytes_in
+            self.totals["bytes_out"] += bytes_out
+            self.totals["comments_removed"] += minifier.comments
+            self.totals["styles_deduped"] += minifier.styles_deduped
+            self.totals["unbalanced"] += int(bool(minifier.problems))
+            self.totals["over_budget"] += int(over_budget)
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self.totals)
+        totals["max_bytes"] = self.max_bytes
+        totals["saved_pct"] = (
+            round(
+                100 * (totals["bytes_in"] - totals["bytes_out"]) / totals["bytes_in"], 1
+            )
+            if totals["bytes_in"]
+            else 0.0
+        )
+        return totals
@@ -0,0 +1,307 @@
+"""
+Plantillas HTML precompiladas para STEL Shop
+Descripciones de respaldo (sin IA) y bloque de contacto armados con
+fragmentos estáticos compilados una sola vez y cacheados
+"""
+
+import time
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Any, List, Optional
+
+from pdf_batch import get_product_sku
+
+# Contacto por defecto cuando no se recibe configuración
+DEFAULT_CONTACT = {
+    "whatsapp": "541139563099",
+    "email": "info@generadores.ar",
+    "telefono_display": "+54 11 3956-3099",
+    "website": "www.generadores.ar",
+}
+
+# Campos de especificaciones de la tabla, en orden de aparición
+SPEC_FIELDS = {
+    "potencia": "Potencia",
+    "potencia_kva": "Potencia (kVA)",
+    "potencia_kw": "Potencia activa (kW)",
+    "voltaje": "Voltaje",
+    "frecuencia": "Frecuencia",
+    "motor": "Motor",
+    "consumo": "Consumo",
+    "peso": "Peso",
+    "dimensiones": "Dimensiones",
+}
+
+
+class CompiledTemplate:
+    """
+    Plantilla con campos {nombre} compilada una sola vez a un formato %s:
+    al renderizar solo se sustituyen los valores, sin volver a parsearla
+    """
+
+    __slots__ = ("source", "fields", "_format")
+
+    def __init__(self, source: str):
+        parts = []
+        fields = []
+        for literal, field, _, _ in Formatter().parse(source):
+            parts.append(literal.replace("%", "%%"))
+            if field is not None:
+                parts.append("%s")
+                fields.append(field)
+
+        self.source = source
+        self.fields = tuple(fields)
+        self._format = "".join(parts)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        return self._format % tuple(values[field] for field in self.fields)
+
+
+# Descripción de respaldo, partida en el cierre del header: ahí se inserta
+# el bloque de contacto (el primer </div>, como hacía _add_contact_section)
+_FALLBACK_HEAD = CompiledTemplate("""
+        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 900px; margin: 0 auto; background: #fff;">
+            
+            <!-- Header del Producto -->
+            <div style="background: linear-gradient(135deg, #ff6600 0%, #ff8533 100%); color: white; padding: 30px; border-radius: 15px 15px 0 0; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                <h1 style="margin: 0; font-size: 2.5em; font-weight: 700; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);">
+                    {nombre_mayusculas}
+                </h1>
+                {subtitulo}
+            """)
+
+_FALLBACK_TAIL = CompiledTemplate("""</div>
+            
+            <!-- Descripción Principal -->
+            <div style="padding: 30px; background: #f8f9fa; border-radius: 0 0 15px 15px;">
+                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
+                    <h2 style="color: #ff6600; margin-bottom: 15px; font-size: 1.8em;">
+                        <span style="margin-right: 10px;">🎯</span>Descripción General
+                    </h2>
+                    <p style="line-height: 1.8; color: #555; font-size: 1.1em; margin-bottom: 15px;">
+                        El <strong>{nombre}</strong> es un equipo de alta calidad diseñado para satisfacer las necesidades más exigentes del mercado. 
+                        Con tecnología de vanguardia y construcción robusta, este producto garantiza un rendimiento excepcional y durabilidad superior.
+                    </p>
+                    <p style="line-height: 1.8; color: #555; font-size: 1.1em;">
+                        Fabricado por <strong>{marca}</strong>, líder reconocido en el sector, este modelo combina innovación, 
+                        eficiencia y confiabilidad para brindar una solución integral a sus requerimientos.
+                    </p>
+                </div>
+                
+                <!-- Características Destacadas -->
+                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
+                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
+                        <span style="margin-right: 10px;">⭐</span>Características Destacadas
+                    </h2>
+                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 15px;">
+                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
+                            <strong style="color: #ff6600;">✓ Alta Eficiencia</strong>
+                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Optimización máxima de recursos</p>
+                        </div>
+                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
+                            <strong style="color: #ff6600;">✓ Durabilidad Garantizada</strong>
+                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Construcción robusta y confiable</p>
+                        </div>
+                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
+                            <strong style="color: #ff6600;">✓ Fácil Mantenimiento</strong>
+                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Diseño accesible y práctico</p>
+                        </div>
+                        <div style="padding: 15px; background: #fff3e0; border-radius: 8px; border-left: 4px solid #ff6600;">
+                            <strong style="color: #ff6600;">✓ Soporte Técnico</strong>
+                            <p style="margin: 5px 0 0 0; color: #666; font-size: 0.95em;">Asistencia profesional garantizada</p>
+                        </div>
+                    </div>
+                </div>
+                
+                <!-- Especificaciones Técnicas -->
+                {especificaciones}
+                
+                <!-- Aplicaciones -->
+                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
+                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
+                        <span style="margin-right: 10px;">🏭</span>Aplicaciones Principales
+                    </h2>
+                    <ul style="list-style: none; padding: 0;">
+                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
+                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
+                            <strong>Industria:</strong> Ideal para procesos productivos continuos
+                        </li>
+                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
+                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
+                            <strong>Comercio:</strong> Perfecto para aplicaciones comerciales exigentes
+                        </li>
+                        <li style="padding: 10px 0; border-bottom: 1px solid #eee;">
+                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
+                            <strong>Servicios:</strong> Solución confiable para el sector servicios
+                        </li>
+                        <li style="padding: 10px 0;">
+                            <span style="color: #ff6600; font-size: 1.2em; margin-right: 10px;">▸</span>
+                            <strong>Proyectos Especiales:</strong> Adaptable a requerimientos específicos
+                        </li>
+                    </ul>
+                </div>
+                
+                <!-- Beneficios -->
+                <div style="background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%); padding: 25px; border-radius: 10px; margin-bottom: 20px;">
+                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em; text-align: center;">
+                        ¿Por qué elegir este producto?
+                    </h2>
+                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; text-align: center;">
+                        <div>
+                            <div style="font-size: 3em; margin-bottom: 10px;">💪</div>
+                            <strong style="color: #ff6600;">Máximo Rendimiento</strong>
+                        </div>
+                        <div>
+                            <div style="font-size: 3em; margin-bottom: 10px;">🛡️</div>
+                            <strong style="color: #ff6600;">Garantía Extendida</strong>
+                        </div>
+                        <div>
+                            <div style="font-size: 3em; margin-bottom: 10px;">💰</div>
+                            <strong style="color: #ff6600;">Mejor Precio-Calidad</strong>
+                        </div>
+                        <div>
+                            <div style="font-size: 3em; margin-bottom: 10px;">🚀</div>
+                            <strong style="color: #ff6600;">Entrega Inmediata</strong>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </div>
+        """)
+
+_SPEC_BLOCK = CompiledTemplate("""
+                <div style="background: white; padding: 25px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px;">
+                    <h2 style="color: #ff6600; margin-bottom: 20px; font-size: 1.8em;">
+                        <span style="margin-right: 10px;">📊</span>Especificaciones Técnicas
+                    </h2>
+                    <table style="width: 100%; border-collapse: collapse;">
+                        {filas}
+                    </table>
+                </div>
+                """)
+
+_SPEC_ROW = """
+                <tr>
+                    <td style="font-weight: bold; padding: 10px; border-bottom: 1px solid #eee;">{label}</td>
+                    <td style="padding: 10px; border-bottom: 1px solid #eee;">{valor}</td>
+                </tr>
+                """
+
+# Filas de la tabla con la etiqueta ya resuelta
+_SPEC_ROWS = {
+    field: CompiledTemplate(_SPEC_ROW.replace("{label}", label))
+    for field, label in SPEC_FIELDS.items()
+}
+
+_CONTACT = CompiledTemplate("""
+        <!-- Sección de Contacto -->
+        <div style="background: #333; color: white; padding: 30px; text-align: center; margin-top: 30px; border-radius: 15px;">
+            <h2 style="margin-bottom: 20px; font-size: 2em;">¡Contáctanos Ahora!</h2>
+            <p style="font-size: 1.2em; margin-bottom: 25px; opacity: 0.9;">
+                Nuestro equipo de expertos está listo para asesorarte
+            </p>
+            <div style="display: flex; justify-content: center; gap: 20px; flex-wrap: wrap;">
+                <a href="https://wa.me/{whatsapp}" 
+                   style="background: #25D366; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
+                    <span style="font-size: 1.5em;">📱</span> WhatsApp
+                </a>
+                <a href="mailto:{email}" 
+                   style="background: #ff6600; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
+                    <span style="font-size: 1.5em;">✉️</span> Email
+                </a>
+                <a href="tel:{whatsapp}" 
+                   style="background: #0066cc; color: white; padding: 15px 30px; border-radius: 50px; text-decoration: none; display: inline-flex; align-items: center; gap: 10px; font-weight: bold; transition: transform 0.3s;">
+                    <span style="font-size: 1.5em;">📞</span> {telefono_display}
+                </a>
+            </div>
+        </div>
+        """)
+
+
+@lru_cache(maxsize=32)
+def _contact_fragment(whatsapp: str, email: str, telefono_display: str) -> str:
+    return _CONTACT.render(
+        {"whatsapp": whatsapp, "email": email, "telefono_display": telefono_display}
+    )
+
+
+def contact_block(config: Optional[Dict] = None) -> str:
+    """Bloque de contacto (cacheado por datos de contacto)"""
+    if not config:
+        config = DEFAULT_CONTACT
+    return _contact_fragment(
+        config["whatsapp"], config["email"], config["telefono_display"]
+    )
+
+
+def insert_contact(html: str, config: Optional[Dict] = None) -> str:
+    """Inserta el bloque de contacto antes del primer </div> del HTML"""
+    return html.replace("</div>", contact_block(config) + "</div>", 1)
+
+
+def render_spec_rows(product_info: Dict) -> str:
+    """Filas de la tabla de especificaciones con los campos presentes"""
+    return "".join(
+        row.render({"valor": product_info[field]})
+        for field, row in _SPEC_ROWS.items()
+        if product_info.get(field)
+    )
+
+
+def render_fallback(product_info: Dict, config: Optional[Dict] = None) -> str:
+    """Descripción HTML de respaldo (sin IA) con el bloque de contacto"""
+    nombre = product_info.get("nombre", "Producto")
+    marca = product_info.get("marca", "")
+    modelo = product_info.get("modelo", "")
+    filas = render_spec_rows(product_info)
+
+    values = {
+        "nombre": nombre,
+        "nombre_mayusculas": nombre.upper(),
+        "marca": marca,
+        "subtitulo": (
+            '<p style="margin: 10px 0 0 0; font-size: 1.2em; opacity: 0.95;">'
+            f"{marca} - {modelo}</p>"
+            if marca or modelo
+            else ""
+        ),
+        "especificaciones": _SPEC_BLOCK.render({"filas": filas}) if filas else "",
+    }
+
+    head = _FALLBACK_HEAD.render(values)
+    if "</div>" in head:
+        # Un valor del producto trae su propio </div>: mantener la inserción
+        # en el primer cierre, igual que antes
+        return insert_contact(head + _FALLBACK_TAIL.render(values), config)
+    return head + contact_block(config) + _FALLBACK_TAIL.render(values)
+
+
+def render_catalog(
+    products: List[Dict], config: Optional[Dict] = None
+) -> Dict[str, Any]:
+    """
+    Genera las descripciones de respaldo de todo el catálogo sin llamadas
+    a la IA. Retorna los HTML por SKU y estadísticas de la corrida.
+    """
+    inicio = time.perf_counter()
+    resultados = {}
+    errores = {}
+
+    for index, product in enumerate(products):
+        sku = get_product_sku(product) or str(index)
+        try:
+            resultados[sku] = render_fallback(product, config)
+        except Exception as e:
+            errores[sku] = str(e)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "resultados": resultados,
+        "errores": errores,
+        "stats": {
+            "products": len(products),
+            "seconds": round(segundos, 3),
+            "per_second": round(len(products) / segundos, 1) if segundos else None,
+        },
+    }
@@ -0,0 +1,74 @@
+"""
+Respuestas JSON preparadas para STEL Shop
+Serializa una vez los datos que no cambian entre pedidos (por ejemplo el
+catálogo de una copia) y guarda sus variantes comprimidas y su ETag
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Tuple
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+# Por debajo de este tamaño comprimir no compensa
+MIN_COMPRESS_BYTES = 1024
+
+
+def _brotli(data: bytes):
+    """Compresión brotli si el módulo está instalado (es opcional)"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+class PreparedJson:
+    """
+    JSON serializado con sus variantes gzip y brotli y un ETag fuerte por
+    variante (la misma entidad comprimida distinto es otra representación)
+    """
+
+    __slots__ = ("identity", "encoded", "digest")
+
+    def __init__(self, data: Any):
+        self.identity = json.dumps(
+            data, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        self.digest = hashlib.blake2b(self.identity, digest_size=16).hexdigest()
+        self.encoded = {}
+        if len(self.identity) >= MIN_COMPRESS_BYTES:
+            compressed = _brotli(self.identity)
+            if compressed is not None:
+                self.encoded["br"] = compressed
+            self.encoded["gzip"] = gzip.compress(self.identity, GZIP_LEVEL, mtime=0)
+
+    @classmethod
+    def from_parts(
+        cls, identity: bytes, encoded: Dict[str, bytes], digest: str
+    ) -> "PreparedJson":
+        """Respuesta ya preparada (por ejemplo leída del disco), sin recomprimir"""
+        prepared = cls.__new__(cls)
+        prepared.identity = identity
+        prepared.encoded = dict(encoded)
+        prepared.digest = digest
+        return prepared
+
+    def variant(self, accepted: Iterable[str]) -> Tuple[bytes, str, str]:
+        """
+        (cuerpo, content-encoding, etag) para las codificaciones que acepta
+        el cliente; prefiere brotli, luego gzip y si no el JSON sin comprimir
+        """
+        accepted = set(accepted)
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                return self.encoded[encoding], encoding, f"{self.digest}-{encoding}"
+        return self.identity, "", self.digest
+
+    def sizes(self):
+        return {
+            "identity": len(self.identity),
+            **{k: len(v) for k, v in self.encoded.items()},
+        }
@@ -0,0 +1,156 @@
+"""
+Reparación tolerante de JSON devuelto por la IA para STEL Shop
+Corrige los defectos más comunes (marcadores de código, texto alrededor,
+comas finales, saltos de línea sin escapar, respuestas truncadas) e indica
+qué campos quedaron incompletos para pedir solo esos
+"""
+
+import json
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?")
+_KEY_BEFORE_VALUE_RE = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+_DANGLING_KEY_RE = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class RepairResult:
+    """JSON recuperado, reparaciones aplicadas y campos truncados"""
+
+    __slots__ = ("data", "repairs", "truncated_fields")
+
+    def __init__(self, data: Any, repairs: List[str], truncated_fields: List[str]):
+        self.data = data
+        self.repairs = repairs
+        self.truncated_fields = truncated_fields
+
+    @property
+    def repaired(self) -> bool:
+        return bool(self.repairs)
+
+
+def _scan(text: str) -> Tuple[str, List[str], List[str]]:
+    """
+    Recorre el texto una vez: escapa caracteres de control dentro de los
+    strings, quita comas finales y cierra strings y llaves abiertas
+    """
+    out = []
+    stack = []
+    repairs = []
+    truncated = []
+    in_string = False
+    escape = False
+    string_start = 0
+
+    def note(repair):
+        if repair not in repairs:
+            repairs.append(repair)
+
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[char])
+                note("control_chars")
+                continue
+            out.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+            string_start = len(out)
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Coma final antes del cierre
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                note("trailing_commas")
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                out.append(char)
+                break
+        out.append(char)
+
+    if in_string:
+        note("truncated")
+        if escape:
+            out.pop()
+        match = _KEY_BEFORE_VALUE_RE.search("".join(out[:string_start]))
+        if match:
+            # Valor cortado: se cierra el string y se marca el campo
+            truncated.append(match.group(1))
+            out.append('"')
+        else:
+            # Clave cortada: se descarta
+            del out[string_start:]
+
+    if stack:
+        note("truncated")
+        result = "".join(out).rstrip()
+        result = _DANGLING_KEY_RE.sub("", result).rstrip().rstrip(",")
+        return result + "".join(reversed(stack)), repairs, truncated
+
+    return "".join(out), repairs, truncated
+
+
+def salvage_fields(text: str, fields: Iterable[str]) -> dict:
+    """Último recurso: toma los campos string completos que se puedan leer"""
+    salvaged = {}
+    for field in fields:
+        match = re.search(
+            r'"' + re.escape(field) + r'"\s*:\s*"((?:[^"\\]|\\.)*)"', text, re.DOTALL
+        )
+        if match:
+            try:
+                salvaged[field] = json.loads(f'"{match.group(1)}"')
+            except json.JSONDecodeError:
+                continue
+    return salvaged
+
+
+def parse_json_tolerant(
+    text: str, fields: Optional[Iterable[str]] = None
+) -> RepairResult:
+    """
+    Parsea JSON reparando defectos comunes. Con fields, si nada funciona se
+    rescatan los campos legibles. Lanza ValueError si no hay nada utilizable.
+    """
+    repairs = []
+    cleaned = text.strip()
+    if "```" in cleaned:
+        cleaned = _FENCE_RE.sub("", cleaned).strip()
+        repairs.append("fences")
+
+    try:
+        return RepairResult(json.loads(cleaned), repairs, [])
+    except json.JSONDecodeError:
+        pass
+
+    starts = [index for index in (cleaned.find("{"), cleaned.find("[")) if index >= 0]
+    if starts:
+        start = min(starts)
+        if start > 0:
+            repairs.append("surrounding_text")
+        scanned, scan_repairs, truncated = _scan(cleaned[start:])
+        try:
+            data, _ = json.JSONDecoder().raw_decode(scanned)
+            return RepairResult(data, repairs + scan_repairs, truncated)
+        except json.JSONDecodeError:
+            pass
+
+    if fields is not None:
+        salvaged = salvage_fields(cleaned, fields)
+        if salvaged:
+            return RepairResult(salvaged, repairs + ["salvaged"], [])
+
+    raise ValueError("La respuesta de IA no contiene JSON recuperable")
@@ -0,0 +1,335 @@
+"""
+Métricas de las llamadas a la IA y de la lectura de PDFs de STEL Shop
+Registra cada evento (generación, llamada al modelo, PDF) con su tiempo,
+tokens, reintentos, aciertos de caché y costo estimado; los agrega en
+histogramas por lote y los escribe en un log JSONL por corrida
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+# Precio en USD por millón de tokens: (entrada, salida, entrada cacheada).
+# Precios publicados para prompts de hasta 128k tokens
+MODEL_PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30, 0.01875),
+    "gemini-1.5-flash-8b": (0.0375, 0.15, 0.01),
+    "gemini-1.5-pro": (1.25, 5.00, 0.3125),
+}
+
+# Límites superiores (ms) de los buckets de los histogramas de latencia
+LATENCY_BUCKETS_MS = [
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    25000,
+    60000,
+]
+
+# Generación en curso del contexto actual (hilo o tarea asyncio)
+_current_generation: contextvars.ContextVar = contextvars.ContextVar(
+    "current_generation", default=None
+)
+
+
+def estimate_cost(
+    model: str, tokens_in: int, tokens_out: int, cached_tokens: int = 0
+) -> float:
+    """Costo estimado en USD. model puede venir como proveedor:modelo"""
+    model = model.split(":", 1)[-1]
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Versiones fijas (gemini-1.5-flash-002) usan el precio del modelo base
+        prices = next(
+            (p for name, p in MODEL_PRICES.items() if model.startswith(name + "-0")),
+            None,
+        )
+    if prices is None:
+        return 0.0
+    price_in, price_out, price_cached = prices
+    return (
+        (tokens_in - cached_tokens) * price_in
+        + cached_tokens * price_cached
+        + tokens_out * price_out
+    ) / 1_000_000
+
+
+class Histogram:
+    """Histograma de buckets fijos con mínimo, máximo y percentiles aproximados"""
+
+    def __init__(self, bounds: List[float] = LATENCY_BUCKETS_MS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Límite superior del bucket que contiene el percentil"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 1) if self.count else None,
+            "min": round(self.min, 1) if self.min is not None else None,
+            "max": round(self.max, 1) if self.max is not None else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {
+                label: count for label, count in zip(labels, self.counts) if count
+            },
+        }
+
+
+class MetricsAggregate:
+    """Totales e histogramas por tipo de evento"""
+
+    _SUMS = (
+        "tokens_in",
+        "tokens_out",
+        "cached_tokens",
+        # Prefijo enviado en cada llamada por no poder usar la caché de contexto
+        "prefix_inline_tokens",
+        "cost_usd",
+        "retries",
+        "model_calls",
+        "bytes",
+        "html_bytes_in",
+        "html_bytes_out",
+    )
+
+    def __init__(self):
+        self.kinds: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, event: Dict[str, Any]) -> None:
+        kind = self.kinds.setdefault(
+            event["kind"],
+            {
+                "count": 0,
+                "errors": 0,
+                "cache_hits": 0,
+                "fallbacks": 0,
+                "sums": dict.fromkeys(self._SUMS, 0),
+                "wall_ms": Histogram(),
+                "ttfb_ms": Histogram(),
+            },
+        )
+        kind["count"] += 1
+        kind["errors"] += int(not event.get("ok", True))
+        kind["cache_hits"] += int(bool(event.get("cache_hit")))
+        kind["fallbacks"] += int(bool(event.get("fallback")))
+        for name in self._SUMS:
+            kind["sums"][name] += event.get(name) or 0
+        if event.get("wall_ms") is not None:
+            kind["wall_ms"].add(event["wall_ms"])
+        if event.get("ttfb_ms") is not None:
+            kind["ttfb_ms"].add(event["ttfb_ms"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = {}
+        for name, kind in self.kinds.items():
+            sums = dict(kind["sums"])
+            sums["cost_usd"] = round(sums["cost_usd"], 6)
+            summary[name] = {
+                "count": kind["count"],
+                "errors": kind["errors"],
+                "cache_hits": kind["cache_hits"],
+                "fallbacks": kind["fallbacks"],
+                **{key: value for key, value in sums.items() if value},
+                "wall_ms": kind["wall_ms"].to_dict(),
+            }
+            if kind["ttfb_ms"].count:
+                summary[name]["ttfb_ms"] = kind["ttfb_ms"].to_dict()
+        return summary
+
+
+class MetricsRecorder:
+    """
+    Registro de métricas del handler. Cada evento se suma a los totales de
+    la sesión y del lote en curso y se escribe como una línea del log JSONL
+    (log_dir/ai_run_<fecha>_<pid>.jsonl). Sin log_dir no se escribe archivo.
+    Los lotes abiertos reciben todos los eventos del proceso, también los de
+    otros hilos.
+    """
+
+    def __init__(self, log_dir=None, keep_batches: int = 20):
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.log_path = None
+        self.keep_batches = keep_batches
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.totals = MetricsAggregate()
+        self.batches: List[Dict[str, Any]] = []
+        self._active_batches: List[Dict[str, Any]] = []
+        self._log_file = None
+        self._lock = threading.Lock()
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        if self.log_dir is None:
+            return
+        if self._log_file is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.log_path = self.log_dir / f"ai_run_{fecha}_{os.getpid()}.jsonl"
+            self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+        self._log_file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def record(self, kind: str, **fields) -> Dict[str, Any]:
+        """Registra un evento ya medido"""
+        event = {"ts": round(time.time(), 3), "kind": kind, **fields}
+        with self._lock:
+            self.totals.add(event)
+            for batch in self._active_batches:
+                batch["aggregate"].add(event)
+            try:
+                self._write(event)
+            except OSError as e:
+                print(f"⚠️ No se pudo escribir el log de métricas: {e}")
+                self.log_dir = None
+        return event
+
+    @contextmanager
+    def measure(self, kind: str, **fields):
+        """
+        Mide el tiempo de un bloque. El bloque puede completar el evento
+        (tokens, cache_hit, ...); un error se registra con ok = False.
+        """
+        event = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["ok"] = False
+            event["error"] = str(e)[:200]
+            raise
+        finally:
+            event.setdefault("ok", True)
+            event["wall_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.record(kind, **event)
+
+    @contextmanager
+    def generation(self, sku: str, mode: str):
+        """
+        Generación de un producto. Las llamadas al modelo hechas dentro
+        (en el mismo hilo o tarea) se suman a este evento.
+        """
+        with self.measure(
+            "generation",
+            sku=sku,
+            mode=mode,
+            model_calls=0,
+            retries=0,
+            tokens_in=0,
+            tokens_out=0,
+            cached_tokens=0,
+            cost_usd=0.0,
+        ) as event:
+            event["_started"] = time.perf_counter()
+            token = _current_generation.set(event)
+            try:
+                yield event
+            finally:
+                _current_generation.reset(token)
+                event.pop("_started", None)
+                event["cost_usd"] = round(event["cost_usd"], 6)
+
+    def annotate(self, **fields) -> None:
+        """Completa la generación en curso (cache_hit, fallback, ...)"""
+        generation = _current_generation.get()
+        if generation is not None:
+            with self._lock:
+                generation.update(fields)
+
+    def model_call(self, **fields) -> Dict[str, Any]:
+        """Registra una llamada al modelo y la suma a la generación en curso"""
+        generation = _current_generation.get()
+        if generation is not None:
+            with self._lock:
+                generation["model_calls"] += 1
+                for name in ("retries", "tokens_in", "tokens_out", "cached_tokens"):
+                    generation[name] += fields.get(name, 0)
+                generation["cost_usd"] += fields.get("cost_usd", 0.0)
+                if fields.get("ok", True) and "ttfb_ms" not in generation:
+                    # Primera respuesta del modelo desde el inicio de la generación
+                    generation["ttfb_ms"] = round(
+                        (time.perf_counter() - generation["_started"]) * 1000, 1
+                    )
+            fields.setdefault("sku", generation.get("sku"))
+        return self.record("model_call", **fields)
+
+    @contextmanager
+    def batch(self, name: str, **fields):
+        """Agrupa los eventos de un lote y registra su resumen al terminar"""
+        current = {
+            "started": time.perf_counter(),
+            "aggregate": MetricsAggregate(),
+            "info": dict(fields),
+        }
+        with self._lock:
+            self._active_batches.append(current)
+        try:
+            # El lote puede completar su resumen (por ejemplo con sus stats)
+            yield current["info"]
+        finally:
+            with self._lock:
+                self._active_batches.remove(current)
+            seconds = time.perf_counter() - current["started"]
+            summary = {
+                "name": name,
+                **current["info"],
+                "seconds": round(seconds, 2),
+                "wall_ms": round(seconds * 1000, 1),
+                "metrics": current["aggregate"].to_dict(),
+            }
+            self.record("batch", **summary)
+            with self._lock:
+                self.batches.append(summary)
+                del self.batches[: -self.keep_batches]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Totales de la sesión, últimos lotes y ruta del log"""
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "log_path": str(self.log_path) if self.log_path else None,
+                "totals": self.totals.to_dict(),
+                "batches": list(self.batches),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
@@ -0,0 +1,417 @@
+"""
+Etapas en segundo plano para el procesamiento de productos en Stelorder
+Permite adelantar trabajo (descarga de PDFs y generación con IA)
+mientras el navegador edita el producto actual
+"""
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def estimate_size(result):
+    """Estima el tamaño en bytes de un resultado para el límite de memoria"""
+    if result is None:
+        return 0
+    try:
+        return len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return len(str(result))
+
+
+class Prefetcher:
+    """
+    Precarga resultados de productos próximos con un pool de threads acotado.
+    Respeta el orden de la lista, una ventana de anticipación y un tope de
+    memoria para los resultados que todavía no fueron consumidos.
+    """
+
+    def __init__(
+        self,
+        products,
+        fetch_callback,
+        key_callback=None,
+        lookahead=4,
+        max_workers=2,
+        max_bytes=50 * 1024 * 1024,
+    ):
+        self.products = products
+        self.fetch_callback = fetch_callback
+        self.key_callback = key_callback or (lambda product: id(product))
+        self.lookahead = max(0, lookahead)
+        self.max_bytes = max_bytes
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._futures = {}  # clave -> Future
+        self._pending = {}  # clave -> cantidad de productos que aún la usan
+        self._consumed = set()
+        self._held_bytes = 0
+        self._next_index = 0
+        self._stopped = False
+
+        self.stats_counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "shared": 0,
+            "ready_hits": 0,
+            "waited": 0,
+            "inline": 0,
+            "peak_bytes": 0,
+        }
+
+    def _key(self, index):
+        return self.key_callback(self.products[index])
+
+    def _run(self, product):
+        result = self.fetch_callback(product)
+        size = estimate_size(result)
+        with self._lock:
+            self._held_bytes += size
+            self.stats_counters["completed"] += 1
+            self.stats_counters["peak_bytes"] = max(
+                self.stats_counters["peak_bytes"], self._held_bytes
+            )
+        return result, size
+
+    def _submit(self, index):
+        """Encola el producto indicado (requiere el lock)"""
+        key = self._key(index)
+        if key is None:
+            return
+        self._pending[key] = self._pending.get(key, 0) + 1
+        if key in self._futures:
+            self.stats_counters["shared"] += 1
+            return
+        self._futures[key] = self._executor.submit(self._run, self.products[index])
+        self.stats_counters["submitted"] += 1
+
+    def advance(self, index):
+        """Indica que se está procesando index y completa la ventana siguiente"""
+        with self._lock:
+            if self._stopped:
+                return
+            limit = min(len(self.products), index + 1 + self.lookahead)
+            while self._next_index < limit:
+                # El producto actual siempre se encola; el resto respeta el tope
+                if self._next_index > index and self._held_bytes >= self.max_bytes:
+                    break
+                self._submit(self._next_index)
+                self._next_index += 1
+
+    def get(self, index, timeout=None):
+        """
+        Devuelve el resultado precargado del producto index, esperando si
+        todavía está en curso. Retorna None si no se pudo precargar.
+        """
+        key = self._key(index)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or index in self._consumed:
+                self.stats_counters["inline"] += 1
+                return None
+            if future.done():
+                self.stats_counters["ready_hits"] += 1
+            else:
+                self.stats_counters["waited"] += 1
+
+        try:
+            result, _ = future.result(timeout=timeout)
+        except Exception as e:
+            print(f"   ⚠️ Error en precarga: {e}")
+            with self._lock:
+                self.stats_counters["failed"] += 1
+            result = None
+
+        self.release(index)
+        return result
+
+    def release(self, index):
+        """
+        Libera la reserva del producto index (consumido u omitido).
+        Se puede llamar más de una vez para el mismo índice.
+        """
+        with self._lock:
+            if index in self._consumed or index >= self._next_index:
+                return
+            self._consumed.add(index)
+
+            key = self._key(index)
+            if key is None or key not in self._futures:
+                return
+            self._pending[key] -= 1
+            if self._pending[key] > 0:
+                return
+
+            # Ningún producto restante usa este resultado
+            self._pending.pop(key)
+            future = self._futures.pop(key)
+
+        if not future.cancel():
+            future.add_done_callback(self._forget)
+
+    def _forget(self, future):
+        """Descuenta del tope de memoria un resultado ya liberado"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, size = future.result()
+        with self._lock:
+            self._held_bytes -= size
+
+    def stop(self):
+        """Cancela la precarga pendiente"""
+        with self._lock:
+            self._stopped = True
+            for future in self._futures.values():
+                future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        """Estadísticas de la etapa de precarga"""
+        with self._lock:
+            return {
+                **self.stats_counters,
+                "held_bytes": self._held_bytes,
+                "in_flight": sum(1 for f in self._futures.values() if not f.done()),
+                "lookahead": self.lookahead,
+            }
+
+
+class GenerationPipeline:
+    """
+    Pipeline productor/consumidor: genera las descripciones de los próximos
+    productos en segundo plano mientras el navegador edita el actual.
+    Las dos etapas se unen con una cola acotada que aplica contrapresión.
+    """
+
+    def __init__(
+        self,
+        products,
+        generate_callback,
+        prefetcher=None,
+        workers=2,
+        depth=3,
+        pause_callback=None,
+    ):
+        self.products = products
+        self.generate_callback = generate_callback
+        self.prefetcher = prefetcher
+        self.pause_callback = pause_callback or (lambda: False)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="generation"
+        )
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._producer = None
+        self._started_at = None
+        self._futures = {}  # índice -> Future aún no consumido
+        self._dropped = set()  # productos que el navegador ya descartó
+
+        self.stats_counters = {
+            "generated": 0,
+            "generation_errors": 0,
+            "generation_seconds": 0.0,
+            "browser_done": 0,
+            "browser_seconds": 0.0,
+            "consumer_wait_seconds": 0.0,
+            "producer_blocked_seconds": 0.0,
+            "discarded": 0,
+            "skipped": 0,
+        }
+
+    def start(self):
+        """Inicia el productor en segundo plano"""
+        self._started_at = time.time()
+        self._producer = threading.Thread(target=self._produce, daemon=True)
+        self._producer.start()
+
+    def _generate(self, index):
+        with self._lock:
+            # El navegador ya descartó el producto: no se gasta la llamada a la IA
+            if index in self._dropped or self._stopped.is_set():
+                self.stats_counters["skipped"] += 1
+                return None
+
+        product = self.products[index]
+        started = time.time()
+        try:
+            if self.prefetcher:
+                self.prefetcher.advance(index)
+                result = self.generate_callback(product, self.prefetcher.get(index))
+            else:
+                result = self.generate_callback(product)
+        except Exception:
+            with self._lock:
+                self.stats_counters["generation_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self.stats_counters["generation_seconds"] += time.time() - started
+
+        with self._lock:
+            self.stats_counters["generated"] += 1
+        return result
+
+    def _produce(self):
+        """Encola en orden las generaciones; se bloquea si la cola está llena"""
+        for index in range(len(self.products)):
+            while self.pause_callback() and not self._stopped.is_set():
+                time.sleep(0.5)
+
+            # stop() marca la detención con el mismo lock antes de cerrar el
+            # executor: nunca se encola trabajo en un executor cerrado
+            with self._lock:
+                if self._stopped.is_set():
+                    return
+                if index in self._dropped:
+                    continue
+                future = self._executor.submit(self._generate, index)
+                self._futures[index] = future
+
+            blocked_since = time.time()
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put((index, future), timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                future.cancel()
+            with self._lock:
+                self.stats_counters["producer_blocked_seconds"] += (
+                    time.time() - blocked_since
+                )
+
+    def take(self, index, timeout=None):
+        """
+        Devuelve la descripción generada para el producto index.
+        Descarta los resultados de productos anteriores que se omitieron.
+        Retorna None si la generación falló o el pipeline se detuvo.
+        """
+        started = time.time()
+        try:
+            while True:
+                if self._stopped.is_set():
+                    return None
+                try:
+                    item_index, future = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    if timeout is not None and time.time() - started > timeout:
+                        return None
+                    continue
+
+                if item_index < index:
+                    self.drop(item_index)
+                    with self._lock:
+                        self.stats_counters["discarded"] += 1
+                    continue
+                if item_index > index:
+                    # No debería ocurrir: el consumidor avanza en orden
+                    return None
+
+                with self._lock:
+                    self._futures.pop(index, None)
+                try:
+                    return future.result(timeout=timeout)
+                except Exception as e:
+                    print(f"   ⚠️ Error generando en segundo plano: {e}")
+                    return None
+        finally:
+            with self._lock:
+                self.stats_counters["consumer_wait_seconds"] += time.time() - started
+
+    def record_browser(self, seconds):
+        """Registra el tiempo que tomó la etapa del navegador para un producto"""
+        with self._lock:
+            self.stats_counters["browser_done"] += 1
+            self.stats_counters["browser_seconds"] += seconds
+
+    def drop(self, index):
+        """
+        Descarta el producto index (falló en el navegador o se omitió): su
+        generación no se ejecuta si todavía no empezó. Se puede llamar más
+        de una vez y también después de take.
+        """
+        with self._lock:
+            self._dropped.add(index)
+            future = self._futures.pop(index, None)
+        if future is not None:
+            future.cancel()
+        if self.prefetcher:
+            # La reserva la libera el worker; si no llega a correr, se libera acá
+            self.prefetcher.release(index)
+
+    def stop(self, timeout=5):
+        """Detiene el productor y cancela las generaciones pendientes"""
+        with self._lock:
+            self._stopped.set()
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+
+        # Vaciar la cola destraba al productor si está esperando lugar; el
+        # segundo vaciado recoge lo que alcanzó a encolar antes de terminar
+        self._drain()
+        producer = self._producer
+        if producer is not None and producer is not threading.current_thread():
+            producer.join(timeout)
+        self._drain()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _drain(self):
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+                future.cancel()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        """Throughput y tiempos por etapa"""
+        with self._lock:
+            counters = dict(self.stats_counters)
+
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        minutes = elapsed / 60 if elapsed else 0.0
+
+        def per_minute(count):
+            return round(count / minutes, 2) if minutes else 0.0
+
+        def average(seconds, count):
+            return round(seconds / count, 2) if count else 0.0
+
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "generation": {
+                "done": counters["generated"],
+                "errors": counters["generation_errors"],
+                "per_minute": per_minute(counters["generated"]),
+                "avg_seconds": average(
+                    counters["generation_seconds"],
+                    counters["generated"] + counters["generation_errors"],
+                ),
+                "producer_blocked_seconds": round(
+                    counters["producer_blocked_seconds"], 1
+                ),
+            },
+            "browser": {
+                "done": counters["browser_done"],
+                "per_minute": per_minute(counters["browser_done"]),
+                "avg_seconds": average(
+                    counters["browser_seconds"], counters["browser_done"]
+                ),
+                "wait_seconds": round(counters["consumer_wait_seconds"], 1),
+            },
+            "discarded": counters["discarded"],
+            "skipped": counters["skipped"],
+        }
@@ -16,6 +16,8 @@ from datetime import datetime
 import threading
 from selenium.webdriver.common.keys import Keys
 
+from navigation.pipeline import Prefetcher, GenerationPipeline
+
 
 class SeleniumHandler:
     def __init__(self):
@@ -25,10 +27,13 @@ class SeleniumHandler:
         self.current_product = None
         self.processed_count = 0
         self.error_count = 0
+        self.fallback_count = 0
         self.total_products = 0
         self.processing_thread = None
         self.stop_processing = False
         self.pause_processing = False
+        self.prefetcher = None
+        self.pipeline = None
 
         # Configuración
         self.config = {
@@ -36,6 +41,13 @@ class SeleniumHandler:
             "products_url": "https://stelorder.com/products",
             "timeout": 30,
             "delay_between_products": 2,
+            # Precarga de PDFs por delante del navegador
+            "prefetch_lookahead": 4,
+            "prefetch_workers": 2,
+            "prefetch_max_bytes": 50 * 1024 * 1024,
+            # Generación con IA en paralelo a la edición (0 = en serie)
+            "pipeline_depth": 3,
+            "pipeline_workers": 2,
         }
 
         # Estado para UI
@@ -47,6 +59,7 @@ class SeleniumHandler:
             "progress": 0,
             "processed": 0,
             "errors": 0,
+            "fallbacks": 0,
             "total": 0,
         }
 
@@ -343,6 +356,11 @@ class SeleniumHandler:
             while self.pause_processing:
                 time.sleep(1)
 
+            # Mantener la ventana de precarga por delante del producto actual
+            if self.prefetcher:
+                self.prefetcher.advance(index)
+
+            product_started = time.time()
             try:
                 self.current_product = product
                 self.status["current_product"] = product.get("nombre", "")
@@ -469,7 +487,17 @@ class SeleniumHandler:
 
                 # PASO 5: GENERAR DESCRIPCIÓN CON IA
                 print("   🤖 Generando descripción con IA...")
-                description_data = generate_description_callback(product)
+                if self.pipeline:
+                    # Ya se generó (o se está generando) en segundo plano
+                    description_data = self.pipeline.take(index)
+                elif self.prefetcher:
+                    prefetched = self.prefetcher.get(index)
+                    self.status["prefetch"] = self.prefetcher.stats()
+                    description_data = generate_description_callback(
+                        product, prefetched
+                    )
+                else:
+                    description_data = generate_description_callback(product)
 
                 if not description_data:
                     print("   ❌ No se pudo generar descripción")
@@ -477,6 +505,14 @@ class SeleniumHandler:
                     self.status["errors"] = self.error_count
                     continue
 
+                if description_data.get("respaldo"):
+                    # La plantilla de respaldo no se publica: el producto
+                    # queda como está para generarlo con IA en otra corrida
+                    print("   ⏭️ IA no disponible, se omite (plantilla de respaldo)")
+                    self.fallback_count += 1
+                    self.status["fallbacks"] = self.fallback_count
+                    continue
+
                 # PASO 6: ACTUALIZAR CAMPOS
                 print("   💾 Actualizando campos...")
                 product_update = {
@@ -512,7 +548,28 @@ class SeleniumHandler:
                 self.error_count += 1
                 self.status["errors"] = self.error_count
 
+            finally:
+                # Liberar la precarga de productos omitidos por error
+                # (en modo pipeline la libera el worker de generación)
+                if self.prefetcher and not self.pipeline:
+                    self.prefetcher.release(index)
+                if self.pipeline:
+                    # Si el navegador falló antes de take, la generación de
+                    # este producto no llega a ejecutarse
+                    self.pipeline.drop(index)
+                    self.pipeline.record_browser(time.time() - product_started)
+
         # Finalizar
+        if self.pipeline:
+            self.status["pipeline"] = self.pipeline.stats()
+            self.pipeline.stop()
+            self.pipeline = None
+
+        if self.prefetcher:
+            self.status["prefetch"] = self.prefetcher.stats()
+            self.prefetcher.stop()
+            self.prefetcher = None
+
         self.is_processing = False
         self.status["processing"] = False
         self.status["progress"] = 100
@@ -521,6 +578,7 @@ class SeleniumHandler:
         print(f"\n✅ Procesamiento completado:")
         print(f"   - Procesados: {self.processed_count}")
         print(f"   - Errores: {self.error_count}")
+        print(f"   - Omitidos por respaldo: {self.fallback_count}")
         print(f"   - Total: {self.total_products}")
 
     def log(self, message):
@@ -529,17 +587,56 @@ class SeleniumHandler:
 
     def get_status(self):
         """Obtiene el estado actual del handler"""
+        pipeline = self.pipeline
+        if pipeline:
+            self.status["pipeline"] = pipeline.stats()
         return self.status
 
-    def process_products(self, products, generate_description_callback):
-        """Procesa una lista de productos"""
+    def process_products(
+        self,
+        products,
+        generate_description_callback,
+        prefetch_callback=None,
+        prefetch_key_callback=None,
+    ):
+        """
+        Procesa una lista de productos.
+        Si se indica prefetch_callback (por ejemplo, la extracción del PDF),
+        se ejecuta en segundo plano para los próximos productos y su resultado
+        se pasa como segundo argumento a generate_description_callback.
+        Con pipeline_depth > 0 la generación de los próximos productos corre
+        en segundo plano mientras el navegador edita el actual.
+        """
         if self.is_processing:
             print("⚠️ Ya hay un procesamiento en curso")
             return False
 
+        if prefetch_callback:
+            self.prefetcher = Prefetcher(
+                products,
+                prefetch_callback,
+                key_callback=prefetch_key_callback,
+                lookahead=self.config["prefetch_lookahead"],
+                max_workers=self.config["prefetch_workers"],
+                max_bytes=self.config["prefetch_max_bytes"],
+            )
+            # Arrancar la precarga antes de la primera navegación
+            self.prefetcher.advance(0)
+
+        if self.config["pipeline_depth"] > 0:
+            self.pipeline = GenerationPipeline(
+                products,
+                generate_description_callback,
+                prefetcher=self.prefetcher,
+                workers=self.config["pipeline_workers"],
+                depth=self.config["pipeline_depth"],
+                pause_callback=lambda: self.pause_processing,
+            )
+
         self.total_products = len(products)
         self.processed_count = 0
         self.error_count = 0
+        self.fallback_count = 0
         self.is_processing = True
         self.stop_processing = False
         self.pause_processing = False
@@ -549,6 +646,11 @@ class SeleniumHandler:
         self.status["total"] = self.total_products
         self.status["processed"] = 0
         self.status["errors"] = 0
+        self.status["fallbacks"] = 0
+
+        # La generación arranca antes que la navegación del primer producto
+        if self.pipeline:
+            self.pipeline.start()
 
         # Iniciar thread de procesamiento
         self.processing_thread = threading.Thread(
@@ -575,6 +677,9 @@ class SeleniumHandler:
     def stop(self):
         """Detiene el procesamiento"""
         self.stop_processing = True
+        pipeline = self.pipeline
+        if pipeline:
+            pipeline.stop()
         self.is_processing = False
         self.status["processing"] = False
         print("🛑 Procesamiento detenido")
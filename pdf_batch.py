@@ -0,0 +1,128 @@
+"""
+Planificador de lotes de fichas técnicas para STEL Shop
+Agrupa los productos seleccionados por PDF (URL normalizada y hash de
+contenido) para descargar y parsear cada ficha una sola vez por lote
+"""
+
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlunsplit, quote, unquote
+
+PDF_BASE_URL = "https://storage.googleapis.com/fichas_tecnicas/"
+
+
+def normalize_pdf_url(pdf_url: str) -> str:
+    """Normaliza la URL de una ficha técnica para poder compararla"""
+    pdf_url = (pdf_url or "").strip()
+    if not pdf_url:
+        return ""
+
+    # Si es una URL relativa, construir la URL completa
+    if not pdf_url.lower().startswith("http"):
+        pdf_url = PDF_BASE_URL + pdf_url.lstrip("/")
+
+    parts = urlsplit(pdf_url)
+    path = quote(unquote(parts.path), safe="/")
+    while "//" in path:
+        path = path.replace("//", "/")
+
+    # El fragmento no cambia el archivo descargado
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, parts.query, "")
+    )
+
+
+def get_product_pdf_url(product: Dict) -> str:
+    """Obtiene la URL del PDF tanto de productos crudos como formateados"""
+    return product.get("pdf_url") or product.get("URL_PDF") or ""
+
+
+def get_product_sku(product: Dict) -> str:
+    """Obtiene el SKU tanto de productos crudos como formateados"""
+    return str(product.get("sku") or product.get("SKU") or "")
+
+
+class PdfBatchPlan:
+    """Resultado de planificar un lote: extracciones compartidas y métricas"""
+
+    def __init__(self):
+        self.url_by_sku: Dict[str, str] = {}
+        self.skus_by_url: Dict[str, List[str]] = {}
+        self.skus_by_hash: Dict[str, List[str]] = {}
+        self.extractions: Dict[str, Dict[str, Any]] = {}
+        self.products = 0
+        self.products_with_pdf = 0
+
+    def content_for(self, product: Dict) -> Optional[Dict[str, Any]]:
+        """Devuelve la extracción compartida del PDF de un producto"""
+        url = normalize_pdf_url(get_product_pdf_url(product))
+        return self.extractions.get(url)
+
+    def report(self) -> Dict[str, Any]:
+        """Cuántas descargas y parseos se evitaron al compartir fichas"""
+        unique_urls = len(self.skus_by_url)
+        unique_contents = len(self.skus_by_hash)
+        return {
+            "products": self.products,
+            "products_with_pdf": self.products_with_pdf,
+            "unique_urls": unique_urls,
+            "unique_contents": unique_contents,
+            "downloads_avoided": self.products_with_pdf - unique_urls,
+            "parses_avoided": self.products_with_pdf - unique_contents,
+            "shared_groups": {
+                content_hash: skus
+                for content_hash, skus in self.skus_by_hash.items()
+                if len(skus) > 1
+            },
+        }
+
+
+class PdfBatchPlanner:
+    """Extrae cada PDF único de un lote una sola vez"""
+
+    def __init__(self, ai_handler):
+        self.ai_handler = ai_handler
+
+    def group(self, products: List[Dict]) -> PdfBatchPlan:
+        """Agrupa los productos por URL normalizada del PDF"""
+        plan = PdfBatchPlan()
+        plan.products = len(products)
+
+        for product in products:
+            url = normalize_pdf_url(get_product_pdf_url(product))
+            if not url:
+                continue
+
+            sku = get_product_sku(product)
+            plan.products_with_pdf += 1
+            plan.url_by_sku[sku] = url
+            plan.skus_by_url.setdefault(url, []).append(sku)
+
+        return plan
+
+    def prepare(self, products: List[Dict]) -> PdfBatchPlan:
+        """Agrupa el lote, extrae cada URL una vez y comparte por contenido"""
+        plan = self.group(products)
+        by_hash: Dict[str, Dict[str, Any]] = {}
+
+        for url, skus in plan.skus_by_url.items():
+            extraction = self.ai_handler.extract_pdf_content(url)
+            content_hash = extraction.get("content_hash")
+
+            # URLs distintas con el mismo contenido comparten la extracción
+            if content_hash:
+                extraction = by_hash.setdefault(content_hash, extraction)
+                plan.skus_by_hash.setdefault(content_hash, []).extend(skus)
+            else:
+                plan.skus_by_hash.setdefault(url, []).extend(skus)
+
+            plan.extractions[url] = extraction
+
+        report = plan.report()
+        print(
+            f"📚 Lote de PDFs: {report['unique_contents']} fichas únicas para "
+            f"{report['products_with_pdf']} productos "
+            f"({report['downloads_avoided']} descargas y "
+            f"{report['parses_avoided']} parseos evitados)"
+        )
+
+        return plan
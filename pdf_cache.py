@@ -0,0 +1,424 @@
+"""
+Caché local de fichas técnicas PDF para STEL Shop
+Guarda los PDFs descargados por URL (con ETag/Last-Modified) y el texto
+extraído por hash de contenido y parámetros de extracción, para parsear
+cada ficha una sola vez
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+
+from pdf_extraction import stream_download
+
+
+class PdfCache:
+    """
+    Caché en disco de descargas y extracciones de PDFs. Los archivos se
+    desalojan por antigüedad y por tamaño total (los menos usados primero)
+    y las extracciones por antigüedad y cantidad. El tamaño y el último uso
+    de cada archivo se llevan en SQLite; un archivo entregado hace menos de
+    in_use_grace segundos no se borra (puede estar parseándose).
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        revalidate_after: int = 300,
+        max_file_bytes: int = 1024 * 1024 * 1024,
+        max_extractions: int = 20000,
+        max_age: float = 90 * 24 * 3600,
+        in_use_grace: float = 600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.files_dir = self.cache_dir / "files"
+        self.revalidate_after = revalidate_after
+        self.max_file_bytes = max_file_bytes
+        self.max_extractions = max_extractions
+        self.max_age = max_age
+        self.in_use_grace = in_use_grace
+        self.stats_counters = {
+            "downloads": 0,
+            "not_modified": 0,
+            "fresh_hits": 0,
+            "stale_fallbacks": 0,
+            "extraction_hits": 0,
+            "extraction_misses": 0,
+            "bytes_downloaded": 0,
+            "files_evicted": 0,
+            "extractions_evicted": 0,
+        }
+        self._lock = threading.Lock()
+
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.cache_dir / "pdf_cache.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+            """)
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")
+        ]
+        if columns and "params" not in columns:
+            # Extracciones de antes de versionarlas: no se sabe con qué
+            # parser ni límites se hicieron
+            self._conn.execute("DROP TABLE extractions")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                content_hash TEXT NOT NULL,
+                params TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (content_hash, params)
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extractions_access "
+            "ON extractions (last_access)"
+        )
+        has_files = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files'"
+        ).fetchone()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_used ON files (last_used)"
+        )
+        if not has_files:
+            self._register_existing_files()
+        self._conn.commit()
+        # Total de los archivos en disco, sin recorrer el directorio
+        self._file_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM files"
+        ).fetchone()[0]
+
+    def _register_existing_files(self) -> None:
+        """Registra los PDFs de una caché anterior a la tabla files (una vez)"""
+        for path in self.files_dir.glob("*.pdf"):
+            try:
+                info = path.stat()
+            except OSError:
+                continue
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files VALUES (?, ?, ?)",
+                (path.stem, info.st_size, info.st_mtime),
+            )
+
+    def _file_path(self, content_hash: str) -> Path:
+        return self.files_dir / f"{content_hash}.pdf"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    def _add_bytes(self, amount: int) -> None:
+        with self._lock:
+            self.stats_counters["bytes_downloaded"] += amount
+
+    def _get_download(self, url: str) -> Optional[Tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, content_hash, checked_at "
+                "FROM downloads WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def _cached_path(self, content_hash: str) -> Optional[Path]:
+        path = self._file_path(content_hash)
+        return path if path.exists() else None
+
+    def _mark_used(self, content_hash: str) -> bool:
+        """
+        Marca el archivo como recién usado. False si ya se desalojó: entonces
+        hay que descargarlo de nuevo en lugar de entregar la ruta
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE files SET last_used = ? WHERE content_hash = ?",
+                (time.time(), content_hash),
+            ).rowcount
+            self._conn.commit()
+        return updated > 0
+
+    def fetch(self, url: str, timeout: int = 30) -> Tuple[bytes, str]:
+        """Devuelve (contenido, hash) del PDF; ver fetch_file"""
+        path, content_hash, _ = self.fetch_file(url, timeout=timeout)
+        return path.read_bytes(), content_hash
+
+    def fetch_file(
+        self, url: str, timeout: int = 30, max_bytes: int = 64 * 1024 * 1024
+    ) -> Tuple[Path, str, int]:
+        """
+        Devuelve (ruta local, hash, bytes descargados) del PDF, revalidando
+        con el servidor mediante If-None-Match / If-Modified-Since cuando
+        corresponde. La descarga va por bloques directo a disco y se corta
+        si supera max_bytes (PdfTooLargeError).
+        """
+        row = self._get_download(url)
+        cached_path = None
+
+        if row:
+            etag, last_modified, content_hash, checked_at = row
+            cached_path = self._cached_path(content_hash)
+
+            # Copia reciente: no hace falta consultar al servidor
+            if cached_path is not None and (
+                time.time() - checked_at < self.revalidate_after
+            ):
+                if self._mark_used(content_hash):
+                    self._count("fresh_hits")
+                    return cached_path, content_hash, 0
+                cached_path = None
+
+        headers = {}
+        if cached_path is not None:
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        tmp_path = self.files_dir / f"{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as destination:
+                response, bytes_read, new_hash = stream_download(
+                    url,
+                    destination,
+                    max_bytes=max_bytes,
+                    timeout=timeout,
+                    headers=headers,
+                )
+        except requests.RequestException:
+            tmp_path.unlink(missing_ok=True)
+            # Sin conexión: servir la última copia conocida si existe
+            if cached_path is not None and self._mark_used(content_hash):
+                self._count("stale_fallbacks")
+                return cached_path, content_hash, 0
+            raise
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        if (
+            response.status_code == 304
+            and cached_path is not None
+            and self._mark_used(content_hash)
+        ):
+            tmp_path.unlink(missing_ok=True)
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE downloads SET checked_at = ? WHERE url = ?",
+                    (time.time(), url),
+                )
+                self._conn.commit()
+            self._count("not_modified")
+            return cached_path, content_hash, 0
+
+        if new_hash is None:
+            # 304 sin copia local: descargar de nuevo sin condiciones
+            tmp_path.unlink(missing_ok=True)
+            self.invalidate_url(url)
+            return self.fetch_file(url, timeout=timeout, max_bytes=max_bytes)
+
+        path = self._file_path(new_hash)
+        now = time.time()
+        with self._lock:
+            # Con el lock el desalojo no borra el archivo entre el chequeo y
+            # el registro
+            if path.exists():
+                tmp_path.unlink(missing_ok=True)
+            else:
+                tmp_path.replace(path)
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO files VALUES (?, ?, ?)",
+                (new_hash, bytes_read, now),
+            ).rowcount
+            if added:
+                self._file_bytes += bytes_read
+            else:
+                self._conn.execute(
+                    "UPDATE files SET last_used = ? WHERE content_hash = ?",
+                    (now, new_hash),
+                )
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO downloads
+                    (url, etag, last_modified, content_hash, size, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    new_hash,
+                    bytes_read,
+                    now,
+                ),
+            )
+            self._conn.commit()
+        self._count("downloads")
+        self._add_bytes(bytes_read)
+        self.evict_files()
+
+        return path, new_hash, bytes_read
+
+    @staticmethod
+    def extraction_params(**params: Any) -> str:
+        """
+        Parámetros de extracción (versión, parser, límites) como texto
+        estable para la clave: cambiar cualquiera vuelve a parsear el PDF
+        """
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def get_extraction(
+        self, content_hash: str, params: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """Devuelve la extracción guardada para un hash de contenido y parámetros"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM extractions WHERE content_hash = ? AND params = ?",
+                (content_hash, params),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE extractions SET last_access = ? "
+                    "WHERE content_hash = ? AND params = ?",
+                    (time.time(), content_hash, params),
+                )
+                self._conn.commit()
+
+        if row is None:
+            self._count("extraction_misses")
+            return None
+
+        self._count("extraction_hits")
+        return json.loads(row[0])
+
+    def set_extraction(
+        self, content_hash: str, data: Dict[str, Any], params: str = ""
+    ) -> None:
+        """Guarda el texto y las especificaciones extraídas de un PDF"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions "
+                "(content_hash, params, data, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, params, json.dumps(data, ensure_ascii=False), now, now),
+            )
+            self._evict_extractions(now)
+            self._conn.commit()
+
+    def _evict_extractions(self, now: float) -> None:
+        """Desaloja extracciones viejas y las menos usadas (requiere el lock)"""
+        removed = self._conn.execute(
+            "DELETE FROM extractions WHERE last_access < ?", (now - self.max_age,)
+        ).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        if count > self.max_extractions:
+            removed += self._conn.execute(
+                """
+                DELETE FROM extractions WHERE rowid IN (
+                    SELECT rowid FROM extractions ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (count - self.max_extractions,),
+            ).rowcount
+        self.stats_counters["extractions_evicted"] += removed
+
+    def evict_files(self) -> int:
+        """
+        Borra los PDFs sin usar hace más de max_age y, si el total supera
+        max_file_bytes, los menos usados. Los entregados hace menos de
+        in_use_grace segundos nunca se borran. Retorna cuántos se borraron.
+        """
+        now = time.time()
+        protected_since = now - self.in_use_grace
+        with self._lock:
+            # Con el índice por last_used solo se leen los candidatos
+            removed = self._conn.execute(
+                "SELECT content_hash, size FROM files WHERE last_used < ?",
+                (min(now - self.max_age, protected_since),),
+            ).fetchall()
+            total = self._file_bytes - sum(size for _, size in removed)
+            if total > self.max_file_bytes:
+                expired = {content_hash for content_hash, _ in removed}
+                for content_hash, size in self._conn.execute(
+                    "SELECT content_hash, size FROM files WHERE last_used < ? "
+                    "ORDER BY last_used",
+                    (protected_since,),
+                ):
+                    if total <= self.max_file_bytes:
+                        break
+                    if content_hash not in expired:
+                        removed.append((content_hash, size))
+                        total -= size
+
+            if not removed:
+                return 0
+            for content_hash, size in removed:
+                self._file_path(content_hash).unlink(missing_ok=True)
+                self._file_bytes -= size
+            self._conn.executemany(
+                "DELETE FROM files WHERE content_hash = ?",
+                [(content_hash,) for content_hash, _ in removed],
+            )
+            # Sin el archivo la próxima descarga debe ser completa
+            self._conn.executemany(
+                "DELETE FROM downloads WHERE content_hash = ?",
+                [(content_hash,) for content_hash, _ in removed],
+            )
+            self._conn.commit()
+            self.stats_counters["files_evicted"] += len(removed)
+        return len(removed)
+
+    def invalidate_url(self, url: str) -> None:
+        """Fuerza la revalidación completa de una URL"""
+        with self._lock:
+            self._conn.execute("DELETE FROM downloads WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché de PDFs"""
+        with self._lock:
+            urls, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads"
+            ).fetchone()
+            extractions = self._conn.execute(
+                "SELECT COUNT(*) FROM extractions"
+            ).fetchone()[0]
+            counters = dict(self.stats_counters)
+            file_bytes = self._file_bytes
+
+        return {
+            **counters,
+            "urls": urls,
+            "bytes": total,
+            "file_bytes": file_bytes,
+            "extractions": extractions,
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos"""
+        with self._lock:
+            self._conn.close()
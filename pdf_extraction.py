@@ -0,0 +1,318 @@
+"""
+Lectura de fichas técnicas PDF con memoria acotada para STEL Shop
+Descarga en streaming con tope de tamaño (a disco si el archivo es grande)
+y extrae texto solo de las primeras páginas necesarias, en un pool de
+procesos y con parsers intercambiables (PyPDF2 por defecto)
+"""
+
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+
+# Tamaño máximo de descarga, páginas a parsear y texto suficiente para
+# cortar antes
+PDF_LIMITS = {
+    "max_bytes": 64 * 1024 * 1024,
+    "max_pages": 5,
+    "max_chars": 20000,
+}
+
+
+class PdfTooLargeError(Exception):
+    """El PDF supera el tamaño máximo de descarga permitido"""
+
+
+class PdfParseTimeoutError(Exception):
+    """El parseo del PDF superó el tiempo máximo y se detuvo su worker"""
+
+
+def stream_download(
+    url: str,
+    destination,
+    max_bytes: int,
+    timeout: int = 30,
+    headers: Optional[Dict[str, str]] = None,
+    chunk_size: int = 256 * 1024,
+) -> Tuple[requests.Response, int, Optional[str]]:
+    """
+    Descarga url en destination (archivo abierto en modo binario) por bloques.
+    Retorna (respuesta, bytes leídos, sha256). En un 304 no escribe nada y el
+    hash es None. Lanza PdfTooLargeError si se supera max_bytes.
+    """
+    hasher = hashlib.sha256()
+    bytes_read = 0
+
+    with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            return response, 0, None
+
+        response.raise_for_status()
+
+        declared = int(response.headers.get("Content-Length") or 0)
+        if declared > max_bytes:
+            raise PdfTooLargeError(
+                f"PDF de {declared} bytes supera el máximo de {max_bytes}"
+            )
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            bytes_read += len(chunk)
+            if bytes_read > max_bytes:
+                raise PdfTooLargeError(f"PDF supera el máximo de {max_bytes} bytes")
+            hasher.update(chunk)
+            destination.write(chunk)
+
+    return response, bytes_read, hasher.hexdigest()
+
+
+def _collect_pages(page_texts, max_pages: int, max_chars: int) -> Dict[str, Any]:
+    """Junta texto página a página hasta max_pages o max_chars"""
+    parts = []
+    total_chars = 0
+
+    for page_text in page_texts:
+        if len(parts) >= max_pages or total_chars >= max_chars:
+            break
+        page_text = (page_text or "") + "\n"
+        parts.append(page_text)
+        total_chars += len(page_text)
+
+    return {"text": "".join(parts), "pages_parsed": len(parts)}
+
+
+def _parse_pypdf2(source, max_pages: int, max_chars: int) -> Dict[str, Any]:
+    # Se importa en el proceso que parsea, no al cargar el servidor
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(source)
+    result = _collect_pages(
+        (page.extract_text() for page in pdf_reader.pages), max_pages, max_chars
+    )
+    result["page_count"] = len(pdf_reader.pages)
+    return result
+
+
+def _parse_pymupdf(source, max_pages: int, max_chars: int) -> Dict[str, Any]:
+    import pymupdf
+
+    if isinstance(source, (str, Path)):
+        document = pymupdf.open(source)
+    else:
+        document = pymupdf.open(stream=source.read(), filetype="pdf")
+
+    with document:
+        result = _collect_pages(
+            (page.get_text() for page in document), max_pages, max_chars
+        )
+        result["page_count"] = document.page_count
+    return result
+
+
+def _parse_pypdfium2(source, max_pages: int, max_chars: int) -> Dict[str, Any]:
+    import pypdfium2
+
+    document = pypdfium2.PdfDocument(
+        str(source) if isinstance(source, Path) else source
+    )
+
+    def page_texts():
+        for page in document:
+            text_page = page.get_textpage()
+            try:
+                yield text_page.get_text_range()
+            finally:
+                text_page.close()
+                page.close()
+
+    try:
+        result = _collect_pages(page_texts(), max_pages, max_chars)
+        result["page_count"] = len(document)
+    finally:
+        document.close()
+    return result
+
+
+# Parser -> (función, módulo que requiere). PyPDF2 es el predeterminado;
+# los demás se usan solo si están instalados
+PARSERS = {
+    "pypdf2": (_parse_pypdf2, "PyPDF2"),
+    "pymupdf": (_parse_pymupdf, "pymupdf"),
+    "pypdfium2": (_parse_pypdfium2, "pypdfium2"),
+}
+
+DEFAULT_PARSER = "pypdf2"
+
+
+def available_parsers() -> List[str]:
+    """Parsers cuyo módulo está instalado"""
+    return [
+        name
+        for name, (_, module) in PARSERS.items()
+        if importlib.util.find_spec(module) is not None
+    ]
+
+
+def extract_pdf_text(
+    source,
+    max_pages: int = 5,
+    max_chars: int = 20000,
+    parser: str = DEFAULT_PARSER,
+) -> Dict[str, Any]:
+    """
+    Extrae texto de las primeras páginas del PDF (ruta o archivo abierto).
+    Se detiene al llegar a max_pages o cuando ya se juntaron max_chars.
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Parser de PDF desconocido: {parser}")
+    return PARSERS[parser][0](source, max_pages, max_chars)
+
+
+class PdfParserPool:
+    """
+    Ejecuta el parseo de PDFs en un pool de procesos para no bloquear el
+    GIL del servidor Flask ni del hilo de Selenium. Con max_workers = 0
+    parsea en el hilo que llama.
+
+    Un PDF que supera timeout no se puede cancelar dentro de su worker: se
+    terminan los procesos del pool y se arma uno nuevo, para que unas
+    pocas fichas problemáticas no ocupen todos los workers. Los parseos
+    que estaban en curso en ese pool se reintentan una vez en el nuevo.
+    """
+
+    def __init__(
+        self,
+        parser: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        timeout: float = 120,
+    ):
+        installed = available_parsers()
+        if parser is None or parser not in installed:
+            if parser is not None:
+                print(f"⚠️ Parser de PDF '{parser}' no disponible, usando PyPDF2")
+            parser = DEFAULT_PARSER
+
+        self.parser = parser
+        self.max_workers = (
+            min(4, os.cpu_count() or 1) if max_workers is None else max_workers
+        )
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats_counters = {
+            "parsed": 0,
+            "inline": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "pools_recycled": 0,
+            "pages": 0,
+            "seconds": 0.0,
+        }
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._executor is None and self.max_workers > 0:
+                # spawn: no se hereda el estado de los hilos del proceso padre
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        """Termina los procesos de executor y descarta el pool"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.stats_counters["pools_recycled"] += 1
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+            return
+        # Antes de Python 3.14 no hay API pública para terminar los workers
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_in_pool(self, source, max_pages: int, max_chars: int) -> Dict[str, Any]:
+        """Parsea en el pool; reintenta una vez si otro parseo lo reinició"""
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(
+                    extract_pdf_text, str(source), max_pages, max_chars, self.parser
+                )
+            except RuntimeError:
+                # Otro hilo terminó este pool entre _get_executor y submit
+                if attempt:
+                    raise
+                continue
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self.stats_counters["timeouts"] += 1
+                print(f"⚠️ PDF sin terminar en {self.timeout}s, reiniciando el pool")
+                self._recycle(executor)
+                raise PdfParseTimeoutError(
+                    f"El parseo del PDF superó {self.timeout}s"
+                ) from None
+            except BrokenProcessPool:
+                # Un worker murió (o se terminó el pool por un timeout)
+                self._recycle(executor)
+                if attempt:
+                    raise
+                print("⚠️ Pool de PDFs caído, reintentando en un pool nuevo")
+
+    def extract(
+        self, source, max_pages: int = 5, max_chars: int = 20000
+    ) -> Dict[str, Any]:
+        """Parsea el PDF; las rutas van al pool, los archivos abiertos no"""
+        started = time.perf_counter()
+        executor = self._get_executor() if isinstance(source, (str, Path)) else None
+
+        try:
+            if executor is None:
+                result = extract_pdf_text(source, max_pages, max_chars, self.parser)
+                inline = True
+            else:
+                result = self._run_in_pool(source, max_pages, max_chars)
+                inline = False
+        except Exception:
+            with self._lock:
+                self.stats_counters["errors"] += 1
+            raise
+
+        with self._lock:
+            self.stats_counters["parsed"] += 1
+            self.stats_counters["inline"] += int(inline)
+            self.stats_counters["pages"] += result["pages_parsed"]
+            self.stats_counters["seconds"] += time.perf_counter() - started
+
+        result["parser"] = self.parser
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.stats_counters)
+        return {
+            **counters,
+            "seconds": round(counters["seconds"], 2),
+            "parser": self.parser,
+            "max_workers": self.max_workers,
+        }
+
+    def shutdown(self) -> None:
+        """Detiene los procesos del pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,231 @@
+"""
+Constructor de prompts con presupuesto de tokens para STEL Shop
+Descarta campos vacíos o repetidos y elige los párrafos del PDF con más
+especificaciones (palabras clave y valores con unidad) hasta llenar el
+presupuesto, en lugar de tomar los primeros caracteres del texto
+"""
+
+import re
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+from spec_extractor import spec_token_count
+
+# 0 es el valor por defecto de format_product para precio y stock
+_EMPTY_STRINGS = {"", "nan", "none", "null", "n/a", "-", "0"}
+
+# Valores más cortos no se consideran repetidos (50 Hz y 50 L pueden coincidir)
+_MIN_DUPLICATE_LENGTH = 6
+
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación aproximada de tokens (≈ 4 caracteres por token)"""
+    return len(text) // 4 + 1
+
+
+def is_empty(value: Any) -> bool:
+    """Valores que no aportan información al prompt"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() in _EMPTY_STRINGS
+    if isinstance(value, (list, tuple, set, dict)):
+        return not value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value == 0
+    return False
+
+
+def _normalize(value: Any) -> str:
+    return _WHITESPACE_RE.sub(" ", str(value)).strip().lower()
+
+
+def compact_fields(
+    data: Dict[str, Any], exclude: Iterable[str] = ()
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Campos con valor, sin claves repetidas (sku / SKU) ni valores largos
+    repetidos. Retorna (campos conservados, claves descartadas).
+    """
+    excluded = {key.lower() for key in exclude}
+    kept = {}
+    dropped = []
+    seen_keys = set()
+    seen_values = set()
+
+    for key, value in data.items():
+        key_lower = key.lower()
+        value_norm = _normalize(value)
+        if (
+            key_lower in excluded
+            or key_lower in seen_keys
+            or is_empty(value)
+            or (len(value_norm) >= _MIN_DUPLICATE_LENGTH and value_norm in seen_values)
+        ):
+            dropped.append(key)
+            continue
+
+        seen_keys.add(key_lower)
+        seen_values.add(value_norm)
+        kept[key] = value
+
+    return kept, dropped
+
+
+def format_fields(fields: Dict[str, Any], indent: str = "") -> str:
+    """Campos como líneas '- clave: valor' (más compacto que JSON indentado)"""
+    return "\n".join(f"{indent}- {key}: {value}" for key, value in fields.items())
+
+
+def format_spec_lines(
+    info: Dict[str, Any],
+    campos: Sequence[Tuple[str, Sequence[str], str]],
+    indent: str = "",
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Líneas '- Etiqueta: valor unidad' para los campos con valor.
+    campos: (etiqueta, claves alternativas, unidad). La unidad no se repite
+    si el valor ya la incluye.
+    """
+    lines = []
+    seen = set()
+    dropped = 0
+
+    for label, keys, unit in campos:
+        value = next((info[key] for key in keys if not is_empty(info.get(key))), None)
+        if value is None:
+            dropped += 1
+            continue
+
+        text = str(value).strip()
+        if unit and not text.lower().endswith(unit.lower()):
+            text = f"{text} {unit}"
+
+        normalized = (label, _normalize(text))
+        if normalized in seen:
+            dropped += 1
+            continue
+        seen.add(normalized)
+        lines.append(f"{indent}- {label}: {text}")
+
+    return "\n".join(lines), {"fields_kept": len(lines), "fields_dropped": dropped}
+
+
+def split_paragraphs(text: str, max_chars: int = 400) -> List[str]:
+    """
+    Divide el texto del PDF en párrafos. Los bloques largos (PyPDF2 suele
+    devolver páginas sin líneas en blanco) se cortan por líneas.
+    """
+    paragraphs = []
+    for block in _PARAGRAPH_SPLIT_RE.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            paragraphs.append(block)
+            continue
+
+        current = []
+        size = 0
+        for line in block.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if current and size + len(line) > max_chars:
+                paragraphs.append("\n".join(current))
+                current = []
+                size = 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            paragraphs.append("\n".join(current))
+
+    return paragraphs
+
+
+def select_excerpt(text: str, max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Elige los párrafos con mayor densidad de especificaciones que entran en
+    max_tokens y los devuelve en el orden original del documento
+    """
+    paragraphs = split_paragraphs(text)
+    candidates = []
+    seen = set()
+    duplicates = 0
+
+    for position, paragraph in enumerate(paragraphs):
+        normalized = _normalize(paragraph)
+        if normalized in seen:
+            duplicates += 1  # Texto legal repetido en cada página
+            continue
+        seen.add(normalized)
+        tokens = estimate_tokens(paragraph)
+        candidates.append(
+            (spec_token_count(paragraph) / tokens, position, paragraph, tokens)
+        )
+
+    selected = []
+    used = 0
+    for score, position, paragraph, tokens in sorted(
+        candidates, key=lambda candidate: (-candidate[0], candidate[1])
+    ):
+        if score == 0 and selected:
+            break
+        if used + tokens > max_tokens:
+            continue
+        selected.append((position, paragraph))
+        used += tokens
+
+    excerpt = "\n".join(paragraph for _, paragraph in sorted(selected))
+    return excerpt, {
+        "pdf_paragraphs": len(paragraphs),
+        "pdf_paragraphs_used": len(selected),
+        "pdf_duplicates": duplicates,
+        "pdf_tokens": estimate_tokens(excerpt) if excerpt else 0,
+        "pdf_tokens_available": estimate_tokens(text) if text else 0,
+    }
+
+
+class PromptBuilder:
+    """Arma el contexto de producto de los prompts dentro de un presupuesto"""
+
+    def __init__(self, token_budget: int = 1000, min_pdf_tokens: int = 150):
+        self.token_budget = token_budget
+        self.min_pdf_tokens = min_pdf_tokens
+
+    def product_context(
+        self,
+        info: Dict[str, Any],
+        texto_pdf: str,
+        campos: Optional[Sequence[Tuple[str, Sequence[str], str]]] = None,
+        exclude: Iterable[str] = (),
+        indent: str = "",
+    ) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Retorna (campos formateados, extracto del PDF, estadísticas). Con
+        campos se usan etiquetas y unidades fijas; sin campos se listan
+        todos los campos con valor del producto.
+        """
+        if campos is not None:
+            fields_text, stats = format_spec_lines(info, campos, indent)
+        else:
+            fields, dropped = compact_fields(info, exclude)
+            fields_text = format_fields(fields, indent)
+            stats = {"fields_kept": len(fields), "fields_dropped": len(dropped)}
+
+        fields_tokens = estimate_tokens(fields_text)
+        pdf_budget = max(self.min_pdf_tokens, self.token_budget - fields_tokens)
+        excerpt, pdf_stats = select_excerpt(texto_pdf or "", pdf_budget)
+
+        return (
+            fields_text,
+            excerpt,
+            {
+                **stats,
+                **pdf_stats,
+                "fields_tokens": fields_tokens,
+                "budget": self.token_budget,
+            },
+        )
@@ -0,0 +1,649 @@
+"""
+Proveedores de IA para STEL Shop
+Envían el prompt en dos partes: un prefijo estático versionado (instrucciones
+y diseño HTML, igual para todos los productos) y un sufijo por producto. Los
+proveedores con caché de contexto suben el prefijo una sola vez por sesión y
+luego solo envían el sufijo.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class PromptPrefix:
+    """Parte estática del prompt, identificada por versión y contenido"""
+
+    __slots__ = ("version", "text", "id", "tokens")
+
+    def __init__(self, version: str, text: str):
+        self.version = version
+        self.text = text
+        digest = hashlib.sha256(f"{version}\n{text}".encode("utf-8")).hexdigest()
+        self.id = f"{version}-{digest[:16]}"
+        self.tokens = _estimate_tokens(text)
+
+    def __repr__(self):
+        return f"PromptPrefix({self.id!r}, ~{self.tokens} tokens)"
+
+
+class ProviderResponse:
+    """
+    Respuesta compatible con la de google.generativeai (.text), con el
+    modelo que respondió y los tokens usados (entrada, salida y entrada
+    servida desde la caché de contexto)
+    """
+
+    __slots__ = ("text", "model", "usage")
+
+    def __init__(self, text: str, model: str = "", usage: Optional[Dict] = None):
+        self.text = text
+        self.model = model
+        self.usage = usage or {}
+
+
+class AIProvider(ABC):
+    """
+    Interfaz común de los proveedores. generate_content mantiene la firma
+    del modelo de Gemini para los métodos que todavía llaman al modelo
+    directamente.
+    """
+
+    name = "base"
+    supports_context_cache = False
+
+    def __init__(self, model_name: str = ""):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self.stats_counters = {
+            "calls": 0,
+            "prefix_uploads": 0,
+            "prefix_cache_failures": 0,
+            # Tokens de entrada enviados: prefijo y resto del prompt por separado
+            "prefix_tokens_sent": 0,
+            "prompt_tokens_sent": 0,
+        }
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats_counters[name] += amount
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        """Genera la respuesta (ProviderResponse) para el prefijo y el prompt"""
+
+    async def agenerate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        return await asyncio.to_thread(
+            self.generate, prompt, generation_config, prefix, task
+        )
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None):
+        return self.generate(prompt, generation_config)
+
+    @property
+    def label(self) -> str:
+        """Proveedor y modelo, por ejemplo gemini:gemini-1.5-flash"""
+        return f"{self.name}:{self.model_name}" if self.model_name else self.name
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"provider": self.label, **self.stats_counters}
+
+
+class GeminiProvider(AIProvider):
+    """
+    Google Gemini. El prefijo se sube como CachedContent sobre el modelo con
+    versión fija configurado en cache_model_name. Sin ese modelo, o con un
+    prefijo debajo del mínimo de tokens cacheables, no se intenta subirlo y
+    se envía junto con el sufijo (prefix_cache_skipped y prefix_inline_calls
+    en las stats).
+    """
+
+    name = "gemini"
+    supports_context_cache = True
+
+    # Tokens mínimos que acepta CachedContent en Gemini 1.5
+    MIN_CACHE_TOKENS = 32768
+
+    def __init__(
+        self,
+        model_name: str = "gemini-1.5-flash",
+        cache_model_name: Optional[str] = None,
+        cache_ttl: int = 3600,
+        min_cache_tokens: int = MIN_CACHE_TOKENS,
+    ):
+        super().__init__(model_name)
+        import google.generativeai as genai
+
+        self._genai = genai
+        self.model = genai.GenerativeModel(model_name)
+        # La caché de contexto exige una versión fija del modelo
+        # (por ejemplo models/gemini-1.5-flash-002); sin ella no se usa
+        self.cache_model_name = cache_model_name
+        self.cache_ttl = cache_ttl
+        self.min_cache_tokens = min_cache_tokens
+        self.stats_counters["prefix_cache_skipped"] = 0
+        self.stats_counters["prefix_inline_calls"] = 0
+        # prefix.id -> (modelo sobre el contexto cacheado o None, creado en)
+        self._prefix_models: Dict[str, Any] = {}
+        self._prefix_lock = threading.Lock()
+
+    def _model_for_prefix(self, prefix: PromptPrefix):
+        with self._prefix_lock:
+            entry = self._prefix_models.get(prefix.id)
+            # Renovar un poco antes de que venza el TTL
+            if entry is not None and (
+                entry[0] is None or time.time() - entry[1] < self.cache_ttl * 0.9
+            ):
+                return entry[0]
+
+            motivo = self._cache_skip_reason(prefix)
+            if motivo is not None:
+                # No se reintenta: el prefijo no cambia durante la sesión
+                self._prefix_models[prefix.id] = (None, time.time())
+                self._count(prefix_cache_skipped=1)
+                print(f"ℹ️ Prefijo {prefix.id} sin caché de contexto ({motivo})")
+                return None
+
+            from google.generativeai import caching
+
+            try:
+                cached = caching.CachedContent.create(
+                    model=self.cache_model_name,
+                    display_name=f"stel-{prefix.id}",
+                    contents=[prefix.text],
+                    ttl=timedelta(seconds=self.cache_ttl),
+                )
+                model = self._genai.GenerativeModel.from_cached_content(cached)
+                self._count(prefix_uploads=1, prefix_tokens_sent=prefix.tokens)
+                print(f"🗂️ Prefijo {prefix.id} subido a la caché de contexto")
+            except Exception as e:
+                model = None
+                self._count(prefix_cache_failures=1)
+                print(f"⚠️ Caché de contexto no disponible ({e}); prefijo en línea")
+
+            self._prefix_models[prefix.id] = (model, time.time())
+            return model
+
+    def _cache_skip_reason(self, prefix: PromptPrefix) -> Optional[str]:
+        """Por qué el prefijo no se sube a la caché de contexto (None si se sube)"""
+        if not self.cache_model_name:
+            return "sin cache_model configurado"
+        if prefix.tokens < self.min_cache_tokens:
+            return f"~{prefix.tokens} tokens, mínimo {self.min_cache_tokens}"
+        return None
+
+    def _forget_prefix(self, prefix: PromptPrefix) -> None:
+        with self._prefix_lock:
+            self._prefix_models.pop(prefix.id, None)
+
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        self._count(calls=1)
+        if prefix is not None:
+            model = self._model_for_prefix(prefix)
+            if model is not None:
+                try:
+                    response = model.generate_content(
+                        prompt, generation_config=generation_config
+                    )
+                    self._count(prompt_tokens_sent=_estimate_tokens(prompt))
+                    return self._wrap(response)
+                except Exception as e:
+                    mensaje = str(e).lower()
+                    if "not found" not in mensaje and "expired" not in mensaje:
+                        raise
+                    # El contexto cacheado venció: se vuelve a subir la próxima vez
+                    self._forget_prefix(prefix)
+            self._count(
+                prefix_inline_calls=1,
+                prefix_tokens_sent=prefix.tokens,
+                prompt_tokens_sent=_estimate_tokens(prompt),
+            )
+            response = self._wrap(
+                self.model.generate_content(
+                    prefix.text + prompt, generation_config=generation_config
+                )
+            )
+            # Las métricas separan el prefijo enviado sin caché de contexto
+            response.usage["prefix_inline_tokens"] = prefix.tokens
+            return response
+
+        self._count(prompt_tokens_sent=_estimate_tokens(prompt))
+        return self._wrap(
+            self.model.generate_content(prompt, generation_config=generation_config)
+        )
+
+    def _wrap(self, response) -> ProviderResponse:
+        """Texto y uso de tokens informado por la API"""
+        metadata = getattr(response, "usage_metadata", None)
+        usage = {}
+        if metadata is not None:
+            usage = {
+                "tokens_in": getattr(metadata, "prompt_token_count", 0) or 0,
+                "tokens_out": getattr(metadata, "candidates_token_count", 0) or 0,
+                "cached_tokens": getattr(metadata, "cached_content_token_count", 0)
+                or 0,
+            }
+        return ProviderResponse(response.text, self.label, usage)
+
+
+class LocalProvider(AIProvider):
+    """
+    Proveedor local y determinista para pruebas y benchmarks: no hace
+    llamadas de red, registra qué prefijos recibió y responde JSON con el
+    formato que espera el prompt
+    """
+
+    name = "local"
+    supports_context_cache = True
+
+    _SKU_RE = re.compile(r"- SKU: (\S+)")
+    _GROUP_SKU_RE = re.compile(r"=== PRODUCTO SKU (\S+) ===")
+    _NAME_RE = re.compile(r"PRODUCTO: (.+)")
+
+    # Defectos típicos de las respuestas JSON de los modelos
+    DEFECTS = ("fences", "trailing_comma", "prose", "truncated", "missing", "garbage")
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        defect_rate: float = 0.0,
+        seed: int = 0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        error_rate: float = 0.0,
+        model_name: str = "",
+    ):
+        super().__init__(model_name)
+        self.latency = latency
+        self.defect_rate = defect_rate
+        # Llamadas lentas (cola de latencia) y fallidas, para probar la resiliencia
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.prefixes: Dict[str, PromptPrefix] = {}
+        self.stats_counters["defects"] = 0
+        self.stats_counters["slow"] = 0
+        self.stats_counters["errors"] = 0
+
+    def _simulate(self) -> Tuple[float, bool]:
+        """Latencia de esta llamada y si debe fallar"""
+        with self._lock:
+            slow = self._random.random() < self.slow_rate
+            failed = self._random.random() < self.error_rate
+            self.stats_counters["slow"] += int(slow)
+            self.stats_counters["errors"] += int(failed)
+        return (self.slow_latency if slow else self.latency), failed
+
+    def _receive(self, prompt: str, prefix: Optional[PromptPrefix]):
+        """Registra lo recibido (cada prefijo cuenta una sola vez) y responde"""
+        prompt_tokens = _estimate_tokens(prompt)
+        self._count(calls=1, prompt_tokens_sent=prompt_tokens)
+        usage = {"tokens_in": prompt_tokens, "tokens_out": 0, "cached_tokens": 0}
+        if prefix is not None:
+            with self._lock:
+                nuevo = prefix.id not in self.prefixes
+                self.prefixes.setdefault(prefix.id, prefix)
+            if nuevo:
+                self._count(prefix_uploads=1, prefix_tokens_sent=prefix.tokens)
+            else:
+                usage["cached_tokens"] = prefix.tokens
+            usage["tokens_in"] += prefix.tokens
+        text = self.respond(prompt, prefix)
+        usage["tokens_out"] = _estimate_tokens(text)
+        return ProviderResponse(text, self.label, usage)
+
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        latency, failed = self._simulate()
+        if latency:
+            time.sleep(latency)
+        if failed:
+            raise ConnectionError("Proveedor local: servicio no disponible (503)")
+        return self._receive(prompt, prefix)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        latency, failed = self._simulate()
+        if latency:
+            await asyncio.sleep(latency)
+        if failed:
+            raise ConnectionError("Proveedor local: servicio no disponible (503)")
+        return self._receive(prompt, prefix)
+
+    def respond(self, prompt: str, prefix: Optional[PromptPrefix] = None) -> str:
+        """Respuesta determinista según el tipo de prompt"""
+        skus = self._GROUP_SKU_RE.findall(prompt)
+        if skus:
+            return json.dumps([self._item(sku, sku) for sku in skus])
+
+        full_prompt = (prefix.text if prefix is not None else "") + prompt
+        sku = self._SKU_RE.search(prompt)
+        nombre = self._NAME_RE.search(prompt)
+        sku = sku.group(1) if sku else ""
+        nombre = nombre.group(1).strip() if nombre else "Producto"
+
+        if '"descripcion_html"' in full_prompt:
+            return self._with_defect(
+                json.dumps(self._item(sku, nombre), ensure_ascii=False, indent=1)
+            )
+        return f"<div><h1>{nombre}</h1></div>"
+
+    def _with_defect(self, text: str) -> str:
+        """Aplica un defecto al azar (según defect_rate) a una respuesta JSON"""
+        with self._lock:
+            if self._random.random() >= self.defect_rate:
+                return text
+            defect = self._random.choice(self.DEFECTS)
+            self.stats_counters["defects"] += 1
+
+        if defect == "fences":
+            return f"```json\n{text}\n```"
+        if defect == "trailing_comma":
+            return text[: text.rindex("}")].rstrip() + ",\n}"
+        if defect == "prose":
+            return f"Aquí está el contenido solicitado:\n{text}\nSaludos."
+        if defect == "truncated":
+            html_start = text.index('"descripcion_html"')
+            return text[: html_start + 60]
+        if defect == "missing":
+            data = json.loads(text)
+            data.pop("seo_descripcion", None)
+            return json.dumps(data, ensure_ascii=False)
+        return "Lo siento, no puedo generar ese contenido."
+
+    def _item(self, sku: str, nombre: str) -> Dict[str, str]:
+        return {
+            "sku": sku,
+            "descripcion": f"{nombre}\nDescripción técnica generada localmente.",
+            "descripcion_html": f"<div><h1>{nombre}</h1><p>SKU {sku}</p></div>",
+            "seo_titulo": nombre[:60],
+            "seo_descripcion": f"Comprá {nombre} con envío y garantía."[:160],
+        }
+
+
+class ProviderRouter(AIProvider):
+    """
+    Envía cada solicitud al mejor proveedor disponible para su tarea.
+    routes: tarea -> proveedores en orden de preferencia (por ejemplo el
+    modelo flash primero y uno más grande solo como respaldo). Se usa el
+    primero que esté sano: tasa de error reciente por debajo de
+    max_error_rate y p95 de latencia no mayor a latency_tolerance veces el
+    del candidato sano más rápido. Las muestras vencen a los window_seconds,
+    así un proveedor descartado vuelve a probarse; una fracción explore_rate
+    de las solicitudes va a candidatos sin muestras recientes para que su
+    latencia siga medida.
+    """
+
+    name = "router"
+    supports_context_cache = True
+
+    def __init__(
+        self,
+        routes: Dict[str, List[AIProvider]],
+        default_task: str = "html",
+        window_seconds: float = 300,
+        max_samples: int = 100,
+        min_samples: int = 5,
+        max_error_rate: float = 0.3,
+        latency_tolerance: float = 3.0,
+        explore_rate: float = 0.05,
+        seed: int = 0,
+    ):
+        super().__init__()
+        if default_task not in routes:
+            raise ValueError(f"Falta la ruta de la tarea por defecto: {default_task}")
+        self.routes = routes
+        self.default_task = default_task
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.explore_rate = explore_rate
+        self._random = random.Random(seed)
+        # label -> deque de (momento, latencia, ok)
+        self._samples: Dict[str, deque] = {
+            provider.label: deque(maxlen=max_samples)
+            for candidates in routes.values()
+            for provider in candidates
+        }
+        self._routed: Dict[str, int] = {label: 0 for label in self._samples}
+        self.stats_counters["fallbacks"] = 0
+        self.stats_counters["explored"] = 0
+
+    @property
+    def providers(self) -> List[AIProvider]:
+        """Proveedores distintos de todas las rutas"""
+        unique = {}
+        for candidates in self.routes.values():
+            for provider in candidates:
+                unique.setdefault(provider.label, provider)
+        return list(unique.values())
+
+    def _health(self, label: str) -> Tuple[int, float, Optional[float]]:
+        """(muestras, tasa de error, p95 de latencia de las exitosas)"""
+        limit = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = [s for s in self._samples[label] if s[0] >= limit]
+        if not samples:
+            return 0, 0.0, None
+        errors = sum(1 for _, _, ok in samples if not ok)
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        p95 = (
+            latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            if latencies
+            else None
+        )
+        return len(samples), errors / len(samples), p95
+
+    def select(self, task: Optional[str] = None) -> AIProvider:
+        """Proveedor elegido para la tarea según su salud reciente"""
+        candidates = self.routes.get(task or self.default_task)
+        if candidates is None:
+            candidates = self.routes[self.default_task]
+
+        health = {
+            provider.label: self._health(provider.label) for provider in candidates
+        }
+        healthy = [
+            provider
+            for provider in candidates
+            if health[provider.label][0] < self.min_samples
+            or health[provider.label][1] <= self.max_error_rate
+        ]
+        if not healthy:
+            # Ninguno está sano: el de menor tasa de error
+            return min(candidates, key=lambda provider: health[provider.label][1])
+
+        # La latencia solo se compara entre proveedores con muestras suficientes
+        measured = {
+            provider.label: health[provider.label][2]
+            for provider in healthy
+            if health[provider.label][0] >= self.min_samples
+            and health[provider.label][2] is not None
+        }
+        fastest = min(measured.values()) if measured else None
+
+        unmeasured = [p for p in healthy if health[p.label][0] < self.min_samples]
+        if unmeasured and len(unmeasured) < len(healthy):
+            with self._lock:
+                explore = self._random.random() < self.explore_rate
+                self.stats_counters["explored"] += int(explore)
+            if explore:
+                return self._random.choice(unmeasured)
+
+        for provider in healthy:
+            p95 = measured.get(provider.label)
+            if p95 is None or p95 <= fastest * self.latency_tolerance:
+                return provider
+        return healthy[0]
+
+    def _record(
+        self, provider: AIProvider, task: Optional[str], started: float, ok: bool
+    ) -> None:
+        preferred = self.routes.get(
+            task or self.default_task, self.routes[self.default_task]
+        )[0]
+        with self._lock:
+            self._samples[provider.label].append(
+                (time.monotonic(), time.monotonic() - started, ok)
+            )
+            self._routed[provider.label] += 1
+            self.stats_counters["calls"] += 1
+            if provider is not preferred:
+                self.stats_counters["fallbacks"] += 1
+
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        provider = self.select(task)
+        started = time.monotonic()
+        try:
+            response = provider.generate(prompt, generation_config, prefix, task)
+        except Exception:
+            self._record(provider, task, started, False)
+            raise
+        self._record(provider, task, started, True)
+        return response
+
+    async def agenerate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        prefix: Optional[PromptPrefix] = None,
+        task: Optional[str] = None,
+    ):
+        provider = self.select(task)
+        started = time.monotonic()
+        try:
+            response = await provider.agenerate(prompt, generation_config, prefix, task)
+        except Exception:
+            self._record(provider, task, started, False)
+            raise
+        self._record(provider, task, started, True)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        providers = {}
+        for provider in self.providers:
+            samples, error_rate, p95 = self._health(provider.label)
+            with self._lock:
+                routed = self._routed[provider.label]
+            providers[provider.label] = {
+                **provider.stats(),
+                "routed": routed,
+                "recent_samples": samples,
+                "error_rate": round(error_rate, 3),
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        with self._lock:
+            counters = dict(self.stats_counters)
+        return {
+            "provider": self.name,
+            "calls": counters["calls"],
+            "fallbacks": counters["fallbacks"],
+            "explored": counters["explored"],
+            "routes": {
+                task: [provider.label for provider in candidates]
+                for task, candidates in self.routes.items()
+            },
+            "providers": providers,
+        }
+
+
+# Modelos por tarea cuando config.json no define "models". El modelo flash
+# va primero: pro es más lento y caro y solo se usa si flash no está sano
+DEFAULT_MODELS = {
+    "gemini": {
+        "html": ["gemini-1.5-flash", "gemini-1.5-pro"],
+        "seo": ["gemini-1.5-flash"],
+    },
+    "local": {"html": ["local"], "seo": ["local"]},
+}
+
+
+def build_provider(ai_config: Dict[str, Any]) -> AIProvider:
+    """
+    Arma el proveedor a partir de la sección "ai" de config.json:
+    "provider" ("gemini" o "local"), opcionalmente "models" (tarea ->
+    modelos en orden de preferencia) y "context_cache" con "models" (modelo
+    -> versión fija para CachedContent), "ttl_seconds" y "min_tokens".
+    Con un solo modelo no hay router.
+    """
+    name = (ai_config.get("provider") or "gemini").lower()
+    if name not in DEFAULT_MODELS:
+        raise ValueError(f"Proveedor de IA desconocido: {name}")
+
+    models = ai_config.get("models") or DEFAULT_MODELS[name]
+    context_cache = ai_config.get("context_cache") or {}
+    cache_models = context_cache.get("models") or {}
+    instances: Dict[str, AIProvider] = {}
+
+    def instance(model_name: str) -> AIProvider:
+        if model_name not in instances:
+            if name == "local":
+                instances[model_name] = LocalProvider(model_name=model_name)
+            else:
+                instances[model_name] = GeminiProvider(
+                    model_name,
+                    cache_model_name=cache_models.get(model_name),
+                    cache_ttl=context_cache.get("ttl_seconds", 3600),
+                    min_cache_tokens=context_cache.get(
+                        "min_tokens", GeminiProvider.MIN_CACHE_TOKENS
+                    ),
+                )
+        return instances[model_name]
+
+    routes = {
+        task: [instance(model_name) for model_name in model_names]
+        for task, model_names in models.items()
+    }
+    if len(instances) == 1:
+        return next(iter(instances.values()))
+    return ProviderRouter(routes)
@@ -5,32 +5,29 @@ Conecta con Cloud Function y genera descripciones mejoradas
 
 import json
 import requests
-import pandas as pd
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, jsonify, request, render_template
 from flask_cors import CORS
 import sys
 import os
+import threading
 import time
+from pathlib import Path
+
+# Momento en que se empezó a cargar el servidor, para medir la primera página
+STARTED = time.perf_counter()
 
 # Agregar el path para importar los módulos existentes
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Importar los handlers
-try:
-    from ai_handler_enhanced import EnhancedAIHandler
-
-    print("✅ Módulo AI cargado correctamente")
-except ImportError as e:
-    print(f"⚠️  No se pudo cargar el módulo AI: {e}")
-    EnhancedAIHandler = None
-
-try:
-    from navigation.selenium_handler import SeleniumHandler
-
-    print("✅ Módulo Selenium cargado correctamente")
-except ImportError as e:
-    print(f"⚠️  No se pudo cargar el módulo Selenium: {e}")
-    SeleniumHandler = None
+# Los módulos pesados (IA, Selenium, PyPDF2) se importan al
+# inicializar cada subsistema o al primer uso, no al cargar el servidor
+from catalog_index import CatalogIndex, ProductQuery, QUERY_PARAMS, encode_cursor
+from catalog_search import SearchIndex
+from catalog_snapshot import CatalogSnapshotFile
+from catalog_store import CatalogSnapshot, CatalogStore
+from json_payload import PreparedJson
+from pdf_batch import normalize_pdf_url, get_product_pdf_url
+from seo_batch import generate_seo_catalog
 
 # Configuración
 app = Flask(__name__)
@@ -46,40 +43,47 @@ AI_CONFIG = {
     "email": "info@stelshop.com",
     "telefono_display": "+54 11 3956-3099",
     "website": "www.stelshop.com",
+    # Parser de PDFs: "pypdf2" o, si están instalados, "pymupdf" / "pypdfium2"
+    "pdf_parser": "pypdf2",
 }
 
+# Última copia buena del catálogo en disco (se abre al iniciar el catálogo)
+CATALOG_SNAPSHOT_PATH = (
+    Path(__file__).parent / "enhanced_shop" / "cache" / "catalog_snapshot.sqlite"
+)
+
 # Instancias globales
 ai_handler = None
 selenium_handler = None
-products_cache = []
-cache_timestamp = 0
+catalog_file = None
 
+# Espera máxima de una ruta por el subsistema que necesita mientras se inicia
+SUBSYSTEM_WAIT_SECONDS = 35
 
-def get_products_from_cloud_function():
-    """Obtiene productos desde la Cloud Function con caché de 5 minutos"""
-    global products_cache, cache_timestamp
+# Estado del inicio (ver /api/ready)
+startup_state = {
+    "started": None,
+    "ready_seconds": None,
+    "first_page_seconds": None,
+    "subsystems": {},
+}
+_startup_lock = threading.Lock()
+_subsystem_events = {}
 
-    if products_cache and (time.time() - cache_timestamp) < 300:
-        return products_cache
 
-    try:
-        print("🔄 Obteniendo productos desde Cloud Function...")
-        response = requests.get(CLOUD_FUNCTION_URL, timeout=30)
-
-        if response.status_code == 200:
-            data = response.json()
-            products = data.get("products", []) if isinstance(data, dict) else data
-            products_cache = products
-            cache_timestamp = time.time()
-            print(f"✅ {len(products)} productos obtenidos")
-            return products
-        else:
-            print(f"❌ Error: Status {response.status_code}")
-            return []
+def fetch_products_from_cloud_function():
+    """Descarga el catálogo completo de la Cloud Function (lanza si falla)"""
+    print("🔄 Obteniendo productos desde Cloud Function...")
+    response = requests.get(CLOUD_FUNCTION_URL, timeout=30)
+    if response.status_code != 200:
+        raise RuntimeError(f"Status {response.status_code}")
+    data = response.json()
+    return data.get("products", []) if isinstance(data, dict) else data
 
-    except Exception as e:
-        print(f"❌ Error conectando con Cloud Function: {e}")
-        return []
+
+# Subir al cambiar format_product o la respuesta de /api/products: la copia
+# en disco guardada con otro formato se vuelve a armar desde los productos
+PRODUCTS_FORMAT = 1
 
 
 def format_product(product):
@@ -104,6 +108,204 @@ def format_product(product):
     }
 
 
+def formatted_products(snapshot):
+    """Productos de la copia en formato estándar (se formatean una vez por copia)"""
+    if snapshot is None:
+        return []
+    return snapshot.derived(
+        "formatted", lambda s: [format_product(p) for p in s.products]
+    )
+
+
+def products_payload(snapshot) -> PreparedJson:
+    """Respuesta de /api/products serializada y comprimida una vez por copia"""
+
+    def build(snapshot):
+        productos = formatted_products(snapshot)
+        return PreparedJson(
+            {"success": True, "count": len(productos), "products": productos}
+        )
+
+    if snapshot is None:
+        return build(None)
+    return snapshot.derived("products_payload", build)
+
+
+def search_index(snapshot) -> SearchIndex:
+    """Índice de texto del catálogo (se arma una vez por copia)"""
+    if snapshot is None:
+        return SearchIndex([])
+    return snapshot.derived("search", lambda s: SearchIndex(formatted_products(s)))
+
+
+def catalog_index(snapshot) -> CatalogIndex:
+    """Índices de filtros, orden y facetas de la copia (se arman una vez por copia)"""
+    if snapshot is None:
+        return CatalogIndex([])
+    return snapshot.derived(
+        "index", lambda s: CatalogIndex(formatted_products(s), search_index(s))
+    )
+
+
+def prepare_snapshot(snapshot) -> None:
+    """Prepara la respuesta completa y los índices antes de publicar la copia"""
+    products_payload(snapshot)
+    catalog_index(snapshot)
+
+
+def prepared_response(payload: PreparedJson) -> Response:
+    """
+    Envía la variante que acepta el cliente (br, gzip o sin comprimir) con su
+    ETag; si coincide con If-None-Match responde 304 sin cuerpo
+    """
+    accepted = [name for name in ("br", "gzip") if request.accept_encodings[name]]
+    body, encoding, etag = payload.variant(accepted)
+    response = Response(body, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    # El navegador revalida siempre; si no cambió recibe 304
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def save_catalog_snapshot(snapshot) -> None:
+    """Guarda en disco cada copia descargada, con su respuesta e índices"""
+    if catalog_file is None:
+        return
+    started = time.perf_counter()
+    size = catalog_file.save(
+        snapshot.products,
+        snapshot.fetched_at,
+        snapshot.version,
+        products_payload(snapshot),
+        catalog_index(snapshot),
+    )
+    if size:
+        print(
+            f"💾 Copia del catálogo guardada: {size / 1024:.0f} KB "
+            f"en {time.perf_counter() - started:.2f} s"
+        )
+
+
+def restore_catalog_snapshot() -> bool:
+    """
+    Publica la copia del disco con su respuesta ya comprimida; los índices
+    se leen en segundo plano (las consultas que los necesitan esperan). Si
+    la respuesta se guardó con otro PRODUCTS_FORMAT se arma de nuevo desde
+    los productos, con el formato actual
+    """
+    stored = catalog_file.load() if catalog_file is not None else None
+    if stored is None:
+        return False
+
+    snapshot = CatalogSnapshot(stored.products, stored.fetched_at, stored.version)
+    if stored.payload is not None:
+        snapshot.derived("products_payload", lambda s: stored.payload)
+    else:
+        print("🔁 Respuesta del catálogo en disco de otra versión: se rearma")
+        products_payload(snapshot)
+
+    def load_index(snapshot):
+        index = stored.load_indexes()
+        if not isinstance(index, CatalogIndex) or len(index.products) != len(
+            snapshot.products
+        ):
+            return CatalogIndex(formatted_products(snapshot), search_index(snapshot))
+        snapshot.derived("formatted", lambda s: index.products)
+        snapshot.derived("search", lambda s: index.search)
+        return index
+
+    if not catalog.restore(snapshot):
+        return False
+    threading.Thread(
+        target=snapshot.derived,
+        args=("index", load_index),
+        name="catalog-indexes",
+        daemon=True,
+    ).start()
+    return True
+
+
+# Catálogo en memoria: 5 minutos de vigencia; vencido se sigue sirviendo
+# mientras se actualiza en segundo plano. La respuesta de /api/products y
+# los índices se preparan con cada copia nueva, antes de publicarla, y la
+# copia se guarda en disco para el próximo inicio
+catalog = CatalogStore(
+    fetch_products_from_cloud_function,
+    ttl=300,
+    on_snapshot=prepare_snapshot,
+    persist=save_catalog_snapshot,
+)
+
+
+def get_products_from_cloud_function():
+    """Obtiene productos desde la Cloud Function con caché de 5 minutos"""
+    return catalog.products()
+
+
+# Subsistemas que necesita cada grupo de rutas
+_ROUTE_SUBSYSTEMS = (
+    ("/api/process-products", ("ai", "selenium")),
+    ("/api/selenium", ("selenium",)),
+    ("/api/metrics", ("ai",)),
+    ("/api/products", ("catalog",)),
+    ("/api/search", ("catalog",)),
+)
+
+
+@app.before_request
+def wait_for_startup():
+    """Las rutas que dependen de un subsistema esperan a que termine de iniciarse"""
+    for prefix, subsystems in _ROUTE_SUBSYSTEMS:
+        if request.path.startswith(prefix):
+            for name in subsystems:
+                wait_for_subsystem(name, SUBSYSTEM_WAIT_SECONDS)
+            return
+
+
+@app.after_request
+def record_first_page(response):
+    """Registra cuánto tardó en servirse la primera página desde el inicio"""
+    started = startup_state["started"]
+    if (
+        started is not None
+        and startup_state["first_page_seconds"] is None
+        and request.path == "/showcase"
+        and response.status_code == 200
+    ):
+        seconds = round(time.perf_counter() - started, 2)
+        with _startup_lock:
+            if startup_state["first_page_seconds"] is None:
+                startup_state["first_page_seconds"] = seconds
+                print(f"⏱️ Primera página servida a los {seconds} s del inicio")
+    return response
+
+
+@app.route("/api/ready")
+def ready():
+    """Estado de inicialización de IA, Selenium y catálogo (503 mientras inician)"""
+    with _startup_lock:
+        subsystems = {
+            name: dict(state) for name, state in startup_state["subsystems"].items()
+        }
+        ready_seconds = startup_state["ready_seconds"]
+        first_page_seconds = startup_state["first_page_seconds"]
+    listo = ready_seconds is not None
+    return (
+        jsonify(
+            {
+                "ready": listo,
+                "ready_seconds": ready_seconds,
+                "first_page_seconds": first_page_seconds,
+                "subsystems": subsystems,
+            }
+        ),
+        200 if listo else 503,
+    )
+
+
 @app.route("/")
 def index():
     """Página principal - redirige al showcase"""
@@ -127,16 +329,118 @@ def showcase():
 
 @app.route("/api/products")
 def get_products():
-    """Obtiene todos los productos de la Cloud Function"""
+    """
+    Obtiene los productos del catálogo. Sin parámetros devuelve el catálogo
+    completo; con filtros (familia, marca, q, precio_min/max, stock_min/max),
+    sort, page/per_page o cursor devuelve solo la página pedida
+    """
     try:
-        products = get_products_from_cloud_function()
-        formatted_products = [format_product(p) for p in products]
+        snapshot = catalog.snapshot()
+        if not any(name in request.args for name in QUERY_PARAMS):
+            return prepared_response(products_payload(snapshot))
 
+        try:
+            query = ProductQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        total, productos = catalog_index(snapshot).page(query)
+        version = snapshot.version if snapshot else 0
+        next_offset = query.offset + len(productos)
         return jsonify(
             {
                 "success": True,
-                "count": len(formatted_products),
-                "products": formatted_products,
+                "count": len(productos),
+                "total": total,
+                "page": query.page,
+                "per_page": query.per_page,
+                "pages": -(-total // query.per_page),
+                "next_cursor": (
+                    encode_cursor(version, next_offset) if next_offset < total else None
+                ),
+                # El cursor se armó sobre otra copia: la página puede repetir
+                # u omitir productos que cambiaron de lugar
+                "catalog_changed": query.cursor_version not in (None, version),
+                "products": productos,
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/products/facets")
+def get_products_facets():
+    """Cantidad de productos por familia y marca (acepta los filtros de /api/products)"""
+    try:
+        query = ProductQuery.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        index = catalog_index(catalog.snapshot())
+        return jsonify(
+            {
+                "success": True,
+                "total": len(index.products),
+                "facets": index.facets(query),
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/products/seo")
+def get_products_seo():
+    """Metadata SEO de todo el catálogo, por SKU"""
+    try:
+        seo = generate_seo_catalog(formatted_products(catalog.snapshot()))
+
+        return jsonify(
+            {
+                "success": True,
+                "count": seo["stats"]["products"],
+                "seconds": seo["stats"]["seconds"],
+                "seo": seo["seo"],
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/search")
+def search_products():
+    """
+    Búsqueda de texto en nombre, marca, modelo, familia y SKU, sin acentos,
+    con prefijos (autocompletar) y tolerancia a errores de tipeo, ordenada
+    por relevancia. Parámetros: q y limit (20 por defecto, hasta 100)
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"success": False, "error": "Falta el parámetro q"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit debe ser un entero"}), 400
+
+    try:
+        snapshot = catalog.snapshot()
+        started = time.perf_counter()
+        total, hits = search_index(snapshot).search(q, limit)
+        productos = formatted_products(snapshot)
+        return jsonify(
+            {
+                "success": True,
+                "query": q,
+                "total": total,
+                "count": len(hits),
+                "seconds": round(time.perf_counter() - started, 4),
+                "products": [
+                    {**productos[position], "score": round(score, 3)}
+                    for position, score in hits
+                ],
             }
         )
 
@@ -148,13 +452,7 @@ def get_products():
 def get_product_detail(sku):
     """Obtiene detalle de un producto específico"""
     try:
-        products = get_products_from_cloud_function()
-
-        product = None
-        for p in products:
-            if p.get("SKU") == sku or p.get("sku") == sku:
-                product = p
-                break
+        product = catalog.get_by_sku(sku)
 
         if not product:
             return jsonify({"error": "Producto no encontrado"}), 404
@@ -164,10 +462,19 @@ def get_product_detail(sku):
         # Generar descripción si hay IA
         if ai_handler and product:
             try:
-                formatted_product["descripcion_html"] = (
-                    ai_handler.generate_enhanced_description(product, AI_CONFIG)
+                resultado = (
+                    ai_handler.generar_descripcion_detallada_html_premium_con_ia(
+                        formatted_product, AI_CONFIG
+                    )
+                )
+                formatted_product["descripcion_html"] = resultado.get(
+                    "descripcion_html"
+                )
+                # Plantilla usada porque la IA no respondió
+                formatted_product["respaldo"] = bool(resultado.get("respaldo"))
+                formatted_product["seo"] = ai_handler.generate_seo_metadata(
+                    formatted_product
                 )
-                formatted_product["seo"] = ai_handler.generate_seo_metadata(product)
             except Exception as e:
                 print(f"Error generando descripción: {e}")
 
@@ -177,6 +484,41 @@ def get_product_detail(sku):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/catalog/status")
+def catalog_status():
+    """Estado del catálogo en memoria y de su copia en disco"""
+    return jsonify(
+        {
+            "success": True,
+            "catalog": catalog.stats(),
+            "disk": catalog_file.stats() if catalog_file is not None else None,
+        }
+    )
+
+
+@app.route("/api/metrics")
+def get_metrics():
+    """Métricas de la IA: latencias, tokens, costo, reintentos y cachés"""
+    if not ai_handler:
+        return jsonify({"success": False, "error": "IA no disponible"}), 500
+
+    try:
+        return jsonify(
+            {
+                "success": True,
+                "metrics": ai_handler.get_metrics(),
+                "resilience": ai_handler.get_resilience_stats(),
+                "provider": ai_handler.get_provider_stats(),
+                "prompts": ai_handler.get_prompt_stats(),
+                "json_repair": ai_handler.get_json_repair_stats(),
+                "html": ai_handler.get_html_stats(),
+                "cache": ai_handler.get_cache_stats(),
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route("/api/selenium/start", methods=["POST"])
 def start_selenium():
     """Inicia el navegador Chrome"""
@@ -253,11 +595,38 @@ def process_products():
         if not selenium_handler.is_logged_in:
             return jsonify({"error": "Debes iniciar sesión en Stelorder primero"}), 400
 
+        # Precarga de fichas técnicas mientras el navegador navega
+        def prefetch_pdf(product):
+            pdf_url = get_product_pdf_url(product)
+            if not pdf_url:
+                return None
+            return ai_handler.extract_pdf_content(normalize_pdf_url(pdf_url))
+
+        def prefetch_key(product):
+            return normalize_pdf_url(get_product_pdf_url(product)) or None
+
         # Función para generar descripciones
-        def generate_description(product):
-            return ai_handler.generate_enhanced_description(product, AI_CONFIG)
+        def generate_description(product, contenido_pdf=None):
+            resultado = ai_handler.generar_descripcion_detallada_html_premium_con_ia(
+                product, AI_CONFIG, contenido_pdf=contenido_pdf
+            )
+            return {
+                "descripcion": resultado.get("descripcion"),
+                "descripcion_detallada": resultado.get("descripcion_html"),
+                "seo": {
+                    "title": resultado.get("seo_titulo"),
+                    "description": resultado.get("seo_descripcion"),
+                },
+                # Plantilla usada porque la IA no respondió: no se publica
+                "respaldo": bool(resultado.get("respaldo")),
+            }
 
-        selenium_handler.process_products(products, generate_description)
+        selenium_handler.process_products(
+            products,
+            generate_description,
+            prefetch_callback=prefetch_pdf,
+            prefetch_key_callback=prefetch_key,
+        )
 
         return jsonify(
             {
@@ -271,41 +640,171 @@ def process_products():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-def initialize_app():
-    """Inicializa la aplicación"""
-    global ai_handler, selenium_handler
+def _init_ai() -> str:
+    global ai_handler
 
-    print("🚀 Inicializando STEL Shop Manager Mejorado...")
+    try:
+        from ai_handler_enhanced import EnhancedAIHandler
+        from pdf_extraction import PdfParserPool
 
-    # Inicializar IA
-    if EnhancedAIHandler:
-        try:
-            ai_handler = EnhancedAIHandler(AI_CONFIG["api_key"])
-            print("✅ IA inicializada correctamente")
-        except Exception as e:
-            print(f"⚠️ Error inicializando IA: {e}")
+        print("✅ Módulo AI cargado correctamente")
+    except ImportError as e:
+        print(f"⚠️  No se pudo cargar el módulo AI: {e}")
+        return "unavailable"
 
-    # Inicializar Selenium
-    if SeleniumHandler:
-        try:
-            selenium_handler = SeleniumHandler()
-            print("✅ Selenium inicializado correctamente")
-        except Exception as e:
-            print(f"⚠️ Error inicializando Selenium: {e}")
+    try:
+        ai_handler = EnhancedAIHandler(
+            AI_CONFIG["api_key"],
+            pdf_parser=PdfParserPool(AI_CONFIG.get("pdf_parser")),
+        )
+        print("✅ IA inicializada correctamente")
+        return "ready"
+    except Exception as e:
+        print(f"⚠️ Error inicializando IA: {e}")
+        return "error"
+
+
+def _init_selenium() -> str:
+    global selenium_handler
+
+    try:
+        from navigation.selenium_handler import SeleniumHandler
+
+        print("✅ Módulo Selenium cargado correctamente")
+    except ImportError as e:
+        print(f"⚠️  No se pudo cargar el módulo Selenium: {e}")
+        return "unavailable"
+
+    try:
+        selenium_handler = SeleniumHandler()
+        print("✅ Selenium inicializado correctamente")
+        return "ready"
+    except Exception as e:
+        print(f"⚠️ Error inicializando Selenium: {e}")
+        return "error"
+
+
+def _init_catalog() -> str:
+    global catalog_file
+
+    # Con una copia en disco se atiende enseguida y se revalida en segundo plano
+    started = time.perf_counter()
+    try:
+        catalog_file = CatalogSnapshotFile(
+            CATALOG_SNAPSHOT_PATH, payload_format=PRODUCTS_FORMAT
+        )
+        if restore_catalog_snapshot():
+            stats = catalog.stats()
+            print(
+                f"📦 Catálogo cargado del disco: {stats['products']} productos "
+                f"de hace {stats['age_seconds']:.0f} s, en "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms; "
+                "revalidando con la Cloud Function..."
+            )
+            catalog.refresh(wait=False)
+            return "ready"
+    except Exception as e:
+        print(f"⚠️ No se pudo leer la copia del catálogo en disco: {e}")
 
     # Verificar conexión a Cloud Function
     print("🔍 Verificando conexión a Cloud Function...")
     products = get_products_from_cloud_function()
     if products:
         print(f"✅ Cloud Function conectada - {len(products)} productos disponibles")
-    else:
-        print("⚠️ No se pudieron obtener productos de Cloud Function")
+        return "ready"
+    print("⚠️ No se pudieron obtener productos de Cloud Function")
+    return "error"
 
 
-if __name__ == "__main__":
-    initialize_app()
+# Subsistemas que se inicializan en paralelo: nombre -> función de inicio
+STARTUP_SUBSYSTEMS = {
+    "ai": _init_ai,
+    "selenium": _init_selenium,
+    "catalog": _init_catalog,
+}
+
+
+def _run_subsystem(name: str) -> None:
+    """Inicializa un subsistema y registra su estado y duración"""
+    started = time.perf_counter()
+    try:
+        state = STARTUP_SUBSYSTEMS[name]()
+        error = None
+    except Exception as e:
+        state, error = "error", str(e)
+        print(f"⚠️ Error inicializando {name}: {e}")
+
+    with _startup_lock:
+        startup_state["subsystems"][name] = {
+            "state": state,
+            "seconds": round(time.perf_counter() - started, 2),
+            "error": error,
+        }
+        pendientes = [
+            nombre
+            for nombre, estado in startup_state["subsystems"].items()
+            if estado["state"] == "pending"
+        ]
+        if not pendientes and startup_state["ready_seconds"] is None:
+            startup_state["ready_seconds"] = round(
+                time.perf_counter() - startup_state["started"], 2
+            )
+            detalle = ", ".join(
+                f"{nombre} {estado['seconds']} s"
+                for nombre, estado in startup_state["subsystems"].items()
+            )
+            print(f"✅ Sistema listo en {startup_state['ready_seconds']} s ({detalle})")
+    _subsystem_events[name].set()
+
+
+def wait_for_subsystem(name: str, timeout: float = None) -> bool:
+    """Espera a que termine de iniciarse un subsistema (True si terminó)"""
+    event = _subsystem_events.get(name)
+    return event is None or event.wait(timeout)
+
+
+def initialize_app(background: bool = False, started: float = None):
+    """
+    Inicializa IA, Selenium y catálogo en paralelo. Con background=True
+    retorna enseguida para que el servidor atienda mientras tanto (el
+    estado se consulta en /api/ready). started es el perf_counter() del
+    inicio del proceso, para medir el tiempo hasta la primera página.
+    """
+    print("🚀 Inicializando STEL Shop Manager Mejorado...")
+
+    with _startup_lock:
+        startup_state["started"] = started or time.perf_counter()
+        startup_state["ready_seconds"] = None
+        for name in STARTUP_SUBSYSTEMS:
+            startup_state["subsystems"][name] = {"state": "pending"}
+            _subsystem_events[name] = threading.Event()
 
-    print("\n🌐 Servidor iniciando en http://127.0.0.1:5000")
-    print("🎨 Showcase de productos en http://127.0.0.1:5000/showcase")
+    threads = [
+        threading.Thread(
+            target=_run_subsystem, args=(name,), name=f"init-{name}", daemon=True
+        )
+        for name in STARTUP_SUBSYSTEMS
+    ]
+    for thread in threads:
+        thread.start()
+    if not background:
+        for thread in threads:
+            thread.join()
+
+
+def run_server(started: float = None, host: str = "127.0.0.1", port: int = 5000):
+    """
+    Inicia IA, Selenium y catálogo en segundo plano y atiende enseguida:
+    las rutas esperan al subsistema que necesitan y /api/ready informa
+    cuándo terminó todo. Bloquea hasta que se detiene el servidor.
+    """
+    initialize_app(background=True, started=started)
 
-    app.run(debug=False, port=5000, host="127.0.0.1")
+    print(f"\n🌐 Servidor iniciando en http://{host}:{port}")
+    print(f"🎨 Showcase de productos en http://{host}:{port}/showcase")
+
+    app.run(debug=False, port=port, host=host)
+
+
+if __name__ == "__main__":
+    run_server(started=STARTED)
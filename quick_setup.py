@@ -80,7 +80,11 @@ def copy_files():
         },
         "ai": {
             "api_key": "",
-            "provider": "gemini"
+            "provider": "gemini",
+            "models": {
+                "html": ["gemini-1.5-flash", "gemini-1.5-pro"],
+                "seo": ["gemini-1.5-flash"]
+            }
         },
         "contact": {
             "whatsapp": "541139563099",
@@ -0,0 +1,137 @@
+"""
+Limitador de tasa para las llamadas a la IA de STEL Shop
+Token bucket por solicitudes y por tokens por minuto, con reducción
+adaptativa de la tasa ante errores de cuota (429)
+"""
+
+import asyncio
+import random
+import time
+from typing import Dict, Any, Optional
+
+
+class TokenBucket:
+    """Balde de tokens que se recarga a una tasa fija por minuto"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity or rate_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(
+            self.capacity, self.tokens + elapsed * self.rate_per_minute / 60.0
+        )
+
+    def time_until(self, amount: float) -> float:
+        """Segundos que faltan para disponer de amount tokens"""
+        self._refill()
+        # Una solicitud más grande que el balde se permite con el balde lleno
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.rate_per_minute
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AsyncRateLimiter:
+    """
+    Limita solicitudes por minuto (RPM) y tokens por minuto (TPM).
+    Ante un error de cuota reduce la tasa a la mitad y pausa; con cada
+    éxito la recupera gradualmente hasta el máximo configurado.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 1_000_000,
+        min_fraction: float = 0.1,
+        recovery_step: float = 0.05,
+    ):
+        self.max_rpm = float(requests_per_minute)
+        self.max_tpm = float(tokens_per_minute)
+        self.min_fraction = min_fraction
+        self.recovery_step = recovery_step
+        self.fraction = 1.0
+
+        self.requests = TokenBucket(self.max_rpm)
+        self.tokens = TokenBucket(self.max_tpm)
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+
+        self.stats_counters = {
+            "acquired": 0,
+            "waited_seconds": 0.0,
+            "throttled": 0,
+            "tokens_reserved": 0,
+        }
+
+    def _apply_fraction(self) -> None:
+        self.requests.rate_per_minute = self.max_rpm * self.fraction
+        self.tokens.rate_per_minute = self.max_tpm * self.fraction
+
+    async def acquire(self, estimated_tokens: int = 0) -> None:
+        """Espera hasta poder enviar una solicitud de estimated_tokens"""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.time_until(1),
+                    self.tokens.time_until(estimated_tokens),
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+            self.stats_counters["acquired"] += 1
+            self.stats_counters["tokens_reserved"] += estimated_tokens
+            self.stats_counters["waited_seconds"] += time.monotonic() - started
+
+    def on_success(self) -> None:
+        """Recupera gradualmente la tasa después de un éxito"""
+        if self.fraction < 1.0:
+            self.fraction = min(1.0, self.fraction + self.recovery_step)
+            self._apply_fraction()
+
+    def on_throttle(self, attempt: int = 0, base_delay: float = 2.0) -> float:
+        """
+        Registra un error de cuota: reduce la tasa a la mitad y pausa todas
+        las solicitudes con backoff exponencial. Retorna la pausa aplicada.
+        """
+        self.stats_counters["throttled"] += 1
+        self.fraction = max(self.min_fraction, self.fraction / 2)
+        self._apply_fraction()
+
+        # Vaciar los baldes para que la tasa reducida se note de inmediato
+        self.requests.tokens = 0
+        self.tokens.tokens = 0
+
+        delay = base_delay * (2**attempt) * (1 + random.random() * 0.25)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats_counters,
+            "waited_seconds": round(self.stats_counters["waited_seconds"], 2),
+            "current_rpm": round(self.requests.rate_per_minute, 1),
+            "current_tpm": round(self.tokens.rate_per_minute),
+        }
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Detecta errores de cuota / límite de tasa del proveedor (429)"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
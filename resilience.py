@@ -0,0 +1,377 @@
+"""
+Capa de resiliencia para las llamadas a la IA de STEL Shop
+Plazo máximo por llamada, reintentos con backoff exponencial y jitter,
+solicitudes duplicadas (hedging) cuando una llamada supera el p95 de
+latencia y un circuit breaker que corta las llamadas mientras el proveedor
+no responde
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Optional
+
+from rate_limiter import is_quota_error
+
+# Nombres de excepciones transitorias (google.api_core, requests, etc.)
+_TRANSIENT_ERRORS = {
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "ConnectionError",
+    "Timeout",
+    "ReadTimeout",
+}
+
+
+class DeadlineExceededError(TimeoutError):
+    """La llamada superó su plazo máximo"""
+
+
+class CircuitOpenError(RuntimeError):
+    """El circuit breaker está abierto: no se llama al proveedor"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Errores transitorios que vale la pena reintentar"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _TRANSIENT_ERRORS:
+        return True
+    message = str(error).lower()
+    return is_quota_error(error) or "503" in message or "unavailable" in message
+
+
+def is_provider_unavailable(error: Exception) -> bool:
+    """
+    El proveedor no responde por ahora (error transitorio o circuito
+    abierto). Credenciales inválidas o un modelo inexistente no lo son.
+    """
+    return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+
+class CircuitBreaker:
+    """
+    Cerrado: deja pasar. Tras failure_threshold fallos seguidos se abre y
+    rechaza durante reset_timeout segundos; luego deja pasar una prueba
+    (semiabierto) que lo cierra si sale bien o lo vuelve a abrir.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            # Semiabierto: una sola llamada de prueba a la vez
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Termina una llamada sin contarla (por ejemplo un 429 de cuota)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(
+                        f"🔌 Circuit breaker abierto por {self.reset_timeout:g}s "
+                        f"({self.failures} fallos seguidos)"
+                    )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+            }
+
+
+class LatencyWindow:
+    """Últimas latencias exitosas para calcular percentiles"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+
+class ResilientCaller:
+    """
+    Ejecuta llamadas al modelo con plazo, reintentos, hedging y circuit
+    breaker. En modo sincrónico cada intento corre en un hilo del pool: si
+    vence el plazo se abandona (el hilo termina solo) y se sigue adelante.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 90.0,
+        max_retries: int = 2,
+        base_delay: float = 1.0,
+        max_delay: float = 20.0,
+        hedge: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        min_hedge_delay: float = 0.0,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32,
+    ):
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ia"
+        )
+        self._lock = threading.Lock()
+        self.stats_counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Espera antes de duplicar la solicitud (p95 reciente) o None"""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        delay = max(
+            self.min_hedge_delay, self.latencies.percentile(self.hedge_percentile)
+        )
+        return delay if delay < self.deadline else None
+
+    def backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter (entre 50% y 150% del valor base)"""
+        delay = min(self.max_delay, self.base_delay * (2**attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _check_circuit(self) -> None:
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError("Proveedor de IA no disponible (circuito abierto)")
+
+    def _should_retry(
+        self, error: Exception, attempt: int, retry_on: Optional[Callable]
+    ) -> bool:
+        # La cuota la maneja el limitador de tasa: no abre el circuito
+        if is_quota_error(error):
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+        if isinstance(error, DeadlineExceededError):
+            self._count("timeouts")
+        if (
+            retry_on is not None
+            and attempt < self.max_retries
+            and retry_on(error)
+            and self.breaker.allow()
+        ):
+            self._count("retries")
+            return True
+        self._count("failures")
+        return False
+
+    def _record_success(self, started: float) -> None:
+        self.latencies.add(time.monotonic() - started)
+        self.breaker.record_success()
+        self._count("successes")
+
+    def call(
+        self,
+        function: Callable,
+        *args,
+        retry_on: Optional[Callable] = is_retryable,
+        **kwargs,
+    ) -> Any:
+        """
+        Llamada sincrónica protegida. retry_on decide qué errores se
+        reintentan (None: ninguno)
+        """
+        self._check_circuit()
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = self._attempt(function, args, kwargs)
+            except Exception as e:
+                if not self._should_retry(e, attempt, retry_on):
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            self._record_success(started)
+            return result
+
+    def _attempt(self, function: Callable, args, kwargs) -> Any:
+        deadline = time.monotonic() + self.deadline
+        futures = [self._executor.submit(function, *args, **kwargs)]
+
+        hedge_after = self.hedge_delay()
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                self._count("hedges")
+                futures.append(self._executor.submit(function, *args, **kwargs))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = error or future.exception()
+
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceededError(f"Sin respuesta de la IA en {self.deadline:g}s")
+
+    async def acall(
+        self, factory: Callable, retry_on: Optional[Callable] = is_retryable
+    ) -> Any:
+        """Llamada asíncrona protegida. factory() crea la corrutina"""
+        self._check_circuit()
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = await self._aattempt(factory)
+            except Exception as e:
+                if not self._should_retry(e, attempt, retry_on):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            self._record_success(started)
+            return result
+
+    async def _aattempt(self, factory: Callable) -> Any:
+        deadline = time.monotonic() + self.deadline
+        first = asyncio.ensure_future(factory())
+        tasks = [first]
+
+        try:
+            hedge_after = self.hedge_delay()
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self._count("hedges")
+                    tasks.append(asyncio.ensure_future(factory()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = error or task.exception()
+
+            if error is not None and not pending:
+                raise error
+            raise DeadlineExceededError(f"Sin respuesta de la IA en {self.deadline:g}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.stats_counters)
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            **counters,
+            "breaker": self.breaker.stats(),
+            "latency_ms": {
+                "p50": ms(self.latencies.percentile(0.5)),
+                "p95": ms(self.latencies.percentile(0.95)),
+                "p99": ms(self.latencies.percentile(0.99)),
+            },
+            "hedge_after_ms": ms(self.hedge_delay()),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
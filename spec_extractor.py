@@ -0,0 +1,280 @@
+"""
+Extractor de especificaciones técnicas para fichas PDF de STEL Shop
+Recorre el texto una sola vez con un patrón precompilado y devuelve
+valores tipados y normalizados (kVA, kW, HP, V, Hz, L/h, kg, mm) con su
+nivel de confianza
+"""
+
+import re
+from typing import Dict, Any, Optional, Tuple
+
+# Palabras clave -> campo al que hacen referencia
+_KEYWORDS = {
+    "potencia": "potencia",
+    "power": "potencia",
+    "prime": "potencia",
+    "standby": "potencia",
+    "stand-by": "potencia",
+    "tension": "voltaje",
+    "tensión": "voltaje",
+    "voltaje": "voltaje",
+    "voltage": "voltaje",
+    "frecuencia": "frecuencia",
+    "frequency": "frecuencia",
+    "consumo": "consumo",
+    "consumption": "consumo",
+    "peso": "peso",
+    "weight": "peso",
+    "dimensiones": "dimensiones",
+    "dimensions": "dimensiones",
+    "medidas": "dimensiones",
+    "motor": "motor",
+    "engine": "motor",
+}
+
+# Unidad -> (campo, unidad normalizada, factor de conversión)
+_UNITS = {
+    "kva": ("potencia_kva", "kVA", 1.0),
+    "kw": ("potencia_kw", "kW", 1.0),
+    # HP y CV son del motor, no la potencia eléctrica del generador
+    "hp": ("potencia_motor_hp", "HP", 1.0),
+    "cv": ("potencia_motor_hp", "HP", 0.9863),
+    "v": ("voltaje_v", "V", 1.0),
+    "vac": ("voltaje_v", "V", 1.0),
+    "kv": ("voltaje_v", "V", 1000.0),
+    "hz": ("frecuencia_hz", "Hz", 1.0),
+    "l/h": ("consumo_lh", "L/h", 1.0),
+    "lt/h": ("consumo_lh", "L/h", 1.0),
+    "lts/h": ("consumo_lh", "L/h", 1.0),
+    "l/hr": ("consumo_lh", "L/h", 1.0),
+    "lph": ("consumo_lh", "L/h", 1.0),
+    "gal/h": ("consumo_lh", "L/h", 3.7854),
+    "kg": ("peso_kg", "kg", 1.0),
+    "kgs": ("peso_kg", "kg", 1.0),
+    "kilos": ("peso_kg", "kg", 1.0),
+    "lb": ("peso_kg", "kg", 0.4536),
+    "lbs": ("peso_kg", "kg", 0.4536),
+}
+
+# Campo tipado -> campo de la palabra clave que lo respalda
+_FIELD_KEYWORD = {
+    "potencia_kva": "potencia",
+    "potencia_kw": "potencia",
+    "potencia_motor_hp": "motor",
+    "voltaje_v": "voltaje",
+    "frecuencia_hz": "frecuencia",
+    "consumo_lh": "consumo",
+    "peso_kg": "peso",
+    "dimensiones_mm": "dimensiones",
+}
+
+_DIM_FACTORS = {"mm": 1.0, "cm": 10.0, "m": 1000.0, "": 1.0}
+
+_NUMBER = r"\d+(?:[.,]\d+)*"
+
+# Un único patrón: palabras clave, dimensiones o número con unidad
+_TOKEN_RE = re.compile(
+    r"(?P<kw>\b(?:"
+    + "|".join(sorted((re.escape(k) for k in _KEYWORDS), key=len, reverse=True))
+    + r")\b)"
+    + r"|(?P<dims>(?P<d1>"
+    + _NUMBER
+    + r")\s*[x×*]\s*(?P<d2>"
+    + _NUMBER
+    + r")\s*[x×*]\s*(?P<d3>"
+    + _NUMBER
+    + r")(?:\s*(?P<dunit>mm|cm|m)\b)?)"
+    + r"|(?P<num>"
+    + _NUMBER
+    + r"(?:\s*/\s*"
+    + _NUMBER
+    + r")*)\s*(?P<unit>"
+    + "|".join(sorted((re.escape(u) for u in _UNITS), key=len, reverse=True))
+    + r")(?![a-z0-9])",
+    re.IGNORECASE,
+)
+
+# Distancia máxima (en caracteres) entre una palabra clave y su valor
+_KEYWORD_WINDOW = 80
+
+_MOTOR_VALUE_RE = re.compile(r"[\s:.\-]*([A-Za-z][A-Za-z0-9 .\-/]{1,40})")
+
+
+def parse_number(raw: str) -> Optional[float]:
+    """Convierte números con separadores de miles o coma decimal"""
+    raw = raw.strip()
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", raw):
+        raw = raw.replace(".", "")
+    elif re.fullmatch(r"\d{1,3}(?:,\d{3})+", raw):
+        raw = raw.replace(",", "")
+    else:
+        raw = raw.replace(",", ".")
+        if raw.count(".") > 1:
+            return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+class SpecValue:
+    """Valor de especificación con unidad normalizada y confianza (0-1)"""
+
+    __slots__ = ("value", "unit", "confidence", "raw")
+
+    def __init__(self, value, unit: str, confidence: float, raw: str):
+        self.value = value
+        self.unit = unit
+        self.confidence = confidence
+        self.raw = raw
+
+    def as_text(self) -> str:
+        """Valor sin unidad, con el formato que usan los prompts"""
+        if isinstance(self.value, tuple):
+            return "x".join(_format_number(v) for v in self.value)
+        if isinstance(self.value, float):
+            return _format_number(self.value)
+        return str(self.value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        value = list(self.value) if isinstance(self.value, tuple) else self.value
+        return {
+            "value": value,
+            "unit": self.unit,
+            "confidence": round(self.confidence, 2),
+            "raw": self.raw,
+        }
+
+    def __repr__(self):
+        return f"SpecValue({self.value!r}, {self.unit!r}, {self.confidence:.2f})"
+
+
+def _format_number(value: float) -> str:
+    value = round(value, 2)
+    return str(int(value)) if value == int(value) else str(value)
+
+
+def _confidence(field: str, keyword: Optional[Tuple[str, int]], position: int) -> float:
+    """La unidad sola da confianza media; una palabra clave cercana la sube"""
+    if keyword is None or position - keyword[1] > _KEYWORD_WINDOW:
+        return 0.6
+    if keyword[0] == _FIELD_KEYWORD.get(field):
+        return 0.95
+    return 0.45
+
+
+class SpecExtractor:
+    """Extractor de especificaciones de una sola pasada"""
+
+    def extract(self, text: str) -> Dict[str, SpecValue]:
+        """Devuelve el mejor valor encontrado para cada campo"""
+        best: Dict[str, SpecValue] = {}
+        keyword = None  # (campo, posición) de la última palabra clave
+
+        def offer(field, spec):
+            current = best.get(field)
+            if current is None or spec.confidence > current.confidence:
+                best[field] = spec
+
+        for match in _TOKEN_RE.finditer(text):
+            start = match.start()
+
+            if match.group("kw"):
+                field = _KEYWORDS[match.group("kw").lower()]
+                keyword = (field, match.end())
+                if field == "motor" and "motor" not in best:
+                    motor = self._motor_after(text, match.end())
+                    if motor:
+                        best["motor"] = SpecValue(motor, "", 0.7, motor)
+
+            elif match.group("dims"):
+                factor = _DIM_FACTORS[(match.group("dunit") or "").lower()]
+                values = [parse_number(match.group(g)) for g in ("d1", "d2", "d3")]
+                if None in values:
+                    continue
+                confidence = _confidence("dimensiones_mm", keyword, start)
+                if not match.group("dunit"):
+                    confidence -= 0.15
+                offer(
+                    "dimensiones_mm",
+                    SpecValue(
+                        tuple(v * factor for v in values),
+                        "mm",
+                        confidence,
+                        match.group(0),
+                    ),
+                )
+
+            else:
+                field, unit, factor = _UNITS[match.group("unit").lower()]
+                # En "380/220 V" se toma el primer valor (nominal)
+                value = parse_number(match.group("num").split("/")[0])
+                if value is None:
+                    continue
+                offer(
+                    field,
+                    SpecValue(
+                        value * factor,
+                        unit,
+                        _confidence(field, keyword, start),
+                        match.group(0),
+                    ),
+                )
+
+        return best
+
+    def _motor_after(self, text: str, position: int) -> str:
+        """Toma el texto que sigue a 'motor' en la misma línea"""
+        end = text.find("\n", position)
+        line = text[position : end if end != -1 else position + 60]
+        match = _MOTOR_VALUE_RE.match(line)
+        if not match:
+            return ""
+        value = match.group(1).strip(" .-/")
+        # Descartar valores que son en realidad números con unidad
+        if _TOKEN_RE.match(value) or len(value) < 2:
+            return ""
+        return value
+
+    def extract_legacy(self, text: str) -> Dict[str, str]:
+        """Formato histórico de _extract_specifications (valores como texto)"""
+        return to_legacy(self.extract(text))
+
+
+def to_legacy(specs: Dict[str, SpecValue]) -> Dict[str, str]:
+    """
+    Convierte valores tipados a las claves usadas por los prompts. kVA y kW
+    quedan en claves separadas para no perder la unidad.
+    """
+    legacy = {}
+    for field, key in (
+        ("potencia_kva", "potencia_kva"),
+        ("potencia_kw", "potencia_kw"),
+        ("voltaje_v", "voltaje"),
+        ("frecuencia_hz", "frecuencia"),
+        ("motor", "motor"),
+        ("consumo_lh", "consumo"),
+        ("dimensiones_mm", "dimensiones"),
+        ("peso_kg", "peso"),
+    ):
+        if field in specs:
+            legacy[key] = specs[field].as_text()
+    return legacy
+
+
+def specs_to_dict(specs: Dict[str, SpecValue]) -> Dict[str, Dict[str, Any]]:
+    """Versión serializable (JSON) de los valores tipados"""
+    return {field: spec.to_dict() for field, spec in specs.items()}
+
+
+def spec_token_count(text: str) -> int:
+    """Cantidad de palabras clave, dimensiones y números con unidad del texto"""
+    return sum(1 for _ in _TOKEN_RE.finditer(text))
+
+
+_default_extractor = SpecExtractor()
+
+
+def extract_specifications(text: str) -> Dict[str, SpecValue]:
+    """Atajo con el extractor compartido"""
+    return _default_extractor.extract(text)
@@ -3,18 +3,48 @@ Archivo principal que inicia todo automáticamente
 Ejecutar este archivo para lanzar el sistema completo
 """
 
+import json
+import urllib.request
 import webbrowser
 import time
 import os
 import sys
 import threading
 
+# Momento de inicio del proceso, para medir el tiempo hasta la primera página
+STARTED = time.perf_counter()
+
+SERVER_URL = "http://127.0.0.1:5000"
+READY_URL = f"{SERVER_URL}/api/ready"
+READY_TIMEOUT = 60
+
+
+def wait_until_ready(timeout: float = READY_TIMEOUT) -> dict:
+    """Consulta /api/ready hasta que el sistema esté listo (o venza el plazo)"""
+    limite = time.monotonic() + timeout
+    estado = {}
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(READY_URL, timeout=2) as response:
+                estado = json.load(response)
+            if estado.get("ready"):
+                return estado
+        except (OSError, ValueError):
+            # Servidor todavía sin escuchar o 503 mientras inicializa
+            pass
+        time.sleep(0.1)
+    return estado
+
 
 def open_browser():
-    """Abre el navegador después de un delay"""
-    time.sleep(3)
-    print("🌐 Abriendo navegador...")
-    webbrowser.open("http://127.0.0.1:5000")
+    """Abre el navegador cuando el servidor informa que está listo"""
+    estado = wait_until_ready()
+    if not estado.get("ready"):
+        print(f"⚠️ El sistema no terminó de iniciarse en {READY_TIMEOUT} s")
+    print(
+        f"🌐 Abriendo navegador ({time.perf_counter() - STARTED:.2f} s desde el inicio)..."
+    )
+    webbrowser.open(SERVER_URL)
 
 
 def main():
@@ -35,13 +65,11 @@ def main():
     try:
         import quick_integration
 
-        quick_integration.initialize_app()
-
-        print("\n✅ Sistema iniciado!")
         print("📋 Presiona Ctrl+C para detener\n")
 
-        # Ejecutar Flask directamente (esto bloqueará hasta Ctrl+C)
-        quick_integration.app.run(debug=False, port=5000, host="127.0.0.1")
+        # IA, Selenium y catálogo se inicializan en segundo plano; el navegador
+        # se abre cuando /api/ready lo informa. Bloquea hasta Ctrl+C
+        quick_integration.run_server(started=STARTED)
 
     except KeyboardInterrupt:
         print("\n🛑 Servidor detenido")
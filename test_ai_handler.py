@@ -0,0 +1,84 @@
+"""
+Pruebas de la generación premium de EnhancedAIHandler con el proveedor local
+"""
+
+import json
+
+from providers import LocalProvider
+
+
+def productos(cantidad):
+    return [
+        {
+            "sku": f"GE-{i}",
+            "nombre": f"Generador {i}",
+            "marca": "Cummins",
+            "potencia_kva": "100",
+        }
+        for i in range(cantidad)
+    ]
+
+
+class SinUltimoSku(LocalProvider):
+    """Responde los prompts agrupados omitiendo el último producto"""
+
+    def respond(self, prompt, prefix=None):
+        texto = super().respond(prompt, prefix)
+        if "=== PRODUCTO SKU" in prompt:
+            return json.dumps(json.loads(texto)[:-1])
+        return texto
+
+
+def test_grouped_generation_packs_products_per_call(make_handler):
+    provider = LocalProvider()
+    handler = make_handler(provider)
+
+    salida = handler.generar_descripciones_agrupadas(productos(6), {})
+
+    assert sorted(salida["resultados"]) == [f"GE-{i}" for i in range(6)]
+    assert salida["errores"] == {}
+    # max_output_tokens 8192 / 3000 por producto: dos productos por llamada
+    assert salida["stats"]["round_trips"] == 3
+    assert salida["stats"]["batched_products"] == 6
+    assert provider.stats()["calls"] == 3
+
+
+def test_grouped_generation_respects_token_budget(make_handler):
+    handler = make_handler()
+    pendientes = [
+        handler._preparar_producto_premium(product, {}) for product in productos(4)
+    ]
+    instrucciones = handler._estimar_tokens(
+        handler._instrucciones_premium(pdf_url="x", **pendientes[0]["contacto"])
+    )
+
+    # Presupuesto que no alcanza para dos productos: grupos de uno
+    grupos = handler._agrupar_por_presupuesto(
+        pendientes, instrucciones + 10, 100, 100000
+    )
+    assert [len(grupo) for grupo in grupos] == [1, 1, 1, 1]
+
+    grupos = handler._agrupar_por_presupuesto(pendientes, 100000, 100, 100000)
+    assert [len(grupo) for grupo in grupos] == [4]
+
+
+def test_grouped_generation_retries_missing_items_individually(make_handler):
+    provider = SinUltimoSku()
+    handler = make_handler(provider)
+
+    salida = handler.generar_descripciones_agrupadas(productos(4), {})
+
+    assert sorted(salida["resultados"]) == [f"GE-{i}" for i in range(4)]
+    assert salida["stats"]["retried_individually"] == 2
+    assert salida["stats"]["batched_products"] == 2
+
+
+def test_grouped_generation_uses_the_cache(make_handler):
+    provider = LocalProvider()
+    handler = make_handler(provider)
+    handler.generar_descripciones_agrupadas(productos(4), {})
+    calls = provider.stats()["calls"]
+
+    salida = handler.generar_descripciones_agrupadas(productos(4), {})
+    assert salida["stats"]["cache_hits"] == 4
+    assert provider.stats()["calls"] == calls
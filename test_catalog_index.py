@@ -0,0 +1,207 @@
+"""
+Pruebas de los índices de filtros, orden, paginación y facetas del catálogo
+(catalog_index.py)
+"""
+
+import random
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from catalog_index import (
+    CatalogIndex,
+    ProductQuery,
+    decode_cursor,
+    encode_cursor,
+    to_number,
+)
+
+FAMILIAS = ["Generadores", "Motobombas", "Compresores", ""]
+MARCAS = ["Cummins", "Honda", "Perkins", "Kohler", ""]
+
+
+def catalogo(cantidad=300, seed=0):
+    azar = random.Random(seed)
+    return [
+        {
+            "sku": f"SKU-{i:04d}",
+            "nombre": f"Producto {azar.randint(0, 50)}",
+            "marca": azar.choice(MARCAS),
+            "familia": azar.choice(FAMILIAS),
+            "modelo": azar.choice(["", "A1", "B2", "c3"]),
+            "precio": azar.choice([0, "", None, azar.randint(1, 5000), "USD 1.500"]),
+            "stock": azar.choice([None, azar.randint(0, 20)]),
+        }
+        for i in range(cantidad)
+    ]
+
+
+def consulta(**args):
+    return ProductQuery.from_args(MultiDict(args))
+
+
+def referencia(productos, query):
+    """Resultado esperado por fuerza bruta (sin q)"""
+    elegidos = []
+    for i, producto in enumerate(productos):
+        if query.familias and producto["familia"] not in query.familias:
+            continue
+        if query.marcas and producto["marca"] not in query.marcas:
+            continue
+        fuera = False
+        for clave in ("precio", "stock"):
+            valor = to_number(producto[clave])
+            low = getattr(query, f"{clave}_min")
+            high = getattr(query, f"{clave}_max")
+            if (low is not None or high is not None) and (
+                valor is None
+                or (low is not None and valor < low)
+                or (high is not None and valor > high)
+            ):
+                fuera = True
+        if not fuera:
+            elegidos.append(i)
+
+    if query.sort:
+
+        def valor(i):
+            if query.sort in ("precio", "stock"):
+                return to_number(productos[i][query.sort])
+            return str(productos[i][query.sort] or "").casefold() or None
+
+        presentes = [i for i in elegidos if valor(i) is not None]
+        faltantes = [i for i in elegidos if valor(i) is None]
+        elegidos = sorted(presentes, key=valor, reverse=query.descending) + faltantes
+    inicio = query.offset
+    return len(elegidos), [
+        productos[i] for i in elegidos[inicio : inicio + query.per_page]
+    ]
+
+
+@pytest.mark.parametrize(
+    "valor, esperado",
+    [(15, 15.0), ("USD 15.500", 15500.0), ("$ 1,5", 1.5), ("", None), (True, None)],
+)
+def test_to_number(valor, esperado):
+    assert to_number(valor) == esperado
+
+
+def test_cursor_roundtrip_and_invalid_cursors():
+    assert decode_cursor(encode_cursor(3, 96)) == (3, 96)
+    for invalido in ("xyz", encode_cursor(1, -5)):
+        with pytest.raises(ValueError):
+            decode_cursor(invalido)
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"sort": "color"},
+        {"per_page": "0"},
+        {"page": "uno"},
+        {"precio_min": "barato"},
+        {"cursor": "no-es-un-cursor"},
+    ],
+)
+def test_invalid_arguments_raise(args):
+    with pytest.raises(ValueError):
+        consulta(**args)
+
+
+def test_query_arguments():
+    query = ProductQuery.from_args(
+        MultiDict(
+            [
+                ("marca", "Cummins,Honda"),
+                ("marca", "Perkins"),
+                ("q", "  Grupo   ELECTRÓGENO "),
+                ("sort", "-precio"),
+                ("per_page", "1000"),
+                ("page", "3"),
+            ]
+        )
+    )
+    assert query.marcas == ("Cummins", "Honda", "Perkins")
+    assert query.q == "grupo electrógeno"
+    assert (query.sort, query.descending) == ("precio", True)
+    assert query.per_page == 200
+    assert query.page == 3
+
+
+def test_random_queries_match_brute_force():
+    productos = catalogo()
+    indice = CatalogIndex(productos)
+    azar = random.Random(1)
+    for _ in range(300):
+        args = {}
+        if azar.random() < 0.5:
+            args["familia"] = ",".join(azar.sample(FAMILIAS[:3], azar.randint(1, 2)))
+        if azar.random() < 0.5:
+            args["marca"] = azar.choice(MARCAS[:4])
+        if azar.random() < 0.5:
+            args["precio_min"] = str(azar.randint(0, 3000))
+        if azar.random() < 0.3:
+            args["precio_max"] = str(azar.randint(1000, 5000))
+        if azar.random() < 0.3:
+            args["stock_min"] = str(azar.randint(0, 10))
+        if azar.random() < 0.7:
+            args["sort"] = azar.choice(["", "-"]) + azar.choice(
+                ["nombre", "marca", "modelo", "sku", "precio", "stock"]
+            )
+        args["per_page"] = str(azar.choice([5, 48, 200]))
+        args["page"] = str(azar.randint(1, 4))
+
+        query = consulta(**args)
+        assert indice.page(query) == referencia(productos, query), args
+
+
+def test_text_search_orders_by_relevance_and_combines_with_filters():
+    productos = [
+        {"sku": "1", "nombre": "Generador diesel", "marca": "Cummins"},
+        {"sku": "2", "nombre": "Generador generador diesel", "marca": "Honda"},
+        {"sku": "3", "nombre": "Motobomba", "marca": "Honda"},
+    ]
+    indice = CatalogIndex(productos)
+
+    total, pagina = indice.page(consulta(q="generador"))
+    assert total == 2
+    assert {p["sku"] for p in pagina} == {"1", "2"}
+
+    total, pagina = indice.page(consulta(q="generador", marca="Honda"))
+    assert (total, [p["sku"] for p in pagina]) == (1, ["2"])
+
+
+def test_facets_ignore_their_own_filter():
+    productos = catalogo()
+    indice = CatalogIndex(productos)
+    facetas = indice.facets(consulta(marca="Honda", familia="Generadores"))
+
+    marcas = {f["value"]: f["count"] for f in facetas["marca"]}
+    esperado = sum(
+        1
+        for p in productos
+        if p["familia"] == "Generadores" and p["marca"] == "Cummins"
+    )
+    assert marcas["Cummins"] == esperado
+    assert "" not in marcas
+    cantidades = [f["count"] for f in facetas["familia"]]
+    assert cantidades == sorted(cantidades, reverse=True)
+
+
+def test_products_endpoint_pages_with_cursor(catalog_client):
+    cliente = catalog_client(
+        [{"SKU": f"GE-{i:02d}", "Marca": "Cummins"} for i in range(30)]
+    )
+
+    primera = cliente.get("/api/products?sort=-sku&per_page=20").get_json()
+    assert primera["total"] == 30 and primera["pages"] == 2
+    assert primera["products"][0]["sku"] == "GE-29"
+
+    segunda = cliente.get(
+        f"/api/products?sort=-sku&per_page=20&cursor={primera['next_cursor']}"
+    ).get_json()
+    assert [p["sku"] for p in segunda["products"]][-1] == "GE-00"
+    assert segunda["next_cursor"] is None
+    assert not segunda["catalog_changed"]
+
+    assert cliente.get("/api/products?sort=color").status_code == 400
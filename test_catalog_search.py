@@ -0,0 +1,123 @@
+"""
+Pruebas de la búsqueda de texto del catálogo (catalog_search.py)
+"""
+
+import pytest
+
+from catalog_search import SearchIndex, _within_one_edit, fold, tokenize
+
+PRODUCTOS = [
+    {
+        "sku": "GE-001",
+        "nombre": "Grupo electrógeno diesel",
+        "marca": "Cummins",
+        "familia": "Generadores",
+    },
+    {
+        "sku": "MB-200",
+        "nombre": "Motobomba naftera",
+        "marca": "Honda",
+        "familia": "Bombas",
+    },
+    {
+        "sku": "GE-002",
+        "nombre": "Generador a nafta",
+        "marca": "Honda",
+        "modelo": "EU22i",
+        "familia": "Generadores",
+    },
+    {"sku": "TR-9", "nombre": "Transformador de tensión", "marca": "Genérica"},
+]
+
+
+@pytest.fixture(scope="module")
+def indice():
+    return SearchIndex(PRODUCTOS)
+
+
+def skus(indice, consulta):
+    _, hits = indice.search(consulta)
+    return [PRODUCTOS[position]["sku"] for position, _ in hits]
+
+
+def test_fold_and_tokenize():
+    assert fold("Tensión ÑANDÚ") == "tension nandu"
+    assert tokenize("GE-001 / Electrógeno") == ["ge", "001", "electrogeno"]
+
+
+@pytest.mark.parametrize(
+    "a, b, esperado",
+    [
+        ("honda", "honda", True),
+        ("honda", "hondas", True),
+        ("honda", "hnda", True),
+        ("honda", "handa", True),
+        ("honda", "hodna", True),
+        ("honda", "hodnas", False),
+        ("honda", "ha", False),
+    ],
+)
+def test_within_one_edit(a, b, esperado):
+    assert _within_one_edit(a, b) is esperado
+
+
+def test_accents_are_ignored(indice):
+    assert skus(indice, "tension") == ["TR-9"]
+    assert skus(indice, "ELECTRÓGENO") == ["GE-001"]
+
+
+def test_all_terms_must_match(indice):
+    assert skus(indice, "honda nafta") == ["GE-002"]
+    assert skus(indice, "honda cummins") == []
+
+
+def test_last_term_matches_as_prefix(indice):
+    assert set(skus(indice, "honda naf")) == {"MB-200", "GE-002"}
+    # Solo el último término se completa
+    assert skus(indice, "naf honda") == []
+
+
+def test_typos_are_tolerated(indice):
+    assert skus(indice, "cumins") == ["GE-001"]
+    assert skus(indice, "hnoda generador") == ["GE-002"]
+    # Los términos cortos no se corrigen
+    assert skus(indice, "hnd") == []
+
+
+def test_sku_matches_with_or_without_separator(indice):
+    assert skus(indice, "GE-002") == ["GE-002"]
+    assert skus(indice, "ge002") == ["GE-002"]
+
+
+def test_stronger_fields_rank_first():
+    indice = SearchIndex(
+        [
+            {"sku": "A-1", "nombre": "Bomba centrífuga"},
+            {"sku": "A-2", "nombre": "Tablero", "familia": "Bomba"},
+            {"sku": "BOMBA", "nombre": "Repuesto"},
+        ]
+    )
+    _, hits = indice.search("bomba")
+    # sku (10) > familia (3) > nombre (2)
+    assert [position for position, _ in hits] == [2, 1, 0]
+    # Una coincidencia exacta vale más que una por prefijo en el mismo campo
+    assert indice.scores("bomba")[0] > indice.scores("bomb")[0]
+
+
+def test_search_pages_results(indice):
+    total, primera = indice.search("ge", limit=1)
+    _, segunda = indice.search("ge", limit=1, offset=1)
+    assert total >= 2
+    assert primera[0][0] != segunda[0][0]
+    assert primera[0][1] >= segunda[0][1]
+
+
+def test_search_endpoint(catalog_client):
+    cliente = catalog_client(PRODUCTOS)
+    datos = cliente.get("/api/search?q=honda%20naf&limit=1").get_json()
+    assert datos["total"] == 2
+    assert datos["count"] == 1
+    assert "score" in datos["products"][0]
+
+    assert cliente.get("/api/search").status_code == 400
+    assert cliente.get("/api/search?q=x&limit=muchos").status_code == 400
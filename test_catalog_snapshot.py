@@ -0,0 +1,175 @@
+"""
+Pruebas de la copia del catálogo en disco (catalog_snapshot.py) y del
+arranque del servidor desde ella
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+import catalog_snapshot
+import quick_integration
+from catalog_index import CatalogIndex
+from catalog_snapshot import CatalogSnapshotFile
+from catalog_store import CatalogStore
+from json_payload import PreparedJson
+
+PRODUCTOS = [
+    {"SKU": f"GE-{i:02d}", "Descripción": f"Generador {i}", "Marca": "Cummins"}
+    for i in range(40)
+]
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    copia = CatalogSnapshotFile(tmp_path / "catalogo" / "snapshot.sqlite")
+    yield copia
+    copia.close()
+
+
+def guardar(archivo, productos=PRODUCTOS, version=1, indexes=None):
+    payload = PreparedJson({"success": True, "products": productos})
+    return archivo.save(productos, 1000.0, version, payload, indexes), payload
+
+
+def test_empty_file_has_no_copy(archivo):
+    assert archivo.load() is None
+    assert archivo.stats()["products"] == 0
+
+
+def test_save_and_load_roundtrip(archivo):
+    indice = CatalogIndex([quick_integration.format_product(p) for p in PRODUCTOS])
+    escritos, payload = guardar(archivo, indexes=indice)
+    assert escritos > 0
+
+    copia = archivo.load()
+    assert copia.products == PRODUCTOS
+    assert (copia.fetched_at, copia.version) == (1000.0, 1)
+    assert copia.payload.digest == payload.digest
+    assert copia.payload.variant(["gzip"]) == payload.variant(["gzip"])
+    cargado = copia.load_indexes()
+    assert isinstance(cargado, CatalogIndex)
+    assert len(cargado.products) == len(PRODUCTOS)
+
+
+def test_unchanged_products_only_touch_the_row(archivo):
+    guardar(archivo)
+    escritos, _ = guardar(archivo, version=2)
+    assert escritos == 0
+    assert archivo.load().version == 2
+    stats = archivo.stats()
+    assert (stats["saves"], stats["touches"]) == (1, 1)
+
+    escritos, _ = guardar(archivo, productos=PRODUCTOS[:5], version=3)
+    assert escritos > 0
+    assert archivo.load().products == PRODUCTOS[:5]
+
+
+def test_indexes_from_another_format_are_discarded(archivo, monkeypatch):
+    guardar(archivo, indexes={"viejo": True})
+    monkeypatch.setattr(catalog_snapshot, "SNAPSHOT_FORMAT", 2)
+    copia = archivo.load()
+    assert copia.products == PRODUCTOS
+    assert copia.load_indexes() is None
+
+
+def test_unreadable_indexes_are_ignored(archivo):
+    guardar(archivo)
+    copia = archivo.load()
+    copia._indexes = b"no es zlib"
+    assert copia.load_indexes() is None
+
+
+def test_payload_from_another_format_is_not_served(archivo):
+    guardar(archivo, indexes={"viejo": True})
+    otro = CatalogSnapshotFile(archivo.db_path, payload_format=2)
+    try:
+        copia = otro.load()
+        assert copia.products == PRODUCTOS
+        assert copia.payload is None
+        assert copia.load_indexes() is None
+        assert otro.stats()["stale_payloads"] == 1
+
+        # Guardar con el formato nuevo reescribe la fila aunque nada cambió
+        escritos, _ = guardar(otro)
+        assert escritos > 0
+        assert otro.load().payload is not None
+    finally:
+        otro.close()
+
+
+def test_copy_without_payload_format_is_discarded(tmp_path):
+    ruta = tmp_path / "snapshot.sqlite"
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute("CREATE TABLE catalog_snapshot (id INTEGER, format INTEGER)")
+        conexion.execute("INSERT INTO catalog_snapshot VALUES (1, 1)")
+    copia = CatalogSnapshotFile(ruta)
+    try:
+        assert copia.load() is None
+        guardar(copia)
+        assert copia.load().products == PRODUCTOS
+    finally:
+        copia.close()
+
+
+def test_server_starts_from_the_copy_on_disk(archivo, monkeypatch):
+    # Lo que guardó la corrida anterior del servidor
+    anterior = CatalogStore(
+        lambda: list(PRODUCTOS), on_snapshot=quick_integration.prepare_snapshot
+    )
+    monkeypatch.setattr(quick_integration, "catalog", anterior)
+    monkeypatch.setattr(quick_integration, "catalog_file", archivo)
+    quick_integration.save_catalog_snapshot(anterior.snapshot())
+    etag = quick_integration.products_payload(anterior.snapshot()).digest
+
+    # Nuevo inicio: la Cloud Function todavía no respondió
+    descargas = []
+    nuevo = CatalogStore(
+        lambda: descargas.append(1) or list(PRODUCTOS), ttl=time.time()
+    )
+    monkeypatch.setattr(quick_integration, "catalog", nuevo)
+    assert quick_integration.restore_catalog_snapshot()
+    assert not quick_integration.restore_catalog_snapshot()
+
+    cliente = quick_integration.app.test_client()
+    respuesta = cliente.get("/api/products")
+    assert respuesta.headers["ETag"] == f'"{etag}"'
+    assert respuesta.get_json()["count"] == 40
+    pagina = cliente.get("/api/products?sort=-sku&per_page=5").get_json()
+    assert pagina["products"][0]["sku"] == "GE-39"
+    assert descargas == []
+    assert nuevo.stats()["restored"] == 1
+
+
+def test_server_rebuilds_a_payload_from_another_format(archivo, monkeypatch):
+    anterior = CatalogStore(
+        lambda: list(PRODUCTOS), on_snapshot=quick_integration.prepare_snapshot
+    )
+    monkeypatch.setattr(quick_integration, "catalog", anterior)
+    monkeypatch.setattr(quick_integration, "catalog_file", archivo)
+    quick_integration.save_catalog_snapshot(anterior.snapshot())
+    etag = quick_integration.products_payload(anterior.snapshot()).digest
+
+    # Nueva versión del servidor: format_product agrega un campo
+    formato = quick_integration.format_product
+    monkeypatch.setattr(
+        quick_integration,
+        "format_product",
+        lambda p: {**formato(p), "moneda": "USD"},
+    )
+    actualizado = CatalogSnapshotFile(archivo.db_path, payload_format=2)
+    monkeypatch.setattr(quick_integration, "catalog_file", actualizado)
+    nuevo = CatalogStore(lambda: list(PRODUCTOS), ttl=time.time())
+    monkeypatch.setattr(quick_integration, "catalog", nuevo)
+    try:
+        assert quick_integration.restore_catalog_snapshot()
+
+        cliente = quick_integration.app.test_client()
+        respuesta = cliente.get("/api/products")
+        assert respuesta.headers["ETag"] != f'"{etag}"'
+        assert respuesta.get_json()["products"][0]["moneda"] == "USD"
+        pagina = cliente.get("/api/products?sort=sku&per_page=5").get_json()
+        assert pagina["products"][0]["moneda"] == "USD"
+    finally:
+        actualizado.close()
@@ -0,0 +1,153 @@
+"""
+Pruebas del catálogo en memoria con stale-while-revalidate (catalog_store.py)
+"""
+
+import threading
+import time
+
+from catalog_store import CatalogSnapshot, CatalogStore
+
+PRODUCTOS = [
+    {"SKU": "GE-1", "nombre": "Uno"},
+    {"sku": "GE-2", "nombre": "Dos"},
+    {"SKU": "GE-1", "nombre": "Repetido"},
+    {"SKU": "", "nombre": "Sin SKU"},
+]
+
+
+class Descargas:
+    """fetch falso: cuenta las descargas y puede bloquearse o fallar"""
+
+    def __init__(self, productos=PRODUCTOS):
+        self.productos = productos
+        self.llamadas = 0
+        self.error = None
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def __call__(self):
+        self.llamadas += 1
+        self.liberar.wait(5)
+        if self.error is not None:
+            raise self.error
+        return list(self.productos)
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def test_snapshot_index_keeps_the_first_sku():
+    copia = CatalogSnapshot(PRODUCTOS, time.time(), 1)
+    assert sorted(copia.by_sku) == ["GE-1", "GE-2"]
+    assert copia.by_sku["GE-1"]["nombre"] == "Uno"
+
+
+def test_derived_values_are_built_once():
+    copia = CatalogSnapshot(PRODUCTOS, time.time(), 1)
+    construcciones = []
+
+    def build(snapshot):
+        construcciones.append(1)
+        return len(snapshot.products)
+
+    assert copia.derived("cantidad", build) == copia.derived("cantidad", build) == 4
+    assert len(construcciones) == 1
+
+
+def test_concurrent_first_requests_share_one_download():
+    fetch = Descargas()
+    fetch.liberar.clear()
+    store = CatalogStore(fetch)
+    resultados = []
+
+    hilos = [
+        threading.Thread(target=lambda: resultados.append(store.products()))
+        for _ in range(5)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    esperar(lambda: store.stats()["joined_flights"] == 4)
+    fetch.liberar.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert fetch.llamadas == 1
+    assert all(len(productos) == 4 for productos in resultados)
+    assert store.get_by_sku("GE-2")["nombre"] == "Dos"
+
+
+def test_stale_copy_is_served_while_refreshing():
+    fetch = Descargas()
+    store = CatalogStore(fetch, ttl=0.01)
+    primera = store.snapshot()
+    time.sleep(0.02)
+
+    fetch.liberar.clear()
+    assert store.snapshot() is primera  # vencida, pero se devuelve enseguida
+    assert store.stats()["refreshing"]
+    fetch.liberar.set()
+    esperar(lambda: store.snapshot().version == 2)
+    assert store.stats()["stale_served"] >= 1
+
+
+def test_failed_refresh_keeps_the_last_good_copy():
+    fetch = Descargas()
+    store = CatalogStore(fetch, ttl=0, error_backoff=60)
+    store.snapshot()
+
+    fetch.error = ConnectionError("sin red")
+    assert store.refresh(wait=True)  # queda la copia anterior
+    assert store.products()
+    stats = store.stats()
+    assert stats["errors"] == 1
+    assert stats["last_error"] == "sin red"
+    # Durante error_backoff no se vuelve a intentar
+    store.snapshot()
+    assert fetch.llamadas == 2
+
+
+def test_empty_catalog_is_an_error():
+    store = CatalogStore(Descargas(productos=[]), error_backoff=60)
+    assert store.products() == []
+    assert store.get_by_sku("GE-1") is None
+    assert "vacío" in store.stats()["last_error"]
+
+
+def test_restore_and_hooks():
+    preparadas = []
+    guardadas = threading.Event()
+    store = CatalogStore(
+        Descargas(),
+        ttl=0,
+        on_snapshot=lambda snapshot: preparadas.append(snapshot.version),
+        persist=lambda snapshot: guardadas.set(),
+    )
+    guardada = CatalogSnapshot(PRODUCTOS[:1], time.time() - 3600, 7)
+    assert store.restore(guardada)
+    assert not store.restore(guardada)
+
+    store.refresh(wait=True)
+    assert preparadas == [8]
+    assert guardadas.wait(5)
+    assert store.stats()["restored"] == 1
+    assert store.stats()["products"] == 4
+
+
+def test_product_detail_generates_with_the_handler(
+    catalog_client, make_handler, monkeypatch
+):
+    import quick_integration
+
+    cliente = catalog_client([{"SKU": "GE-1", "Descripción": "Generador diesel"}])
+    monkeypatch.setattr(quick_integration, "ai_handler", make_handler())
+
+    producto = cliente.get("/api/products/GE-1").get_json()["product"]
+    assert producto["sku"] == "GE-1"
+    assert producto["descripcion_html"]
+    assert producto["respaldo"] is False
+    assert producto["seo"]["title"].startswith("Generador diesel")
+    assert cliente.get("/api/products/NO-EXISTE").status_code == 404
@@ -0,0 +1,92 @@
+"""
+Pruebas de la caché persistente de generaciones (generation_cache.py)
+"""
+
+from generation_cache import GenerationCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return GenerationCache(tmp_path / "generations.sqlite", **kwargs)
+
+
+def test_key_ignores_whitespace_case_and_empty_fields():
+    """La clave no cambia por espacios, mayúsculas en los nombres o campos vacíos"""
+    a = GenerationCache.make_key(
+        {"SKU": "GE-001", "nombre": "Generador  Diesel ", "marca": None},
+        pdf_hash="abc",
+        prompt_version="v1",
+    )
+    b = GenerationCache.make_key(
+        {"sku": "GE-001", "nombre": "Generador Diesel", "modelo": "   "},
+        pdf_hash="abc",
+        prompt_version="v1",
+    )
+    assert a == b
+
+
+def test_key_changes_with_pdf_prompt_and_extra():
+    product = {"sku": "GE-001"}
+    base = GenerationCache.make_key(product, pdf_hash="a", prompt_version="v1")
+    assert GenerationCache.make_key(product, "b", "v1") != base
+    assert GenerationCache.make_key(product, "a", "v2") != base
+    assert GenerationCache.make_key(product, "a", "v1", {"email": "x"}) != base
+
+
+def test_get_set_and_stats(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.set("k", {"titulo": "Generador"}, sku="GE-001")
+    assert cache.get("k") == {"titulo": "Generador"}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    cache.close()
+
+
+def test_survives_reopen(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("k", {"titulo": "Generador"})
+    cache.close()
+
+    reopened = make_cache(tmp_path)
+    assert reopened.get("k") == {"titulo": "Generador"}
+    reopened.close()
+
+
+def test_evicts_least_recently_used_by_count(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")  # "b" queda como la menos usada
+    cache.set("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    cache.close()
+
+
+def test_evicts_by_size(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=100)
+    cache.set("a", {"html": "x" * 60})
+    cache.set("b", {"html": "y" * 60})
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= 100
+    cache.close()
+
+
+def test_invalidate_sku_and_clear(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", {"v": 1}, sku="GE-001")
+    cache.set("b", {"v": 2}, sku="GE-001")
+    cache.set("c", {"v": 3}, sku="GE-002")
+
+    assert cache.invalidate_sku("GE-001") == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == {"v": 3}
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    cache.close()
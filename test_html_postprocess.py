@@ -0,0 +1,97 @@
+"""
+Pruebas del compactado de HTML generado (html_postprocess.py)
+"""
+
+import pytest
+
+from html_postprocess import HtmlPostprocessor, normalize_style
+
+
+def compactar(html, **kwargs):
+    return HtmlPostprocessor(**kwargs).process(html)
+
+
+@pytest.mark.parametrize(
+    "style, esperado",
+    [
+        ("COLOR: red ;  margin : 0 ;", "color:red;margin:0"),
+        ("color:red;margin:0;color:blue", "margin:0;color:blue"),
+        ("font-family: Arial , sans-serif", "font-family:Arial,sans-serif"),
+        ("  ;  ", ""),
+        # Con strings o url() solo se compactan los espacios
+        ('font-family: "Segoe UI";  color:red', 'font-family: "Segoe UI"; color:red'),
+        ("background: url(a.png); color:red", "background: url(a.png); color:red"),
+        ("color:red !important ;color:blue", "color:red !important;color:blue"),
+    ],
+)
+def test_normalize_style(style, esperado):
+    assert normalize_style(style) == esperado
+
+
+def test_spaces_are_collapsed_only_where_invisible():
+    html = "<div>\n  <p>Hola   <b>mundo</b> !</p>\n\n  <p>Chau</p>\n</div>"
+    assert compactar(html)["html"] == "<div><p>Hola <b>mundo</b> !</p><p>Chau</p></div>"
+
+
+def test_raw_content_is_kept():
+    html = "<pre>  a\n   b</pre><style>p  { color: red }</style>"
+    assert compactar(html)["html"] == html
+
+
+def test_comments_are_removed_except_conditional_ones():
+    reporte = compactar("<div><!-- nota --><!--[if mso]>x<![endif]-->A</div>")
+    assert reporte["html"] == "<div><!--[if mso]>x<![endif]-->A</div>"
+    assert reporte["comments_removed"] == 1
+
+
+def test_entities_and_attributes_are_preserved():
+    html = '<a href="/p?a=1&amp;b=2" class=" x  y " title="&quot;">A &amp; B&nbsp;</a>'
+    assert compactar(html)["html"] == (
+        '<a href="/p?a=1&amp;b=2" class="x y" title="&quot;">A &amp; B&nbsp;</a>'
+    )
+
+
+def test_repeated_and_empty_styles_are_reported():
+    reporte = compactar(
+        '<div style="color:red;color:blue"><span style=";">x</span></div>'
+    )
+    assert reporte["html"] == '<div style="color:blue"><span>x</span></div>'
+    assert reporte["styles"] == 2
+    # Solo cuenta el estilo que perdió declaraciones
+    assert reporte["styles_deduped"] == 1
+
+
+def test_optional_closes_are_implied_without_problems():
+    reporte = compactar("<ul><li>a<li>b</ul><table><tr><td>1<td>2</table>")
+    assert reporte["html"] == (
+        "<ul><li>a</li><li>b</li></ul><table><tr><td>1</td><td>2</td></tr></table>"
+    )
+    assert reporte["balanced"]
+
+
+def test_truncated_html_is_closed_and_reported():
+    reporte = compactar("<div><h2>Título</h2><div><strong>Potencia")
+    assert reporte["html"] == (
+        "<div><h2>Título</h2><div><strong>Potencia</strong></div></div>"
+    )
+    assert not reporte["balanced"]
+    assert "<strong> sin cerrar" in reporte["problems"]
+
+
+def test_stray_closing_tags_are_dropped():
+    reporte = compactar("<div>a</span></div><br></br>")
+    assert reporte["html"] == "<div>a</div><br>"
+    assert reporte["problems"] == ["cierre sobrante </span>"]
+
+
+def test_budget_and_session_totals():
+    postprocesador = HtmlPostprocessor(max_bytes=30)
+    assert not postprocesador.process("<p>corto</p>")["over_budget"]
+    assert postprocesador.process("<p>" + "x" * 50 + "</p>")["over_budget"]
+    postprocesador.process("<div>sin cerrar")
+
+    stats = postprocesador.stats()
+    assert stats["products"] == 3
+    assert stats["over_budget"] == 1
+    assert stats["unbalanced"] == 1
+    assert stats["max_bytes"] == 30
@@ -0,0 +1,79 @@
+"""
+Pruebas de las plantillas HTML precompiladas (html_templates.py)
+"""
+
+from html_templates import (
+    CompiledTemplate,
+    DEFAULT_CONTACT,
+    contact_block,
+    insert_contact,
+    render_catalog,
+    render_fallback,
+)
+
+CONTACTO = {
+    "whatsapp": "5491100000000",
+    "email": "ventas@ejemplo.com",
+    "telefono_display": "+54 9 11 0000-0000",
+    "website": "www.ejemplo.com",
+}
+
+
+def test_compiled_template_matches_str_format():
+    fuente = "<p>{nombre} - 100% {marca}</p>{nombre}"
+    plantilla = CompiledTemplate(fuente)
+    valores = {"nombre": "GE-1", "marca": "Cummins"}
+    assert plantilla.fields == ("nombre", "marca", "nombre")
+    assert plantilla.render(valores) == fuente.format(**valores)
+
+
+def test_fallback_includes_present_specs_only():
+    html = render_fallback(
+        {
+            "nombre": "Generador 100",
+            "marca": "Cummins",
+            "modelo": "C100",
+            "potencia_kva": "100",
+            "voltaje": "380",
+            "peso": "",
+        },
+        CONTACTO,
+    )
+    assert "GENERADOR 100" in html
+    assert "Cummins - C100" in html
+    assert "Potencia (kVA)" in html and ">100<" in html
+    assert "Voltaje" in html
+    assert "Peso" not in html
+    assert "https://wa.me/5491100000000" in html
+
+
+def test_fallback_without_specs_or_brand():
+    html = render_fallback({"nombre": "Producto"})
+    assert "📊" not in html
+    assert "Cummins" not in html
+    # Sin configuración se usa el contacto por defecto
+    assert f"mailto:{DEFAULT_CONTACT['email']}" in html
+
+
+def test_contact_goes_before_the_first_closing_div():
+    html = insert_contact("<div><h1>A</h1></div><div>B</div>", CONTACTO)
+    assert html.startswith("<div><h1>A</h1>" + contact_block(CONTACTO) + "</div>")
+    assert html.endswith("<div>B</div>")
+
+
+def test_fallback_keeps_contact_position_when_values_contain_html():
+    html = render_fallback({"nombre": "A</div>B"}, CONTACTO)
+    contacto = contact_block(CONTACTO)
+    assert html.count(contacto) == 1
+    # Igual que _add_contact_section: justo antes del primer </div>
+    assert html.index(contacto) == html.replace(contacto, "").index("</div>")
+
+
+def test_render_catalog_reports_per_sku_results():
+    salida = render_catalog(
+        [{"sku": "GE-1", "nombre": "Uno"}, {"SKU": "GE-2", "nombre": "Dos"}, {}],
+        CONTACTO,
+    )
+    assert sorted(salida["resultados"]) == ["2", "GE-1", "GE-2"]
+    assert salida["errores"] == {}
+    assert salida["stats"]["products"] == 3
@@ -0,0 +1,81 @@
+"""
+Pruebas de las respuestas JSON preparadas (json_payload.py) y de la
+revalidación con ETag de /api/products
+"""
+
+import gzip
+import json
+
+import brotli
+
+from json_payload import MIN_COMPRESS_BYTES, PreparedJson
+
+CATALOGO = [
+    {"SKU": f"GE-{i}", "Descripción": f"Generador {i}", "Marca": "Cummins"}
+    for i in range(50)
+]
+
+
+def test_small_payloads_are_not_compressed():
+    preparado = PreparedJson({"ok": True, "texto": "ñ"})
+    assert preparado.identity == '{"ok":true,"texto":"ñ"}'.encode("utf-8")
+    assert preparado.encoded == {}
+    assert preparado.variant(["br", "gzip"]) == (
+        preparado.identity,
+        "",
+        preparado.digest,
+    )
+
+
+def test_variants_decode_to_the_same_json():
+    datos = {"products": CATALOGO}
+    preparado = PreparedJson(datos)
+    assert len(preparado.identity) >= MIN_COMPRESS_BYTES
+
+    cuerpo, encoding, etag = preparado.variant(["gzip", "br"])
+    assert encoding == "br" and etag == f"{preparado.digest}-br"
+    assert json.loads(brotli.decompress(cuerpo)) == datos
+
+    cuerpo, encoding, etag = preparado.variant(["gzip"])
+    assert encoding == "gzip" and etag == f"{preparado.digest}-gzip"
+    assert json.loads(gzip.decompress(cuerpo)) == datos
+
+    # Misma entrada, mismos bytes y ETag (gzip sin fecha)
+    assert PreparedJson(datos).encoded == preparado.encoded
+    assert PreparedJson(datos).digest == preparado.digest
+
+
+def test_from_parts_reuses_the_stored_variants():
+    preparado = PreparedJson({"products": CATALOGO})
+    copia = PreparedJson.from_parts(
+        preparado.identity, preparado.encoded, preparado.digest
+    )
+    assert copia.variant(["gzip"]) == preparado.variant(["gzip"])
+    assert copia.sizes() == preparado.sizes()
+
+
+def test_products_endpoint_revalidates_with_etag(catalog_client):
+    cliente = catalog_client(CATALOGO)
+
+    respuesta = cliente.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["Content-Encoding"] == "gzip"
+    assert respuesta.headers["Vary"] == "Accept-Encoding"
+    assert respuesta.headers["Cache-Control"] == "no-cache"
+    datos = json.loads(gzip.decompress(respuesta.data))
+    assert datos["count"] == 50
+    assert datos["products"][0]["nombre"] == "Generador 0"
+
+    etag = respuesta.headers["ETag"]
+    repetida = cliente.get(
+        "/api/products",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+    # El ETag de la variante gzip no valida la respuesta sin comprimir
+    sin_comprimir = cliente.get("/api/products", headers={"If-None-Match": etag})
+    assert sin_comprimir.status_code == 200
+    assert "Content-Encoding" not in sin_comprimir.headers
+    assert json.loads(sin_comprimir.data) == datos
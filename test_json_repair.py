@@ -0,0 +1,129 @@
+"""
+Pruebas de la reparación tolerante de JSON (json_repair.py) y del pedido de
+los campos que faltan
+"""
+
+import json
+
+import pytest
+
+from json_repair import parse_json_tolerant, salvage_fields
+from providers import LocalProvider
+
+COMPLETO = {
+    "descripcion": "Generador diesel",
+    "descripcion_html": "<div><h1>GE-1</h1></div>",
+    "seo_titulo": "Generador GE-1",
+    "seo_descripcion": "Generador diesel GE-1",
+}
+
+
+def test_clean_json_needs_no_repairs():
+    resultado = parse_json_tolerant(json.dumps(COMPLETO))
+    assert resultado.data == COMPLETO
+    assert not resultado.repaired
+
+
+@pytest.mark.parametrize(
+    "texto, reparacion",
+    [
+        ('```json\n{"a": "1"}\n```', "fences"),
+        ('Aquí está el JSON: {"a": "1"} Espero que sirva', "surrounding_text"),
+        ('{"a": "1",}', "trailing_commas"),
+        ('{"a": "linea 1\nlinea 2"}', "control_chars"),
+    ],
+)
+def test_common_defects_are_repaired(texto, reparacion):
+    resultado = parse_json_tolerant(texto)
+    assert reparacion in resultado.repairs
+    assert resultado.data["a"] in ("1", "linea 1\nlinea 2")
+
+
+def test_truncated_value_is_closed_and_reported():
+    resultado = parse_json_tolerant(
+        '{"descripcion": "Completa", "descripcion_html": "<div'
+    )
+    assert resultado.data == {"descripcion": "Completa", "descripcion_html": "<div"}
+    assert resultado.truncated_fields == ["descripcion_html"]
+    assert "truncated" in resultado.repairs
+
+
+def test_truncated_key_is_dropped():
+    resultado = parse_json_tolerant('{"descripcion": "Completa", "seo_tit')
+    assert resultado.data == {"descripcion": "Completa"}
+    assert resultado.truncated_fields == []
+
+    resultado = parse_json_tolerant('{"descripcion": "Completa", "seo_titulo": ')
+    assert resultado.data == {"descripcion": "Completa"}
+
+
+def test_truncated_array_keeps_complete_items():
+    resultado = parse_json_tolerant('[{"sku": "A"}, {"sku": "B"}, {"sku": "C')
+    assert resultado.data[:2] == [{"sku": "A"}, {"sku": "B"}]
+    assert resultado.truncated_fields == ["sku"]
+
+
+def test_salvage_reads_complete_string_fields():
+    texto = 'basura "seo_titulo": "Titulo \\"GE\\"", "descripcion": "sin cerrar'
+    assert salvage_fields(texto, ["seo_titulo", "descripcion"]) == {
+        "seo_titulo": 'Titulo "GE"'
+    }
+
+
+def test_unrecoverable_text_raises():
+    with pytest.raises(ValueError):
+        parse_json_tolerant("no hay JSON acá")
+    with pytest.raises(ValueError):
+        parse_json_tolerant("no hay JSON acá", fields=["descripcion"])
+
+
+class Guion(LocalProvider):
+    """Devuelve las respuestas indicadas en orden y registra los prompts"""
+
+    def __init__(self, *respuestas):
+        super().__init__()
+        self.respuestas = list(respuestas)
+        self.prompts = []
+
+    def respond(self, prompt, prefix=None):
+        self.prompts.append(prompt)
+        return self.respuestas.pop(0)
+
+
+def test_missing_fields_are_requested_alone(make_handler):
+    truncada = json.dumps(COMPLETO)[: json.dumps(COMPLETO).index("seo_titulo") - 3]
+    provider = Guion(
+        truncada,
+        json.dumps(
+            {campo: COMPLETO[campo] for campo in ("seo_titulo", "seo_descripcion")}
+        ),
+    )
+    handler = make_handler(provider)
+
+    resultado = handler.generar_descripcion_detallada_html_premium_con_ia(
+        {"sku": "GE-1", "nombre": "Generador"}, {}
+    )
+
+    assert resultado["seo_titulo"] == COMPLETO["seo_titulo"]
+    assert resultado["descripcion"] == COMPLETO["descripcion"]
+    assert "Genera SOLO estos campos del JSON: seo_titulo, seo_descripcion" in (
+        provider.prompts[1]
+    )
+    stats = handler.get_json_repair_stats()
+    assert stats["followups"] == 1
+    assert stats["fields_rerequested"] == 2
+    assert stats["full_retries"] == 0
+
+
+def test_unparseable_response_is_regenerated_once(make_handler):
+    provider = Guion("no es JSON", json.dumps(COMPLETO))
+    handler = make_handler(provider)
+
+    resultado = handler.generar_descripcion_detallada_html_premium_con_ia(
+        {"sku": "GE-1", "nombre": "Generador"}, {}
+    )
+
+    assert resultado["seo_titulo"] == COMPLETO["seo_titulo"]
+    stats = handler.get_json_repair_stats()
+    assert stats["unparseable"] == 1
+    assert stats["full_retries"] == 1
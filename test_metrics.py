@@ -0,0 +1,107 @@
+"""
+Pruebas de las métricas de IA y PDFs (metrics.py)
+"""
+
+import json
+import threading
+
+import pytest
+
+from metrics import Histogram, MetricsRecorder, estimate_cost
+
+
+def test_estimate_cost_uses_cached_and_versioned_prices():
+    completo = estimate_cost("gemini-1.5-flash", 1_000_000, 0)
+    assert completo == pytest.approx(0.075)
+    # La entrada cacheada se cobra más barata
+    assert estimate_cost("gemini-1.5-flash", 1_000_000, 0, 1_000_000) == (
+        pytest.approx(0.01875)
+    )
+    assert estimate_cost("gemini:gemini-1.5-flash-002", 1_000_000, 0) == completo
+    assert estimate_cost("local", 1000, 1000) == 0.0
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histograma = Histogram([10, 100, 1000])
+    for valor in [5] * 90 + [50] * 9 + [5000]:
+        histograma.add(valor)
+
+    assert histograma.percentile(0.5) == 10
+    assert histograma.percentile(0.95) == 100
+    # Sobre el último límite se informa el máximo observado
+    assert histograma.percentile(1.0) == 5000
+    resumen = histograma.to_dict()
+    assert resumen["count"] == 100
+    assert resumen["buckets"] == {"<=10": 90, "<=100": 9, ">1000": 1}
+
+
+def test_model_calls_add_up_into_the_current_generation():
+    metrics = MetricsRecorder()
+    with metrics.generation("GE-1", "premium") as evento:
+        metrics.model_call(task="html", tokens_in=100, tokens_out=50, retries=1)
+        metrics.model_call(task="seo", tokens_in=10, tokens_out=5, cost_usd=0.5)
+        metrics.annotate(fallback=True)
+
+    assert evento["model_calls"] == 2
+    assert evento["tokens_in"] == 110
+    assert evento["retries"] == 1
+    assert evento["ttfb_ms"] is not None
+    totales = metrics.snapshot()["totals"]
+    assert totales["generation"]["fallbacks"] == 1
+    assert totales["model_call"]["count"] == 2
+    assert totales["model_call"]["tokens_out"] == 55
+
+
+def test_generations_in_other_threads_do_not_mix():
+    metrics = MetricsRecorder()
+    eventos = {}
+
+    def generar(sku, llamadas):
+        with metrics.generation(sku, "premium") as evento:
+            for _ in range(llamadas):
+                metrics.model_call(task="html", tokens_in=1)
+        eventos[sku] = evento
+
+    hilos = [threading.Thread(target=generar, args=(f"GE-{n}", n)) for n in (1, 3)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert eventos["GE-1"]["model_calls"] == 1
+    assert eventos["GE-3"]["model_calls"] == 3
+
+
+def test_errors_are_recorded_and_reraised():
+    metrics = MetricsRecorder()
+    with pytest.raises(ValueError):
+        with metrics.measure("pdf", url="x"):
+            raise ValueError("PDF roto")
+    assert metrics.snapshot()["totals"]["pdf"]["errors"] == 1
+
+
+def test_batches_keep_their_own_aggregate():
+    metrics = MetricsRecorder(keep_batches=1)
+    metrics.record("pdf", bytes=10)
+    for nombre in ("primero", "segundo"):
+        with metrics.batch(nombre, products=2) as lote:
+            metrics.record("pdf", bytes=100)
+            lote["errors"] = 0
+
+    lotes = metrics.snapshot()["batches"]
+    assert [lote["name"] for lote in lotes] == ["segundo"]
+    assert lotes[0]["metrics"]["pdf"]["bytes"] == 100
+    assert metrics.snapshot()["totals"]["pdf"]["bytes"] == 210
+
+
+def test_events_are_written_as_jsonl(tmp_path):
+    metrics = MetricsRecorder(log_dir=tmp_path)
+    metrics.record("pdf", bytes=10)
+    with metrics.generation("GE-1", "premium"):
+        metrics.model_call(task="html", tokens_in=1)
+    metrics.close()
+
+    eventos = [json.loads(linea) for linea in open(metrics.log_path)]
+    assert [evento["kind"] for evento in eventos] == ["pdf", "model_call", "generation"]
+    assert eventos[1]["sku"] == "GE-1"
+    assert "_started" not in eventos[2]
@@ -0,0 +1,80 @@
+"""
+Pruebas del planificador de lotes de fichas técnicas (pdf_batch.py)
+"""
+
+from pdf_batch import PDF_BASE_URL, PdfBatchPlanner, normalize_pdf_url
+
+
+class FakeHandler:
+    """Extrae devolviendo el hash configurado por URL y cuenta las llamadas"""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.calls = []
+
+    def extract_pdf_content(self, url):
+        self.calls.append(url)
+        return {"success": True, "text": url, "content_hash": self.hashes.get(url)}
+
+
+def test_normalize_pdf_url():
+    assert normalize_pdf_url("") == ""
+    assert normalize_pdf_url("  ficha.pdf ") == PDF_BASE_URL + "ficha.pdf"
+    assert normalize_pdf_url("/ficha.pdf") == PDF_BASE_URL + "ficha.pdf"
+    assert (
+        normalize_pdf_url(
+            "HTTPS://Storage.GoogleAPIs.com//fichas_tecnicas/a%20b.pdf#p2"
+        )
+        == "https://storage.googleapis.com/fichas_tecnicas/a%20b.pdf"
+    )
+    assert normalize_pdf_url("https://x.com/a b.pdf") == normalize_pdf_url(
+        "https://x.com/a%20b.pdf"
+    )
+
+
+def test_group_accepts_raw_and_formatted_products():
+    plan = PdfBatchPlanner(None).group(
+        [
+            {"sku": "A", "pdf_url": "ficha.pdf"},
+            {"SKU": "B", "URL_PDF": PDF_BASE_URL + "ficha.pdf"},
+            {"sku": "C"},
+        ]
+    )
+    assert plan.products == 3
+    assert plan.products_with_pdf == 2
+    assert plan.skus_by_url == {PDF_BASE_URL + "ficha.pdf": ["A", "B"]}
+
+
+def test_prepare_extracts_each_url_once_and_shares_by_content():
+    url_1 = PDF_BASE_URL + "uno.pdf"
+    url_2 = PDF_BASE_URL + "copia-de-uno.pdf"
+    url_3 = PDF_BASE_URL + "otro.pdf"
+    handler = FakeHandler({url_1: "h1", url_2: "h1", url_3: "h3"})
+    products = [
+        {"sku": "A", "pdf_url": "uno.pdf"},
+        {"sku": "B", "pdf_url": url_1},
+        {"sku": "C", "pdf_url": "copia-de-uno.pdf"},
+        {"sku": "D", "pdf_url": "otro.pdf"},
+        {"sku": "E"},
+    ]
+
+    plan = PdfBatchPlanner(handler).prepare(products)
+
+    assert sorted(handler.calls) == sorted([url_1, url_2, url_3])
+    # Mismo contenido en dos URLs: la misma extracción para todos
+    assert plan.content_for(products[2]) is plan.content_for(products[0])
+    assert plan.content_for(products[3])["text"] == url_3
+    assert plan.content_for(products[4]) is None
+
+    report = plan.report()
+    assert report["downloads_avoided"] == 1
+    assert report["parses_avoided"] == 2
+    assert report["shared_groups"] == {"h1": ["A", "B", "C"]}
+
+
+def test_failed_extractions_are_grouped_by_url():
+    handler = FakeHandler({})
+    plan = PdfBatchPlanner(handler).prepare(
+        [{"sku": "A", "pdf_url": "a.pdf"}, {"sku": "B", "pdf_url": "b.pdf"}]
+    )
+    assert plan.report()["parses_avoided"] == 0
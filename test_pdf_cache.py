@@ -0,0 +1,210 @@
+"""
+Pruebas de la caché de PDFs (pdf_cache.py) contra un servidor HTTP local
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pdf_cache import PdfCache
+
+
+class FichaHandler(BaseHTTPRequestHandler):
+    """Sirve /ficha-N.pdf con ETag y responde 304 a If-None-Match"""
+
+    bodies = {}
+    requests = []
+
+    def do_GET(self):
+        body = self.bodies.get(self.path)
+        etag = f'"{hash(body)}"'
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FichaHandler.bodies = {
+        f"/ficha-{i}.pdf": b"%PDF-1.4 ficha " + bytes([65 + i]) * 1000 for i in range(3)
+    }
+    FichaHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FichaHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_fresh_hit_and_conditional_revalidation(tmp_path, server):
+    cache = PdfCache(tmp_path, revalidate_after=300)
+    url = f"{server}/ficha-0.pdf"
+
+    path, content_hash, size = cache.fetch_file(url)
+    assert path.read_bytes() == FichaHandler.bodies["/ficha-0.pdf"]
+    assert size == 1015
+
+    # Copia reciente: ni siquiera se consulta al servidor
+    assert cache.fetch_file(url) == (path, content_hash, 0)
+    assert len(FichaHandler.requests) == 1
+
+    # Copia vencida: se revalida con If-None-Match y el servidor dice 304
+    cache.revalidate_after = 0
+    assert cache.fetch_file(url) == (path, content_hash, 0)
+    assert FichaHandler.requests[-1][1] is not None
+    stats = cache.stats()
+    assert (stats["downloads"], stats["fresh_hits"], stats["not_modified"]) == (1, 1, 1)
+    cache.close()
+
+
+def test_serves_stale_copy_when_server_is_down(tmp_path, server):
+    cache = PdfCache(tmp_path, revalidate_after=0)
+    path, content_hash, _ = cache.fetch_file(f"{server}/ficha-0.pdf")
+    cache.close()
+
+    # Misma caché en disco, servidor inalcanzable
+    cache = PdfCache(tmp_path, revalidate_after=0)
+    with sqlite3.connect(str(tmp_path / "pdf_cache.sqlite")) as conn:
+        conn.execute("UPDATE downloads SET url = 'http://127.0.0.1:9/ficha-0.pdf'")
+    assert cache.fetch_file("http://127.0.0.1:9/ficha-0.pdf", timeout=2) == (
+        path,
+        content_hash,
+        0,
+    )
+    assert cache.stats()["stale_fallbacks"] == 1
+    cache.close()
+
+
+def test_extractions_are_keyed_by_params(tmp_path):
+    cache = PdfCache(tmp_path)
+    v1 = PdfCache.extraction_params(version="v1", parser="pypdf2", max_pages=5)
+    v2 = PdfCache.extraction_params(version="v2", parser="pypdf2", max_pages=5)
+    assert v1 == PdfCache.extraction_params(max_pages=5, parser="pypdf2", version="v1")
+
+    cache.set_extraction("hash", {"text": "viejo"}, v1)
+    assert cache.get_extraction("hash", v1) == {"text": "viejo"}
+    # Otra versión del extractor no reusa lo guardado por la anterior
+    assert cache.get_extraction("hash", v2) is None
+
+    cache.set_extraction("hash", {"text": "nuevo"}, v2)
+    assert cache.get_extraction("hash", v2) == {"text": "nuevo"}
+    assert cache.get_extraction("hash", v1) == {"text": "viejo"}
+    cache.close()
+
+
+def test_drops_unversioned_extractions_from_older_databases(tmp_path):
+    tmp_path.mkdir(exist_ok=True)
+    with sqlite3.connect(str(tmp_path / "pdf_cache.sqlite")) as conn:
+        conn.execute(
+            "CREATE TABLE extractions (content_hash TEXT PRIMARY KEY, "
+            "data TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO extractions VALUES ('hash', '{}', 0)")
+
+    cache = PdfCache(tmp_path)
+    assert cache.get_extraction("hash") is None
+    assert cache.stats()["extractions"] == 0
+    cache.close()
+
+
+def test_evicts_extractions_by_count_and_age(tmp_path):
+    cache = PdfCache(tmp_path, max_extractions=2)
+    for name in ("a", "b", "c"):
+        cache.set_extraction(name, {"text": name})
+        time.sleep(0.01)
+    assert cache.get_extraction("a") is None
+    assert cache.stats()["extractions"] == 2
+
+    cache.max_age = 0
+    cache.set_extraction("d", {"text": "d"})
+    assert cache.stats()["extractions"] == 1
+    assert cache.get_extraction("d") == {"text": "d"}
+    cache.close()
+
+
+def usado_hace(tmp_path, path, segundos):
+    """Atrasa el último uso registrado de un archivo de la caché"""
+    with sqlite3.connect(str(tmp_path / "pdf_cache.sqlite")) as conn:
+        conn.execute(
+            "UPDATE files SET last_used = ? WHERE content_hash = ?",
+            (time.time() - segundos, path.stem),
+        )
+
+
+def test_evicts_least_recently_used_files_over_size(tmp_path, server, monkeypatch):
+    cache = PdfCache(tmp_path, revalidate_after=300, max_file_bytes=2500)
+    # El desalojo sale de SQLite, sin recorrer el directorio
+    monkeypatch.setattr(type(tmp_path), "glob", None)
+    path0, _, _ = cache.fetch_file(f"{server}/ficha-0.pdf")
+    path1, _, _ = cache.fetch_file(f"{server}/ficha-1.pdf")
+    usado_hace(tmp_path, path0, 7200)
+    usado_hace(tmp_path, path1, 3600)
+    # ficha-0 se vuelve a usar: la menos usada pasa a ser ficha-1
+    cache.fetch_file(f"{server}/ficha-0.pdf")
+
+    path2, _, _ = cache.fetch_file(f"{server}/ficha-2.pdf")
+    assert path0.exists() and path2.exists()
+    assert not path1.exists()
+    stats = cache.stats()
+    assert stats["files_evicted"] == 1
+    assert stats["file_bytes"] == 2 * 1015
+
+    # Sin el archivo la URL se descarga completa otra vez (sin 304)
+    cache.fetch_file(f"{server}/ficha-1.pdf")
+    assert FichaHandler.requests[-1] == ("/ficha-1.pdf", None)
+    cache.close()
+
+
+def test_recently_handed_out_files_are_not_evicted(tmp_path, server):
+    cache = PdfCache(tmp_path, max_file_bytes=1500, max_age=0)
+    path0, _, _ = cache.fetch_file(f"{server}/ficha-0.pdf")
+    path1, _, _ = cache.fetch_file(f"{server}/ficha-1.pdf")
+    # Por tamaño y por antigüedad sobra ficha-0, pero se entregó recién
+    assert path0.exists() and path1.exists()
+    assert cache.stats()["files_evicted"] == 0
+
+    usado_hace(tmp_path, path0, 3600)
+    assert cache.evict_files() == 1
+    assert not path0.exists() and path1.exists()
+    cache.close()
+
+
+def test_evicts_files_older_than_max_age(tmp_path, server):
+    cache = PdfCache(tmp_path, max_age=3600)
+    path0, _, _ = cache.fetch_file(f"{server}/ficha-0.pdf")
+    usado_hace(tmp_path, path0, 7200)
+
+    path1, _, _ = cache.fetch_file(f"{server}/ficha-1.pdf")
+    assert not path0.exists()
+    assert path1.exists()
+    cache.close()
+
+
+def test_registers_files_from_older_caches(tmp_path):
+    (tmp_path / "files").mkdir()
+    # Archivo de una versión sin la tabla files
+    (tmp_path / "files" / "abc.pdf").write_bytes(b"%PDF" * 100)
+
+    cache = PdfCache(tmp_path, max_file_bytes=0, in_use_grace=0)
+    assert cache.stats()["file_bytes"] == 400
+    assert cache.evict_files() == 1
+    assert not (tmp_path / "files" / "abc.pdf").exists()
+    cache.close()
@@ -0,0 +1,156 @@
+"""
+Pruebas de la descarga con tope de tamaño y la lectura de PDFs
+(pdf_extraction.py)
+"""
+
+import hashlib
+import io
+
+import pytest
+
+from conftest import make_pdf
+from pdf_extraction import (
+    PdfParseTimeoutError,
+    PdfParserPool,
+    PdfTooLargeError,
+    extract_pdf_text,
+    stream_download,
+)
+
+PAGINAS = ["Potencia 100 kVA", "Tension 380 V", "Peso 1250 kg", "Anexo"]
+
+
+def test_stream_download_writes_body_and_hash(http_server):
+    body = make_pdf(PAGINAS)
+    http_server.routes["/ficha.pdf"] = (body, {"Content-Length": str(len(body))})
+    destino = io.BytesIO()
+
+    response, leidos, digest = stream_download(
+        f"{http_server.url}/ficha.pdf", destino, max_bytes=1024 * 1024, chunk_size=64
+    )
+
+    assert response.status_code == 200
+    assert destino.getvalue() == body
+    assert leidos == len(body)
+    assert digest == hashlib.sha256(body).hexdigest()
+
+
+def test_stream_download_rejects_declared_size_over_cap(http_server):
+    body = b"x" * 5000
+    http_server.routes["/grande.pdf"] = (body, {"Content-Length": "5000"})
+    destino = io.BytesIO()
+
+    with pytest.raises(PdfTooLargeError):
+        stream_download(f"{http_server.url}/grande.pdf", destino, max_bytes=1000)
+    assert destino.getvalue() == b""
+
+
+def test_stream_download_stops_reading_undeclared_size_over_cap(http_server):
+    # Sin Content-Length: el tope se controla mientras llegan los bloques
+    http_server.routes["/grande.pdf"] = (b"x" * 5000, {})
+    destino = io.BytesIO()
+
+    with pytest.raises(PdfTooLargeError):
+        stream_download(
+            f"{http_server.url}/grande.pdf", destino, max_bytes=1000, chunk_size=256
+        )
+    assert len(destino.getvalue()) <= 1000
+
+
+def test_extract_stops_at_max_pages():
+    resultado = extract_pdf_text(io.BytesIO(make_pdf(PAGINAS)), max_pages=2)
+    assert resultado["pages_parsed"] == 2
+    assert resultado["page_count"] == 4
+    assert "Potencia 100 kVA" in resultado["text"]
+    assert "Peso" not in resultado["text"]
+
+
+def test_extract_stops_once_enough_text_is_collected():
+    resultado = extract_pdf_text(
+        io.BytesIO(make_pdf(PAGINAS)), max_pages=10, max_chars=10
+    )
+    assert resultado["pages_parsed"] == 1
+
+
+def test_extract_rejects_unknown_parser():
+    with pytest.raises(ValueError):
+        extract_pdf_text(io.BytesIO(make_pdf(PAGINAS)), parser="inexistente")
+
+
+def test_handler_extracts_specs_and_reuses_the_extraction(make_handler, http_server):
+    body = make_pdf(["Potencia stand-by 100 kVA", "Peso 1250 kg"])
+    http_server.routes["/ficha.pdf"] = (body, {"Content-Length": str(len(body))})
+    handler = make_handler()
+
+    primero = handler.extract_pdf_content(f"{http_server.url}/ficha.pdf")
+    assert primero["success"]
+    assert primero["specifications"]["potencia_kva"] == "100"
+    assert primero["pages_parsed"] == 2
+
+    segundo = handler.extract_pdf_content(f"{http_server.url}/ficha.pdf")
+    assert segundo["specifications"] == primero["specifications"]
+    assert handler.pdf_cache.stats()["extraction_hits"] == 1
+    assert handler.pdf_parser.stats()["parsed"] == 1
+
+
+def test_handler_reports_oversized_pdfs_as_failures(make_handler, http_server):
+    http_server.routes["/grande.pdf"] = (b"x" * 5000, {"Content-Length": "5000"})
+    handler = make_handler()
+    handler.pdf_limits["max_bytes"] = 1000
+
+    resultado = handler.extract_pdf_content(f"{http_server.url}/grande.pdf")
+    assert resultado == {"success": False, "text": "", "specifications": {}}
+
+
+def test_parser_pool_parses_paths_in_worker_processes(tmp_path):
+    ruta = tmp_path / "ficha.pdf"
+    ruta.write_bytes(make_pdf(PAGINAS))
+    pool = PdfParserPool(max_workers=1, timeout=60)
+    try:
+        resultado = pool.extract(ruta, max_pages=2)
+        assert resultado["pages_parsed"] == 2
+        assert resultado["parser"] == "pypdf2"
+        assert pool.stats()["inline"] == 0
+        # Un archivo abierto no se puede enviar al pool: se parsea en el hilo
+        pool.extract(io.BytesIO(make_pdf(PAGINAS)))
+        assert pool.stats()["inline"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_parser_pool_terminates_workers_that_time_out(tmp_path):
+    ruta = tmp_path / "ficha.pdf"
+    ruta.write_bytes(make_pdf(PAGINAS))
+    # Levantar un worker con spawn tarda más que este timeout
+    pool = PdfParserPool(max_workers=2, timeout=0.01)
+    try:
+        with pytest.raises(PdfParseTimeoutError):
+            pool.extract(ruta)
+        assert pool._executor is None
+        stats = pool.stats()
+        assert stats["timeouts"] == stats["pools_recycled"] == stats["errors"] == 1
+
+        # El pool nuevo funciona con un plazo razonable
+        pool.timeout = 60
+        assert pool.extract(ruta)["page_count"] == 4
+    finally:
+        pool.shutdown()
+
+
+def test_recycle_kills_running_workers(tmp_path):
+    ruta = tmp_path / "ficha.pdf"
+    ruta.write_bytes(make_pdf(PAGINAS))
+    pool = PdfParserPool(max_workers=2, timeout=60)
+    try:
+        pool.extract(ruta)
+        executor = pool._executor
+        procesos = list(executor._processes.values())
+        assert procesos and all(p.is_alive() for p in procesos)
+
+        pool._recycle(executor)
+        for proceso in procesos:
+            proceso.join(5)
+        assert not any(p.is_alive() for p in procesos)
+        assert pool._executor is None
+    finally:
+        pool.shutdown()
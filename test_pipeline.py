@@ -0,0 +1,185 @@
+"""
+Pruebas de las etapas en segundo plano de navigation/pipeline.py
+"""
+
+import threading
+import time
+
+from navigation.pipeline import GenerationPipeline, Prefetcher
+
+
+def test_prefetcher_respects_lookahead_and_order():
+    started = []
+    products = [{"sku": f"P{i}"} for i in range(10)]
+
+    def fetch(product):
+        started.append(product["sku"])
+        return product["sku"].lower()
+
+    prefetcher = Prefetcher(products, fetch, lookahead=2, max_workers=1)
+    prefetcher.advance(0)
+    assert prefetcher.get(0) == "p0"
+    # Con lookahead=2 solo se adelantan los dos siguientes
+    assert sorted(started) == ["P0", "P1", "P2"]
+
+    prefetcher.advance(1)
+    assert prefetcher.get(1) == "p1"
+    assert prefetcher.stats()["submitted"] == 4
+    prefetcher.stop()
+
+
+def test_prefetcher_shares_results_by_key():
+    calls = []
+    products = [{"pdf": "a"}, {"pdf": "a"}, {"pdf": "b"}]
+
+    def fetch(product):
+        calls.append(product["pdf"])
+        return {"text": product["pdf"]}
+
+    prefetcher = Prefetcher(
+        products, fetch, key_callback=lambda p: p["pdf"], lookahead=3
+    )
+    prefetcher.advance(0)
+    assert prefetcher.get(0) == {"text": "a"}
+    assert prefetcher.get(1) == {"text": "a"}
+    assert prefetcher.get(2) == {"text": "b"}
+    assert sorted(calls) == ["a", "b"]
+    assert prefetcher.stats()["shared"] == 1
+    prefetcher.stop()
+
+
+def test_prefetcher_stops_reading_ahead_over_memory_cap():
+    products = [{"sku": i} for i in range(6)]
+    prefetcher = Prefetcher(
+        products, lambda p: "x" * 998, lookahead=1, max_workers=1, max_bytes=1000
+    )
+
+    def wait_idle():
+        deadline = time.time() + 2
+        while prefetcher.stats()["in_flight"] and time.time() < deadline:
+            time.sleep(0.01)
+
+    prefetcher.advance(0)
+    assert prefetcher.get(0) == "x" * 998
+    wait_idle()
+
+    # El resultado de 1 sin consumir ya llena el tope: no se adelanta el 2
+    prefetcher.advance(1)
+    assert prefetcher.stats()["submitted"] == 2
+    assert prefetcher.stats()["held_bytes"] == 1000
+
+    # Al consumirlo se libera la memoria y la ventana sigue
+    prefetcher.get(1)
+    wait_idle()
+    prefetcher.advance(2)
+    assert prefetcher.stats()["submitted"] == 4
+    prefetcher.stop()
+
+
+def test_prefetcher_returns_none_for_failures_and_skipped_products():
+    def fetch(product):
+        if product["sku"] == 1:
+            raise RuntimeError("sin conexión")
+        return product["sku"]
+
+    prefetcher = Prefetcher([{"sku": i} for i in range(3)], fetch, lookahead=2)
+    prefetcher.advance(0)
+    prefetcher.release(0)
+    assert prefetcher.get(0) is None  # ya se omitió
+    assert prefetcher.get(1) is None  # falló
+    assert prefetcher.get(2) == 2
+
+    stats = prefetcher.stats()
+    assert (stats["failed"], stats["inline"]) == (1, 1)
+    prefetcher.stop()
+
+
+def test_prefetcher_stop_cancels_pending_work():
+    release = threading.Event()
+    products = [{"sku": i} for i in range(5)]
+    prefetcher = Prefetcher(
+        products, lambda p: release.wait(2), lookahead=4, max_workers=1
+    )
+    prefetcher.advance(0)
+    prefetcher.stop()
+    release.set()
+
+    prefetcher.advance(1)  # después de stop no se encola nada más
+    assert prefetcher.stats()["submitted"] == 5
+
+
+def test_generation_pipeline_delivers_results_in_order():
+    products = [{"sku": i} for i in range(5)]
+    pipeline = GenerationPipeline(
+        products, lambda p: {"descripcion": p["sku"]}, workers=2, depth=2
+    )
+    pipeline.start()
+    results = [pipeline.take(i, timeout=2) for i in range(5)]
+    pipeline.stop()
+
+    assert results == [{"descripcion": i} for i in range(5)]
+    assert pipeline.stats()["generation"]["done"] == 5
+
+
+def test_generation_pipeline_skips_products_dropped_by_the_browser():
+    generated = []
+    gate = threading.Event()
+
+    def generate(product):
+        gate.wait(2)
+        generated.append(product["sku"])
+        return product["sku"]
+
+    products = [{"sku": i} for i in range(6)]
+    pipeline = GenerationPipeline(products, generate, workers=1, depth=4)
+    pipeline.start()
+    time.sleep(0.1)
+
+    # El navegador falla en 1 y 2 mientras 0 todavía se está generando
+    pipeline.drop(1)
+    pipeline.drop(2)
+    gate.set()
+    assert pipeline.take(0, timeout=2) == 0
+    assert pipeline.take(3, timeout=2) == 3
+    pipeline.stop()
+
+    assert 1 not in generated and 2 not in generated
+    stats = pipeline.stats()
+    assert stats["discarded"] == 2
+
+
+def test_generation_pipeline_failure_returns_none():
+    def generate(product):
+        if product["sku"] == 1:
+            raise RuntimeError("modelo caído")
+        return product["sku"]
+
+    pipeline = GenerationPipeline([{"sku": i} for i in range(3)], generate)
+    pipeline.start()
+    assert [pipeline.take(i, timeout=2) for i in range(3)] == [0, None, 2]
+    pipeline.stop()
+    assert pipeline.stats()["generation"]["errors"] == 1
+
+
+def test_generation_pipeline_stop_joins_producer_without_errors():
+    errors = []
+    original_hook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(args.exc_value)
+    try:
+        for _ in range(20):
+            products = [{"sku": i} for i in range(50)]
+            pipeline = GenerationPipeline(
+                products, lambda p: time.sleep(0.001) or p, workers=2, depth=1
+            )
+            pipeline.start()
+            pipeline.take(0, timeout=2)
+            pipeline.stop()
+
+            assert not pipeline._producer.is_alive()
+            assert pipeline._queue.empty()
+            assert pipeline.take(1) is None
+    finally:
+        threading.excepthook = original_hook
+
+    # Antes el productor podía llamar a submit con el executor ya cerrado
+    assert errors == []
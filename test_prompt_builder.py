@@ -0,0 +1,82 @@
+"""
+Pruebas del constructor de prompts con presupuesto (prompt_builder.py)
+"""
+
+from prompt_builder import (
+    PromptBuilder,
+    compact_fields,
+    estimate_tokens,
+    is_empty,
+    select_excerpt,
+    split_paragraphs,
+)
+
+LEGAL = "Las especificaciones pueden cambiar sin previo aviso. Consulte a su vendedor."
+SPECS = "Potencia 100 kVA, tensión 380 V, frecuencia 50 Hz, consumo 18 L/h"
+RELLENO = "La empresa fue fundada hace muchos años y tiene presencia en todo el país."
+
+
+def test_is_empty():
+    for valor in (None, "", "  ", "nan", "N/A", "-", "0", 0, 0.0, [], {}):
+        assert is_empty(valor), valor
+    for valor in ("100 kVA", 5, False, ["x"]):
+        assert not is_empty(valor), valor
+
+
+def test_compact_fields_drops_empty_and_repeated_values():
+    campos, descartados = compact_fields(
+        {
+            "sku": "GE-100",
+            "SKU": "GE-100",
+            "nombre": "Generador Cummins 100 kVA",
+            "descripcion": "Generador  cummins 100 kVA",
+            "precio": 0,
+            "frecuencia": "50",
+            "ciclos": "50",
+            "interno": "x",
+        },
+        exclude=("interno",),
+    )
+    assert campos == {
+        "sku": "GE-100",
+        "nombre": "Generador Cummins 100 kVA",
+        "frecuencia": "50",
+        # Valores cortos iguales pueden ser datos distintos
+        "ciclos": "50",
+    }
+    assert sorted(descartados) == ["SKU", "descripcion", "interno", "precio"]
+
+
+def test_split_paragraphs_cuts_long_blocks_by_line():
+    bloque = "\n".join(f"linea {i} " + "x" * 50 for i in range(20))
+    partes = split_paragraphs(f"Corto\n\n{bloque}", max_chars=200)
+    assert partes[0] == "Corto"
+    assert all(len(parte) <= 200 for parte in partes[1:])
+    assert "\n".join(partes[1:]).splitlines() == bloque.splitlines()
+
+
+def test_excerpt_prefers_spec_dense_paragraphs_in_document_order():
+    texto = "\n\n".join([RELLENO, LEGAL, SPECS, LEGAL, "Peso 1250 kg"])
+    extracto, stats = select_excerpt(texto, max_tokens=estimate_tokens(SPECS) + 10)
+
+    assert extracto == SPECS + "\nPeso 1250 kg"
+    assert stats["pdf_duplicates"] == 1
+    assert stats["pdf_paragraphs_used"] == 2
+    assert stats["pdf_tokens"] < stats["pdf_tokens_available"]
+
+
+def test_excerpt_without_specs_keeps_one_paragraph():
+    extracto, _ = select_excerpt(f"{RELLENO}\n\n{LEGAL}", max_tokens=1000)
+    assert extracto == RELLENO
+
+
+def test_product_context_gives_the_pdf_what_fields_leave():
+    builder = PromptBuilder(token_budget=60, min_pdf_tokens=20)
+    texto = "\n\n".join([RELLENO] + [f"Peso {i} kg" for i in range(50)])
+    campos, extracto, stats = builder.product_context(
+        {"nombre": "Generador", "marca": "Cummins"}, texto, indent="  "
+    )
+    assert campos == "  - nombre: Generador\n  - marca: Cummins"
+    assert stats["pdf_tokens"] <= 60 - stats["fields_tokens"]
+    assert extracto.startswith("Peso 0 kg")
+    assert RELLENO not in extracto
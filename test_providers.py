@@ -0,0 +1,220 @@
+"""
+Pruebas de los proveedores de IA (providers.py): el prefijo estático se
+envía una sola vez cuando hay caché de contexto
+"""
+
+from types import SimpleNamespace
+
+import google.generativeai as genai
+import pytest
+from google.generativeai import caching
+
+from providers import (
+    DEFAULT_MODELS,
+    AIProvider,
+    GeminiProvider,
+    LocalProvider,
+    PromptPrefix,
+    ProviderRouter,
+    build_provider,
+)
+
+PREFIJO_CORTO = PromptPrefix("v1", "Instrucciones de diseño HTML. " * 10)
+PREFIJO_LARGO = PromptPrefix("v1", "x" * 4 * 40000)
+
+
+class ModeloFalso:
+    """Reemplazo de genai.GenerativeModel que guarda los prompts recibidos"""
+
+    def __init__(self, model_name, cached=None):
+        self.model_name = model_name
+        self.cached = cached
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+
+class CacheFalsa:
+    creados = []
+
+    @classmethod
+    def create(cls, model, display_name, contents, ttl):
+        cached = SimpleNamespace(model=model, contents=contents, ttl=ttl)
+        cls.creados.append(cached)
+        return cached
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Fábrica de GeminiProvider sobre una API falsa, sin red"""
+    CacheFalsa.creados = []
+    modelos_cacheados = []
+
+    def desde_cache(cached):
+        modelo = ModeloFalso(cached.model, cached=cached)
+        modelos_cacheados.append(modelo)
+        return modelo
+
+    monkeypatch.setattr(genai, "GenerativeModel", ModeloFalso)
+    monkeypatch.setattr(
+        ModeloFalso, "from_cached_content", staticmethod(desde_cache), raising=False
+    )
+    monkeypatch.setattr(caching, "CachedContent", CacheFalsa)
+
+    def build(**kwargs):
+        provider = GeminiProvider("gemini-1.5-flash", **kwargs)
+        provider.cached_models = modelos_cacheados
+        return provider
+
+    return build
+
+
+def test_local_provider_receives_the_prefix_once():
+    provider = LocalProvider()
+    respuestas = [
+        provider.generate(f"- SKU: GE-{i}\n", prefix=PREFIJO_CORTO) for i in range(3)
+    ]
+
+    stats = provider.stats()
+    assert stats["prefix_uploads"] == 1
+    assert stats["prefix_tokens_sent"] == PREFIJO_CORTO.tokens
+    assert [r.usage["cached_tokens"] for r in respuestas] == [
+        0,
+        PREFIJO_CORTO.tokens,
+        PREFIJO_CORTO.tokens,
+    ]
+
+
+def test_handler_sends_one_prefix_for_many_products(make_handler):
+    provider = LocalProvider()
+    handler = make_handler(provider)
+    for i in range(3):
+        handler.generar_descripcion_detallada_html_premium_con_ia(
+            {"sku": f"GE-{i}", "nombre": f"Generador {i}"}, {}
+        )
+
+    assert len(provider.prefixes) == 1
+    assert provider.stats()["prefix_uploads"] == 1
+    assert provider.stats()["calls"] == 3
+
+
+def test_gemini_uploads_a_large_prefix_once(gemini):
+    provider = gemini(
+        cache_model_name="models/gemini-1.5-flash-002", min_cache_tokens=1000
+    )
+    for i in range(3):
+        provider.generate(f"producto {i}", prefix=PREFIJO_LARGO)
+
+    assert len(CacheFalsa.creados) == 1
+    assert CacheFalsa.creados[0].model == "models/gemini-1.5-flash-002"
+    # Las llamadas solo envían el sufijo al modelo sobre el contexto cacheado
+    assert provider.cached_models[0].prompts == [f"producto {i}" for i in range(3)]
+    assert provider.model.prompts == []
+    stats = provider.stats()
+    assert stats["prefix_uploads"] == 1
+    assert stats["prefix_tokens_sent"] == PREFIJO_LARGO.tokens
+    assert stats["prefix_inline_calls"] == stats["prefix_cache_skipped"] == 0
+
+
+def test_gemini_skips_the_cache_below_the_minimum(gemini):
+    provider = gemini(cache_model_name="models/gemini-1.5-flash-002")
+    respuestas = [
+        provider.generate(f"producto {i}", prefix=PREFIJO_CORTO) for i in range(3)
+    ]
+
+    # Debajo del mínimo ni siquiera se intenta crear el contexto cacheado
+    assert CacheFalsa.creados == []
+    assert all(p.startswith(PREFIJO_CORTO.text) for p in provider.model.prompts)
+    assert all(
+        r.usage["prefix_inline_tokens"] == PREFIJO_CORTO.tokens for r in respuestas
+    )
+    stats = provider.stats()
+    assert stats["prefix_cache_skipped"] == 1
+    assert stats["prefix_inline_calls"] == 3
+    assert stats["prefix_cache_failures"] == 0
+
+
+def test_gemini_without_cache_model_sends_the_prefix_inline(gemini):
+    provider = gemini(min_cache_tokens=0)
+    provider.generate("producto", prefix=PREFIJO_LARGO)
+    assert CacheFalsa.creados == []
+    assert provider.stats()["prefix_cache_skipped"] == 1
+
+
+def test_build_provider_reads_the_context_cache_config(gemini):
+    provider = build_provider(
+        {
+            "provider": "gemini",
+            "models": {"html": ["gemini-1.5-flash"]},
+            "context_cache": {
+                "models": {"gemini-1.5-flash": "models/gemini-1.5-flash-002"},
+                "ttl_seconds": 600,
+                "min_tokens": 4096,
+            },
+        }
+    )
+    assert provider.cache_model_name == "models/gemini-1.5-flash-002"
+    assert provider.cache_ttl == 600
+    assert provider.min_cache_tokens == 4096
+
+    sin_cache = build_provider({"provider": "gemini", "models": {"seo": ["x"]}})
+    assert sin_cache.cache_model_name is None
+    assert sin_cache.min_cache_tokens == GeminiProvider.MIN_CACHE_TOKENS
+
+
+def test_inline_prefix_tokens_reach_the_metrics(make_handler, gemini):
+    provider = gemini(cache_model_name="models/gemini-1.5-flash-002")
+    handler = make_handler(provider)
+    handler._llamar_modelo("producto", prefijo=PREFIJO_CORTO)
+
+    totales = handler.get_metrics()["totals"]["model_call"]
+    assert totales["prefix_inline_tokens"] == PREFIJO_CORTO.tokens
+
+
+def test_providers_must_implement_generate():
+    class SinGenerate(AIProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        SinGenerate()
+
+
+def test_default_html_route_prefers_flash(gemini):
+    assert DEFAULT_MODELS["gemini"]["html"][0] == "gemini-1.5-flash"
+
+    router = build_provider({"provider": "gemini"})
+    assert router.select("html").model_name == "gemini-1.5-flash"
+    assert router.select("seo").model_name == "gemini-1.5-flash"
+
+
+def router_local(**kwargs):
+    rapido = LocalProvider(model_name="flash", **kwargs)
+    grande = LocalProvider(model_name="pro")
+    return ProviderRouter({"html": [rapido, grande]}, min_samples=3), rapido, grande
+
+
+def test_router_falls_back_when_the_preferred_provider_fails():
+    router, rapido, grande = router_local(error_rate=1.0)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            router.generate("- SKU: GE-1\n", task="html")
+    # Con la tasa de error de flash por encima del máximo se usa pro
+    assert router.select("html") is grande
+    router.generate("- SKU: GE-1\n", task="html")
+
+    stats = router.stats()
+    assert stats["fallbacks"] == 1
+    assert stats["providers"]["local:flash"]["error_rate"] == 1.0
+    assert stats["providers"]["local:pro"]["routed"] == 1
+
+
+def test_router_keeps_the_preferred_provider_while_healthy():
+    router, rapido, grande = router_local()
+    for _ in range(5):
+        router.generate("- SKU: GE-1\n", task="html")
+    assert rapido.stats()["calls"] == 5
+    assert grande.stats()["calls"] == 0
+    assert router.stats()["fallbacks"] == 0
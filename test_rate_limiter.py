@@ -0,0 +1,124 @@
+"""
+Pruebas del limitador de tasa (rate_limiter.py) y de la generación asíncrona
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from providers import LocalProvider
+from rate_limiter import AsyncRateLimiter, TokenBucket, is_quota_error
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60000)  # 1000 por segundo
+    assert bucket.time_until(60000) == 0
+    bucket.consume(60000)
+    assert bucket.time_until(100) == pytest.approx(0.1, abs=0.02)
+    # Más grande que el balde: alcanza con tenerlo lleno
+    assert bucket.time_until(10**9) == pytest.approx(60, abs=0.1)
+
+
+def test_acquire_waits_for_tokens_per_minute():
+    limiter = AsyncRateLimiter(requests_per_minute=1000, tokens_per_minute=60000)
+
+    async def run():
+        await limiter.acquire(60000)
+        started = time.monotonic()
+        await limiter.acquire(100)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) == pytest.approx(0.1, abs=0.05)
+    stats = limiter.stats()
+    assert stats["acquired"] == 2
+    assert stats["tokens_reserved"] == 60100
+
+
+def test_throttle_halves_the_rate_and_success_recovers_it():
+    limiter = AsyncRateLimiter(requests_per_minute=100, min_fraction=0.2)
+    delay = limiter.on_throttle(attempt=1, base_delay=1.0)
+    assert 2.0 <= delay <= 2.5
+    assert limiter.stats()["current_rpm"] == 50
+
+    limiter.on_throttle(base_delay=0)
+    limiter.on_throttle(base_delay=0)
+    assert limiter.stats()["current_rpm"] == 20  # no baja de min_fraction
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.stats()["current_rpm"] == 100
+    assert limiter.stats()["throttled"] == 3
+
+
+def test_is_quota_error():
+    assert is_quota_error(Exception("429 Resource has been exhausted"))
+    assert is_quota_error(Exception("Quota exceeded for metric"))
+    assert not is_quota_error(Exception("500 Internal error"))
+
+    class ResourceExhausted(Exception):
+        pass
+
+    assert is_quota_error(ResourceExhausted("sin detalle"))
+
+
+class ConcurrenciaMedida(LocalProvider):
+    """Proveedor local lento que registra cuántas llamadas hubo a la vez"""
+
+    def __init__(self):
+        super().__init__(latency=0.02)
+        self.activas = 0
+        self.maximo = 0
+
+    async def agenerate(self, prompt, generation_config=None, prefix=None, task=None):
+        self.activas += 1
+        self.maximo = max(self.maximo, self.activas)
+        try:
+            return await super().agenerate(prompt, generation_config, prefix, task)
+        finally:
+            self.activas -= 1
+
+
+def test_agenerate_many_caps_concurrency(make_handler):
+    provider = ConcurrenciaMedida()
+    handler = make_handler(provider)
+    products = [{"sku": f"GE-{i}", "nombre": f"Generador {i}"} for i in range(8)]
+
+    salida = asyncio.run(handler.agenerate_many(products, {}, concurrency=3))
+
+    assert sorted(salida["resultados"]) == sorted(p["sku"] for p in products)
+    assert salida["errores"] == {}
+    assert provider.maximo == 3
+    assert salida["stats"]["acquired"] == 8
+
+
+class CuotaUnaVez(LocalProvider):
+    def __init__(self):
+        super().__init__()
+        self.fallos = 0
+
+    async def agenerate(self, prompt, generation_config=None, prefix=None, task=None):
+        if self.fallos == 0:
+            self.fallos += 1
+            raise Exception("429 Quota exceeded")
+        return await super().agenerate(prompt, generation_config, prefix, task)
+
+
+class LimitadorRapido(AsyncRateLimiter):
+    def on_throttle(self, attempt=0, base_delay=2.0):
+        return super().on_throttle(attempt, base_delay=0.01)
+
+
+def test_agenerate_retries_after_quota_errors(make_handler):
+    handler = make_handler(CuotaUnaVez())
+    limiter = LimitadorRapido(requests_per_minute=6000)
+
+    resultado = asyncio.run(
+        handler.agenerar_descripcion(
+            {"sku": "GE-1", "nombre": "Generador"}, {}, limiter=limiter
+        )
+    )
+
+    assert "descripcion_html" in resultado
+    assert not resultado.get("respaldo")
+    assert limiter.stats()["throttled"] == 1
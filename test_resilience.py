@@ -0,0 +1,192 @@
+"""
+Pruebas de la capa de resiliencia (resilience.py) y de la plantilla de
+respaldo cuando la IA no responde
+"""
+
+import threading
+import time
+
+import pytest
+
+import quick_integration
+from providers import LocalProvider
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+    is_provider_unavailable,
+    is_retryable,
+)
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class PermissionDenied(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+def test_transient_and_permanent_errors():
+    assert is_retryable(ServiceUnavailable("sin detalle"))
+    assert is_retryable(ConnectionError())
+    assert is_retryable(Exception("429 Quota exceeded"))
+    assert not is_retryable(PermissionDenied("403 API key not valid"))
+    assert not is_retryable(NotFound("404 models/gemini-9 is not found"))
+
+    assert is_provider_unavailable(CircuitOpenError())
+    assert not is_provider_unavailable(PermissionDenied("403 API key not valid"))
+
+
+def test_breaker_opens_and_half_open_probe_closes_it():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.02)
+    assert breaker.allow()  # prueba semiabierta
+    assert not breaker.allow()  # una sola a la vez
+    breaker.record_success()
+    assert breaker.stats() == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "times_opened": 1,
+    }
+
+
+def caller(**kwargs):
+    kwargs.setdefault("base_delay", 0)
+    kwargs.setdefault("hedge", False)
+    return ResilientCaller(**kwargs)
+
+
+def test_transient_errors_are_retried():
+    llamadas = []
+
+    def inestable():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise ServiceUnavailable("503")
+        return "ok"
+
+    resiliente = caller(max_retries=2)
+    assert resiliente.call(inestable) == "ok"
+    assert resiliente.stats()["retries"] == 2
+
+
+def test_permanent_errors_are_not_retried():
+    llamadas = []
+
+    def sin_permiso():
+        llamadas.append(1)
+        raise PermissionDenied("403 API key not valid")
+
+    resiliente = caller(max_retries=3)
+    with pytest.raises(PermissionDenied):
+        resiliente.call(sin_permiso)
+    assert len(llamadas) == 1
+    assert resiliente.stats()["failures"] == 1
+
+
+def test_deadline_abandons_slow_calls():
+    resiliente = caller(deadline=0.05, max_retries=0)
+    with pytest.raises(DeadlineExceededError):
+        resiliente.call(time.sleep, 0.5)
+    assert resiliente.stats()["timeouts"] == 1
+
+
+def test_hedged_request_wins_over_a_slow_first_attempt():
+    liberar = threading.Event()
+    llamadas = []
+
+    def primera_lenta():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            liberar.wait(2)
+            return "lenta"
+        return "rapida"
+
+    resiliente = caller(hedge=True, hedge_min_samples=1)
+    resiliente.latencies.add(0.01)
+    try:
+        assert resiliente.call(primera_lenta) == "rapida"
+    finally:
+        liberar.set()
+    stats = resiliente.stats()
+    assert stats["hedges"] == stats["hedge_wins"] == 1
+
+
+class Falla(LocalProvider):
+    """Proveedor local que siempre falla con el error indicado"""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def generate(self, prompt, generation_config=None, prefix=None, task=None):
+        self._count(calls=1)
+        raise self.error
+
+
+def handler_sin_reintentos(make_handler, provider):
+    return make_handler(provider, resilience=caller(max_retries=0))
+
+
+def test_unavailable_provider_uses_the_fallback_template(make_handler):
+    provider = Falla(ConnectionError("503 Service Unavailable"))
+    handler = handler_sin_reintentos(make_handler, provider)
+    producto = {"sku": "GE-1", "nombre": "Generador", "potencia_kva": "100"}
+
+    resultado = handler.generar_descripcion_detallada_html_premium_con_ia(producto, {})
+    assert resultado["respaldo"] is True
+    assert "Potencia (kVA)" in resultado["descripcion_html"]
+
+    # No se guardó en caché: la próxima vez se vuelve a intentar con IA
+    handler.generar_descripcion_detallada_html_premium_con_ia(producto, {})
+    assert provider.stats()["calls"] == 2
+    assert handler.get_resilience_stats()["fallbacks"] == 2
+
+
+@pytest.mark.parametrize(
+    "error",
+    [PermissionDenied("403 API key not valid"), NotFound("404 model not found")],
+)
+def test_permanent_errors_do_not_use_the_fallback(make_handler, error):
+    handler = handler_sin_reintentos(make_handler, Falla(error))
+    with pytest.raises(Exception, match="Error crítico"):
+        handler.generar_descripcion_detallada_html_premium_con_ia(
+            {"sku": "GE-1", "nombre": "Generador"}, {}
+        )
+    assert handler.get_resilience_stats()["fallbacks"] == 0
+
+
+class SeleniumFalso:
+    is_logged_in = True
+
+    def process_products(self, products, generate_description, **kwargs):
+        self.descripciones = [generate_description(p) for p in products]
+
+    def get_status(self):
+        return {}
+
+
+def test_process_products_passes_the_fallback_flag(make_handler, monkeypatch):
+    selenium = SeleniumFalso()
+    handler = handler_sin_reintentos(make_handler, Falla(ConnectionError("503")))
+    monkeypatch.setattr(quick_integration, "ai_handler", handler)
+    monkeypatch.setattr(quick_integration, "selenium_handler", selenium)
+
+    respuesta = quick_integration.app.test_client().post(
+        "/api/process-products",
+        json={"products": [{"sku": "GE-1", "nombre": "Generador"}]},
+    )
+
+    assert respuesta.status_code == 200
+    assert selenium.descripciones[0]["respaldo"] is True
@@ -0,0 +1,74 @@
+"""
+Pruebas de la metadata SEO del catálogo (seo_batch.py)
+"""
+
+import sys
+
+import pytest
+
+from seo_batch import (
+    SEO_DESCRIPTION_MAX,
+    SEO_TITLE_MAX,
+    generate_seo_catalog,
+    seo_for_product,
+    truncate_at_word,
+)
+
+PRODUCTOS = [
+    {
+        "sku": "GE-1",
+        "nombre": "Generador diesel trifásico insonorizado con tablero automático",
+        "marca": "Cummins",
+        "modelo": "C100D5",
+        "familia": "Generadores",
+    },
+    {"sku": "GE-2", "nombre": "Motobomba", "marca": "", "modelo": None},
+    {"sku": "GE-3", "nombre": "X" * 80},
+]
+
+
+@pytest.mark.parametrize(
+    "texto, esperado",
+    [
+        ("corto", "corto"),
+        ("uno dos tres", "uno dos"),
+        ("uno dos - tres", "uno dos"),
+        ("unodostres", "unodostr"),
+        (" unodostres", " unodost"),
+        ("uno dos\ntres", "uno"),
+    ],
+)
+def test_truncate_at_word(texto, esperado):
+    assert truncate_at_word(texto, 8) == esperado
+
+
+def test_catalog_matches_per_product_metadata():
+    seo = generate_seo_catalog(PRODUCTOS)["seo"]
+    for producto in PRODUCTOS:
+        assert seo[producto["sku"]] == seo_for_product(
+            {k: v for k, v in producto.items() if v is not None}
+        )
+    assert all(len(s["title"]) <= SEO_TITLE_MAX for s in seo.values())
+    assert all(len(s["description"]) <= SEO_DESCRIPTION_MAX for s in seo.values())
+    assert not seo["GE-1"]["title"].endswith(("-", " "))
+
+
+def test_repeated_skus_keep_the_first_product():
+    seo = generate_seo_catalog(PRODUCTOS + [{"sku": "GE-1", "nombre": "Otro"}])
+    assert seo["stats"]["products"] == 3
+    assert seo["seo"]["GE-1"]["title"].startswith("Generador")
+
+
+def test_missing_fields_use_defaults():
+    seo = generate_seo_catalog([{"sku": "A"}, {"sku": "B", "modelo": 200}])
+    assert seo["seo"]["A"]["title"] == "Producto - Mejor Precio"
+    assert "200" in seo["seo"]["B"]["keywords"]
+
+
+def test_single_product_does_not_load_pandas(monkeypatch):
+    monkeypatch.delitem(sys.modules, "pandas", raising=False)
+    monkeypatch.delitem(sys.modules, "seo_batch", raising=False)
+    import seo_batch
+
+    seo_batch.seo_for_product({"nombre": "Motobomba"})
+    assert "pandas" not in sys.modules
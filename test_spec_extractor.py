@@ -0,0 +1,95 @@
+"""
+Pruebas del extractor de especificaciones (spec_extractor.py)
+"""
+
+import pytest
+
+from ai_handler_enhanced import CAMPOS_PROMPT_PREMIUM
+from prompt_builder import format_spec_lines
+from spec_extractor import SpecExtractor, parse_number, spec_token_count, to_legacy
+
+FICHA = """
+GRUPO ELECTRÓGENO GE-100
+Potencia stand-by: 100 kVA / 80 kW
+Motor: Cummins 6BTA5.9-G2   Potencia del motor: 120 HP
+Tensión: 380/220 V   Frecuencia: 50 Hz
+Consumo al 75%: 18,5 L/h
+Peso: 1.250 kg
+Dimensiones: 2500 x 1100 x 1500 mm
+"""
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("1.250", 1250.0),
+        ("1,250", 1250.0),
+        ("18,5", 18.5),
+        ("2.5", 2.5),
+        ("1.2.3", None),
+    ],
+)
+def test_parse_number(raw, expected):
+    assert parse_number(raw) == expected
+
+
+def test_extracts_typed_values_with_units():
+    specs = SpecExtractor().extract(FICHA)
+
+    assert (specs["potencia_kva"].value, specs["potencia_kva"].unit) == (100, "kVA")
+    assert (specs["potencia_kw"].value, specs["potencia_kw"].unit) == (80, "kW")
+    assert specs["voltaje_v"].value == 380
+    assert specs["frecuencia_hz"].value == 50
+    assert specs["consumo_lh"].value == 18.5
+    assert specs["peso_kg"].value == 1250
+    assert specs["dimensiones_mm"].value == (2500, 1100, 1500)
+    assert specs["motor"].value.startswith("Cummins 6BTA5.9-G2")
+    assert specs["potencia_kva"].confidence > 0.9
+
+
+def test_engine_horsepower_is_not_generator_power():
+    specs = SpecExtractor().extract("Motor diesel de 120 HP")
+    assert "potencia_kw" not in specs
+    assert (specs["potencia_motor_hp"].value, specs["potencia_motor_hp"].unit) == (
+        120,
+        "HP",
+    )
+    assert "potencia_kw" not in to_legacy(specs)
+    assert "potencia_kva" not in to_legacy(specs)
+
+
+def test_legacy_keeps_kva_and_kw_apart():
+    legacy = SpecExtractor().extract_legacy("Potencia continua: 80 kW")
+    assert legacy == {"potencia_kw": "80"}
+
+    legacy = SpecExtractor().extract_legacy(FICHA)
+    assert legacy["potencia_kva"] == "100"
+    assert legacy["potencia_kw"] == "80"
+    assert legacy["dimensiones"] == "2500x1100x1500"
+    assert "potencia" not in legacy
+
+
+def test_prompt_lines_carry_the_right_unit():
+    legacy = SpecExtractor().extract_legacy("Potencia continua: 80 kW")
+    lines, _ = format_spec_lines(legacy, CAMPOS_PROMPT_PREMIUM)
+    assert lines == "- Potencia activa: 80 kW"
+
+    lines, _ = format_spec_lines(
+        {"potencia_kva": "100", "potencia_kw": "80"}, CAMPOS_PROMPT_PREMIUM
+    )
+    assert lines.splitlines() == ["- Potencia: 100 kVA", "- Potencia activa: 80 kW"]
+
+    # La potencia del catálogo ya trae su unidad: no se le agrega otra
+    lines, _ = format_spec_lines({"potencia": "50 KW"}, CAMPOS_PROMPT_PREMIUM)
+    assert lines == "- Potencia: 50 KW"
+
+
+def test_unit_without_keyword_has_lower_confidence():
+    cerca = SpecExtractor().extract("Peso: 500 kg")["peso_kg"]
+    lejos = SpecExtractor().extract("Embalaje de 500 kg")["peso_kg"]
+    assert cerca.confidence > lejos.confidence
+
+
+def test_spec_token_count():
+    assert spec_token_count("sin datos técnicos") == 0
+    assert spec_token_count("Potencia 100 kVA a 50 Hz") == 3
@@ -0,0 +1,70 @@
+"""
+Pruebas del inicio del servidor (quick_integration.run_server): atiende
+mientras IA, Selenium y catálogo se inicializan en paralelo
+"""
+
+import threading
+
+import pytest
+
+import quick_integration
+
+
+@pytest.fixture
+def subsistemas(monkeypatch):
+    """Subsistemas falsos que terminan de iniciarse cuando se los libera"""
+    liberar = {name: threading.Event() for name in ("ai", "selenium", "catalog")}
+
+    def iniciar(name):
+        def init():
+            liberar[name].wait(5)
+            return "ready"
+
+        return init
+
+    monkeypatch.setattr(
+        quick_integration,
+        "STARTUP_SUBSYSTEMS",
+        {name: iniciar(name) for name in liberar},
+    )
+    monkeypatch.setattr(
+        quick_integration,
+        "startup_state",
+        {
+            "started": None,
+            "ready_seconds": None,
+            "first_page_seconds": None,
+            "subsystems": {},
+        },
+    )
+    monkeypatch.setattr(quick_integration, "_subsystem_events", {})
+    yield liberar
+    for evento in liberar.values():
+        evento.set()
+
+
+def test_run_server_serves_before_subsystems_are_ready(subsistemas, monkeypatch):
+    estados = []
+
+    def servir(**kwargs):
+        cliente = quick_integration.app.test_client()
+        respuesta = cliente.get("/api/ready")
+        estados.append((respuesta.status_code, respuesta.get_json()))
+
+        subsistemas["catalog"].set()
+        assert quick_integration.wait_for_subsystem("catalog", 5)
+        subsistemas["ai"].set()
+        subsistemas["selenium"].set()
+        for name in subsistemas:
+            assert quick_integration.wait_for_subsystem(name, 5)
+        estados.append((cliente.get("/api/ready").status_code, None))
+
+    monkeypatch.setattr(quick_integration.app, "run", servir)
+    quick_integration.run_server(started=0.0)
+
+    (pendiente, cuerpo), (listo, _) = estados
+    assert pendiente == 503
+    assert not cuerpo["ready"]
+    assert {estado["state"] for estado in cuerpo["subsystems"].values()} == {"pending"}
+    assert listo == 200
+    assert quick_integration.startup_state["ready_seconds"] is not None